@@ -13,4 +13,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gymproject.settings')
 
-application = get_asgi_application()
+# Khởi tạo Django trước khi import consumer/model
+django_asgi_app = get_asgi_application()
+
+from channels.auth import AuthMiddlewareStack
+from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.security.websocket import AllowedHostsOriginValidator
+
+from managements.routing import OAuth2TokenAuthMiddleware, websocket_urlpatterns
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': AllowedHostsOriginValidator(
+        AuthMiddlewareStack(OAuth2TokenAuthMiddleware(URLRouter(websocket_urlpatterns)))
+    ),
+})
@@ -28,6 +28,7 @@ DEBUG = True
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
     'cloudinary_storage',
     'corsheaders',
     'social_django',
+    'channels',
 ]
 
 REST_FRAMEWORK = {
@@ -54,10 +56,19 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 2,
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'oauth2_provider.contrib.rest_framework.OAuth2Authentication',
+        'managements.authentication.CachedOAuth2Authentication',
     ],
 }
 
+# Cache token OAuth2 đã xác thực (LRU trong tiến trình); TTL tính bằng giây. Thu hồi token / khóa user
+# được báo cho các worker khác qua CACHES['default'], nên khi backend chỉ nằm trong tiến trình
+# (LocMemCache) TTL bị giới hạn ở LOCAL_TTL
+OAUTH2_TOKEN_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 300,
+    'LOCAL_TTL': 5,
+}
+
 AUTHENTICATION_BACKENDS = [
     'social_core.backends.google.GoogleOAuth2',
     'social_core.backends.facebook.FacebookOAuth2',
@@ -68,16 +79,16 @@ AUTHENTICATION_BACKENDS = [
 CKEDITOR_UPLOAD_PATH = "ckeditors/lessons/"
 
 MIDDLEWARE = [
+    'managements.profiling.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'managements.db.middleware.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'django.middleware.common.CommonMiddleware',
-
 ]
 
 ROOT_URLCONF = 'gymproject.urls'
@@ -87,6 +98,14 @@ CORS_ALLOW_ALL_ORIGINS = True
 import os
 ALLOWED_HOSTS = ['*']
 
+# Profiling theo từng action DRF (managements/profiling.py, xem ở /admin/profiling/): tắt mặc định,
+# đặt PROFILING=1 để bật. BUFFER_SIZE là số request gần nhất được giữ, DUPLICATE_THRESHOLD là số lần
+# một câu truy vấn lặp lại trong một request thì bị coi là N+1
+PROFILING = {
+    'ENABLED': os.environ.get('PROFILING') == '1',
+    'BUFFER_SIZE': 2000,
+    'DUPLICATE_THRESHOLD': 3,
+}
 
 TEMPLATES = [
     {
@@ -106,22 +125,106 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'gymproject.wsgi.application'
+ASGI_APPLICATION = 'gymproject.asgi.application'
+
+# Channel layer cho chat realtime: mặc định chạy in-process (dev/test),
+# đặt REDIS_URL để dùng Redis khi chạy nhiều worker
+if os.environ.get('REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.environ['REDIS_URL']]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Pool kết nối (managements/db/pool.py): kết nối được trả về pool khi hết request (CONN_MAX_AGE=0)
+# thay vì đóng hẳn. DB_POOL=0 để dùng backend mysql gốc. POOL: MAX_SIZE kết nối rảnh giữ lại,
+# MAX_OVERFLOW kết nối mở thêm lúc cao điểm, TIMEOUT (giây) chờ khi hết kết nối, RECYCLE (giây)
+# tuổi tối đa của một kết nối, PRE_PING kiểm tra kết nối trước khi dùng lại
+DB_POOL = os.environ.get('DB_POOL', '1') == '1'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'managements.db.backends.mysql' if DB_POOL else 'django.db.backends.mysql',
         'NAME': 'gymdb',
         'USER': 'root',
         'PASSWORD': '12345',
-        'HOST': ''  # mặc định localhost
+        'HOST': '',  # mặc định localhost
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_SIZE', 10)),
+            'MAX_OVERFLOW': int(os.environ.get('DB_POOL_OVERFLOW', 10)),
+            'TIMEOUT': 10,
+            'RECYCLE': 3600,
+            'PRE_PING': True,
+        },
     }
 }
 
+# Replica chỉ đọc (managements/db/routers.py): DB_REPLICA_HOSTS=host1,host2 tạo các alias replica1, replica2...
+# cùng cấu hình với default. Request GET đọc từ một replica; ghi, transaction và PRIMARY_APPS luôn dùng
+# primary. User vừa POST/PUT/PATCH/DELETE đọc từ primary trong STICKY_SECONDS giây (cần cache dùng chung
+# giữa các worker để có hiệu lực trên mọi worker)
+for index, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica{index}'] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+
+READ_REPLICAS = {
+    'ALIASES': [alias for alias in DATABASES if alias != 'default'],
+    'STICKY_SECONDS': 10,
+    'PRIMARY_APPS': ['sessions', 'oauth2_provider', 'social_django', 'admin'],
+}
+
+DATABASE_ROUTERS = ['managements.db.routers.ReplicaRouter']
+
 AUTH_USER_MODEL = 'managements.User'
 
+# Cache: mặc định local-memory; đặt CACHE_BACKEND/CACHE_LOCATION để đổi,
+# ví dụ django.core.cache.backends.filebased.FileBasedCache + /var/tmp/gymlogix
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'gymlogix'),
+    }
+}
+
+# Thời gian (giây) giữ số liệu trang thống kê admin
+STATS_CACHE_TIMEOUT = 300
+
+# Thời gian (giây) giữ response của danh mục Activity / MealPlan theo goal
+CATALOG_CACHE_TIMEOUT = 600
+
+# Thời gian (giây) giữ roster học viên của mỗi coach (connection/roster/)
+ROSTER_CACHE_TIMEOUT = 300
+
+# Tiến độ mục tiêu (goal/progress/): số ngày gần nhất dùng để tính xu hướng cân nặng
+# và thời gian (giây) giữ kết quả của mỗi mục tiêu
+GOAL_TREND_DAYS = 30
+GOAL_PROGRESS_CACHE_TIMEOUT = 3600
+
+# Thời gian (giây) giữ thống kê của mỗi kỳ đã kết thúc (activity/statistics/)
+STATISTICS_CACHE_TIMEOUT = 86400
+
+# Nhập HealthRecord theo lô (healthrecord/bulk/): số bản ghi mỗi lần bulk_create và tối đa mỗi request
+HEALTH_BULK_CHUNK_SIZE = 500
+HEALTH_BULK_MAX_ITEMS = 5000
+
+# Đồng bộ tăng dần (sync/): số dòng tối đa mỗi bảng trong một response và khoảng lùi
+# watermark (giây) để không bỏ sót các transaction commit muộn
+SYNC_PAGE_SIZE = 500
+SYNC_WATERMARK_OVERLAP = 5
+
+# Đường đọc nhanh cho các API danh sách (managements/fastpath.py): dựng JSON từ values_list()
+# thay vì serializer cho từng dòng. Đặt FAST_SERIALIZATION=0 để quay về serializer thường
+FAST_SERIALIZATION = os.environ.get('FAST_SERIALIZATION', '1') == '1'
+
 import pymysql
 pymysql.install_as_MySQLdb()
 
@@ -135,6 +238,13 @@ cloudinary.config(
 
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
+# Xử lý ảnh upload bất đồng bộ: nơi lưu ảnh đã xử lý (LocalImageStorage để dùng MEDIA_ROOT
+# thay Cloudinary), thư mục file tạm, số worker (0 = xử lý ngay trong tiến trình) và dung lượng tối đa
+IMAGE_STORAGE_BACKEND = os.environ.get('IMAGE_STORAGE_BACKEND', 'managements.images.CloudinaryImageStorage')
+IMAGE_UPLOAD_TEMP_DIR = os.environ.get('IMAGE_UPLOAD_TEMP_DIR', str(BASE_DIR / 'media' / 'uploads-tmp'))
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,118 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import DateField, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from managements.caches import invalidate_namespace, namespaced_key
+from managements.db.routers import primary_reads
+from managements.models import Activity, WorkoutPlan
+
+STATISTICS_NAMESPACE = 'activity-statistics'
+STATISTICS_CACHE_TIMEOUT = 86400
+
+PERIODS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+# Số kỳ trả về mặc định và tối đa cho mỗi loại kỳ
+DEFAULT_PERIOD_COUNT = {'day': 7, 'week': 8, 'month': 6}
+MAX_PERIOD_COUNT = {'day': 366, 'week': 104, 'month': 60}
+
+
+def statistics_namespace(user_id):
+    return f'{STATISTICS_NAMESPACE}:{user_id}'
+
+
+def invalidate_statistics(user_id):
+    invalidate_namespace(statistics_namespace(user_id))
+
+
+def invalidate_activity_statistics(activity):
+    """Activity đổi calo/thời gian: làm mới thống kê của chủ Activity và của mọi kế hoạch chứa nó"""
+    user_ids = set(WorkoutPlan.objects.filter(activities=activity).values_list('user_id', flat=True))
+    user_ids.add(activity.user_id)
+    for user_id in user_ids:
+        invalidate_statistics(user_id)
+
+
+def period_start(day, period):
+    """Ngày đầu kỳ chứa day (tuần bắt đầu từ thứ 2, như TruncWeek)"""
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_period(start, period):
+    if period == 'week':
+        return start + timedelta(days=7)
+    if period == 'month':
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+
+def period_starts(period, count, today):
+    """Ngày đầu của `count` kỳ gần nhất, kỳ hiện tại ở cuối"""
+    starts = [period_start(today, period)]
+    for _ in range(count - 1):
+        starts.append(period_start(starts[-1] - timedelta(days=1), period))
+    return starts[::-1]
+
+
+def aggregate_periods(user_id, period, start, end):
+    """
+    Tổng calo và thời gian tập theo kỳ trong [start, end): Activity của user theo ngày của
+    Activity, cộng activities trong WorkoutPlan theo ngày của kế hoạch. Gộp theo kỳ ngay
+    trong DB (TruncWeek/TruncMonth), mỗi nguồn một query.
+    """
+    trunc = PERIODS[period]
+    totals = {}
+    sources = (
+        (Activity.objects.filter(user_id=user_id, active=True), 'calories_burned', 'time'),
+        (WorkoutPlan.objects.filter(user_id=user_id, active=True), 'activities__calories_burned', 'activities__time'),
+    )
+    for queryset, calories_field, time_field in sources:
+        rows = (
+            queryset.filter(date__gte=start, date__lt=end)
+            .annotate(period=trunc('date', output_field=DateField()))
+            .order_by().values('period')
+            .annotate(calories=Sum(calories_field), time=Sum(time_field))
+        )
+        for row in rows:
+            total = totals.setdefault(row['period'], {'calories_burned': 0, 'time': 0})
+            total['calories_burned'] += row['calories'] or 0
+            total['time'] += row['time'] or 0
+    return totals
+
+
+def get_activity_statistics(user, period='week', count=None, today=None):
+    """
+    Thống kê `count` kỳ gần nhất của user: [{'date': ngày đầu kỳ, 'calories_burned', 'time'}].
+    Kỳ đã kết thúc được cache theo user + kỳ (STATISTICS_CACHE_TIMEOUT); chỉ kỳ hiện tại được
+    tính lại mỗi lần. Sửa dữ liệu cũ làm mới cache qua invalidate_statistics (signals).
+    """
+    today = today or timezone.localdate()
+    count = count or DEFAULT_PERIOD_COUNT[period]
+    starts = period_starts(period, count, today)
+    current = starts[-1]
+
+    keys = {start: namespaced_key(statistics_namespace(user.id), period, start.isoformat()) for start in starts[:-1]}
+    cached = cache.get_many(list(keys.values()))
+
+    missing = [start for start in starts[:-1] if keys[start] not in cached] + [current]
+    with primary_reads():
+        totals = aggregate_periods(user.id, period, missing[0], next_period(current, period))
+    computed = {
+        start: {'date': start, **totals.get(start, {'calories_burned': 0, 'time': 0})}
+        for start in missing
+    }
+    closed = {keys[start]: row for start, row in computed.items() if start != current}
+    if closed:
+        cache.set_many(closed, getattr(settings, 'STATISTICS_CACHE_TIMEOUT', STATISTICS_CACHE_TIMEOUT))
+
+    return [computed[start] if start in computed else cached[keys[start]] for start in starts]
@@ -1,8 +1,13 @@
 from django.contrib import admin
-from django.db.models import Count
+from django.http import HttpResponseRedirect, JsonResponse
 from django.template.response import TemplateResponse
 from django.urls import path
+from django.utils.dateparse import parse_date
+from managements.db.pool import pool_stats
+from managements.images import store_image_url
 from managements.models import *
+from managements.profiling import endpoint_report, profile_buffer, profiling_options
+from managements.stats import get_managements_stats, stats_range
 
 from oauth2_provider.models import AccessToken, Application
 
@@ -10,37 +15,64 @@ class MyAdminSite(admin.AdminSite):
     site_header = 'Health Management Administration'
 
     def get_urls(self):
-        return [path('managements-stats/', self.managements_stats)] + super().get_urls()
+        return [
+            path('managements-stats/', self.admin_view(self.managements_stats)),
+            path('profiling/', self.admin_view(self.profiling)),
+            path('profiling/json/', self.admin_view(self.profiling_json)),
+            path('db-pool/', self.admin_view(self.db_pool)),
+        ] + super().get_urls()
 
     def managements_stats(self, request):
-        stats = Activity.objects.annotate(activity_count=Count('active')).values('name', 'activity_count')
-        stat = HealthRecord.objects.annotate(re_count=Count('active')).values('bmi', 're_count', 'water_intake','height', 'weight', 'heart_rate', 'steps','date')
+        start = parse_date(request.GET.get('start') or '')
+        end = parse_date(request.GET.get('end') or '')
+        start, end = stats_range(start, end)
 
-        # Thêm thống kê số lượng mục tiêu theo loại
-        goal_stats = UserGoal.objects.values('goal_type').annotate(goal_count=Count('id')).order_by()
+        return TemplateResponse(request, 'admin/managements-stats.html', {
+            **self.each_context(request),
+            **get_managements_stats(start, end),
+        })
+
+    def profiling(self, request):
+        if request.method == 'POST':
+            profile_buffer.clear()
+            return HttpResponseRedirect(request.path)
+
+        records = profile_buffer.records()
+        return TemplateResponse(request, 'admin/profiling.html', {
+            **self.each_context(request),
+            'enabled': profiling_options()['ENABLED'],
+            'buffered': len(records),
+            'endpoints': endpoint_report(records),
+            'recent': records[-50:][::-1],
+        })
 
-        # Thêm thống kê số lượng nhật ký sức khỏe của mỗi người dùng
-        diary_stats = HealthDiary.objects.values('user__username').annotate(diary_count=Count('id')).order_by()
+    def profiling_json(self, request):
+        records = profile_buffer.records()
+        return JsonResponse({'endpoints': endpoint_report(records), 'records': records},
+                            json_dumps_params={'ensure_ascii': False})
 
-        # Thêm thống kê số lượng hoạt động
-        activity_stats = Activity.objects.annotate(activity_count=Count('workoutplan')).values('name',
-                                                                                               'activity_count').order_by()
+    def db_pool(self, request):
+        # Pool là của từng tiến trình: số liệu của worker đang xử lý request này
+        return JsonResponse({'pools': pool_stats()})
 
-        return TemplateResponse(request, 'admin/managements-stats.html', {
-            'stats': stats,
-            'stat': stat,
-            'goal_stats': goal_stats,
-            'diary_stats': diary_stats,
-            'activity_stats': activity_stats,  # Thêm dòng này
-        })
+class ImageUrlAdminMixin:
+    """Ảnh đổi trực tiếp trên trang admin: lưu sẵn URL để serializer không phải dựng lại"""
+    image_fields = ("image",)
 
-class UserAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        for field in self.image_fields:
+            if field in form.changed_data:
+                store_image_url(obj, field)
+
+class UserAdmin(ImageUrlAdminMixin, admin.ModelAdmin):
+    image_fields = ("avatar",)
     list_display = ("username", "email", "role", "is_staff", "is_active")
     list_filter = ("role", "is_staff", "is_active")
     search_fields = ("username", "email")
     ordering = ("id",)
 
-class ActivityAdmin(admin.ModelAdmin):
+class ActivityAdmin(ImageUrlAdminMixin, admin.ModelAdmin):
     list_display = ("name", "calories_burned", "active")
     search_fields = ("name", "description")
     list_filter = ("active",)
@@ -52,7 +84,7 @@ class WorkoutPlanAdmin(admin.ModelAdmin):
     list_filter = ("date", "user")
 
 
-class MealPlanAdmin(admin.ModelAdmin):
+class MealPlanAdmin(ImageUrlAdminMixin, admin.ModelAdmin):
     list_display = ("name", "user", "date", "calories_intake")
     search_fields = ("name", "user__username")
     list_filter = ("date", "user")
@@ -68,6 +100,12 @@ class HealthRecordAdmin(admin.ModelAdmin):
             kwargs["queryset"] = User.objects.filter(role=1)
         return super().formfield_for_dbfield(db_field, **kwargs)
 
+class DailyHealthSummaryAdmin(admin.ModelAdmin):
+    list_display = ("user", "date", "record_count", "steps_sum", "weight_avg", "bmi_avg")
+    search_fields = ("user__username",)
+    list_filter = ("date",)
+    date_hierarchy = "date"
+
 class CoachProfileAdmin(admin.ModelAdmin):
     list_display = ("user", "bio", "specialties", "years_of_experience", "certifications",)
     search_fields = ("user__username",)
@@ -91,6 +129,11 @@ class ChatMessageAdmin(admin.ModelAdmin):
     list_filter = ("is_read", "sender", "receiver", "timestamp")
     date_hierarchy = "timestamp"
 
+class ChatConversationAdmin(admin.ModelAdmin):
+    list_display = ("owner", "peer", "last_message_at", "unread_count")
+    search_fields = ("owner__username", "peer__username")
+    raw_id_fields = ("last_message",)
+
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -113,11 +156,13 @@ admin_site = MyAdminSite(name='admin')
 
 admin_site.register(User, UserAdmin)
 admin_site.register(HealthRecord, HealthRecordAdmin)
+admin_site.register(DailyHealthSummary, DailyHealthSummaryAdmin)
 admin_site.register(CoachProfile, CoachProfileAdmin)
 admin_site.register(Activity, ActivityAdmin)
 admin_site.register(WorkoutPlan, WorkoutPlanAdmin)
 admin_site.register(HealthDiary, HealthDiaryAdmin)
 admin_site.register(ChatMessage, ChatMessageAdmin)
+admin_site.register(ChatConversation, ChatConversationAdmin)
 # admin_site.register(Tag, TagAdmin)
 admin_site.register(UserGoal, UserGoalAdmin)
 admin_site.register(UserConnection, UserConnectionAdmin)
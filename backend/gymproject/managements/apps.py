@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ManagementsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'managements'
+
+    def ready(self):
+        from managements import signals  # noqa: F401
@@ -0,0 +1,163 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from oauth2_provider.contrib.rest_framework import OAuth2Authentication
+from oauth2_provider.models import get_access_token_model
+from rest_framework.exceptions import AuthenticationFailed
+
+
+REVOKED_TOKEN_KEY = 'token-revoked:{}'
+REVOKED_USER_KEY = 'token-user-revoked:{}'
+
+
+def token_checksum(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class TokenCache:
+    """
+    Cache LRU trong tiến trình cho access token đã xác thực: checksum -> (user, token).
+    Mỗi mục hết hạn sau TTL nhưng không quá thời điểm token hết hạn.
+
+    Thu hồi token hoặc thay đổi user (signal) xóa mục ở tiến trình hiện tại và ghi dấu thời
+    điểm vào cache dùng chung; mỗi lần hit đều đọc dấu này (một get_many) nên các tiến trình
+    khác bỏ mục được cache trước thời điểm đó ngay ở request kế tiếp, không đợi hết TTL.
+    """
+
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, checksum):
+        with self._lock:
+            entry = self._entries.get(checksum)
+            if entry is None:
+                self.misses += 1
+                return None
+            user, access_token, expires_at, cached_at = entry
+            if expires_at <= time.time():
+                del self._entries[checksum]
+                self.misses += 1
+                return None
+
+        if self.revoked_since(checksum, user.pk, cached_at):
+            with self._lock:
+                self._entries.pop(checksum, None)
+                self.misses += 1
+            return None
+        with self._lock:
+            if checksum in self._entries:
+                self._entries.move_to_end(checksum)
+            self.hits += 1
+        # Bản sao để thay đổi trong một request không lan sang request khác
+        user = copy.copy(user)
+        access_token = copy.copy(access_token)
+        access_token.user = user
+        return user, access_token
+
+    def revoked_since(self, checksum, user_id, cached_at):
+        markers = cache.get_many([REVOKED_TOKEN_KEY.format(checksum), REVOKED_USER_KEY.format(user_id)])
+        return any(marked_at >= cached_at for marked_at in markers.values())
+
+    def mark_revoked(self, key):
+        # Mục ở tiến trình khác sống tối đa TTL nên dấu chỉ cần giữ chừng đó
+        cache.set(key, time.time(), self.ttl)
+
+    def set(self, checksum, user, access_token):
+        now = time.time()
+        expires_at = min(now + self.ttl, access_token.expires.timestamp())
+        with self._lock:
+            self._entries[checksum] = (user, access_token, expires_at, now)
+            self._entries.move_to_end(checksum)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, checksum):
+        with self._lock:
+            self._entries.pop(checksum, None)
+        self.mark_revoked(REVOKED_TOKEN_KEY.format(checksum))
+
+    def discard_user(self, user_id):
+        with self._lock:
+            for checksum in [k for k, (user, _, _, _) in self._entries.items() if user.pk == user_id]:
+                del self._entries[checksum]
+        self.mark_revoked(REVOKED_USER_KEY.format(user_id))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Backend cache chỉ nằm trong tiến trình: dấu thu hồi không tới được worker khác
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache')
+
+
+def _build_cache():
+    options = getattr(settings, 'OAUTH2_TOKEN_CACHE', {})
+    ttl = options.get('TTL', 300)
+    if settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES:
+        ttl = min(ttl, options.get('LOCAL_TTL', 5))
+    return TokenCache(max_size=options.get('MAX_SIZE', 10000), ttl=ttl)
+
+
+token_cache = _build_cache()
+
+
+def lookup_token(token):
+    """(user, access_token) của một bearer token hợp lệ, dùng cache trước rồi mới tới DB"""
+    checksum = token_checksum(token)
+    cached = token_cache.get(checksum)
+    if cached is not None:
+        return cached
+
+    access_token = get_access_token_model().objects.select_related('application', 'user').filter(
+        token_checksum=checksum
+    ).first()
+    if access_token is None or not access_token.is_valid() or not access_token.user.is_active:
+        return None
+    token_cache.set(checksum, access_token.user, access_token)
+    return access_token.user, access_token
+
+
+class CachedOAuth2Authentication(OAuth2Authentication):
+    """
+    OAuth2Authentication có cache: token Bearer đã xác thực được lấy từ TokenCache,
+    không cần truy vấn AccessToken/User. Lần đầu (cache miss) vẫn đi qua toàn bộ
+    luồng kiểm tra của oauth2_provider rồi mới lưu vào cache.
+    """
+
+    def authenticate(self, request):
+        token = self.get_bearer_token(request)
+        if token:
+            checksum = token_checksum(token)
+            cached = token_cache.get(checksum)
+            if cached is not None and cached[1].is_valid():
+                return cached
+
+        result = super().authenticate(request)
+        if result is not None and not result[0].is_active:
+            # oauth2_provider không kiểm tra is_active; lookup_token (websocket) cũng từ chối user bị khóa
+            raise AuthenticationFailed('Tài khoản đã bị khóa.')
+        if token and result is not None:
+            user, access_token = result
+            if access_token is not None and access_token.user_id == user.pk:
+                token_cache.set(checksum, user, access_token)
+        return result
+
+    def get_bearer_token(self, request):
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if header[:7].lower() == 'bearer ':
+            return header[7:].strip() or None
+        return None
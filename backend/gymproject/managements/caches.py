@@ -0,0 +1,80 @@
+import hashlib
+import json
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from managements.db.routers import primary_reads
+
+ACTIVITY_NAMESPACE = 'activity-catalog'
+MEALPLAN_NAMESPACE = 'mealplan-catalog'
+
+
+def _version_key(namespace):
+    return f'ns-version:{namespace}'
+
+
+def namespace_version(namespace):
+    """
+    Phiên bản hiện tại của một namespace cache. Mọi key trong namespace đều gắn
+    phiên bản này, nên tăng phiên bản là vô hiệu hóa toàn bộ namespace.
+    Giá trị khởi tạo theo thời gian để key cũ không bị dùng lại khi cache bị xóa.
+    """
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_namespace(namespace):
+    key = _version_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def namespaced_key(namespace, *parts):
+    digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+    return f'{namespace}:{namespace_version(namespace)}:{digest}'
+
+
+def cached_response(namespace, timeout=None):
+    """
+    Cache dữ liệu trả về của một action GET theo host + path + query params,
+    kèm ETag để client gửi If-None-Match và nhận 304 khi dữ liệu chưa đổi.
+    Lưu dữ liệu đã chuẩn hóa JSON nên dùng được với cả LocMemCache và FileBasedCache.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(self, request, *args, **kwargs):
+            key = namespaced_key(
+                namespace, request.get_host(), request.path, sorted(request.query_params.lists())
+            )
+            entry = cache.get(key)
+            if entry is None:
+                with primary_reads():
+                    response = view_func(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                content = json.dumps(response.data, cls=JSONEncoder, sort_keys=True)
+                entry = (json.loads(content), quote_etag(hashlib.md5(content.encode('utf-8')).hexdigest()))
+                cache_timeout = timeout if timeout is not None else getattr(settings, 'CATALOG_CACHE_TIMEOUT', 600)
+                cache.set(key, entry, cache_timeout)
+
+            data, etag = entry
+            headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+            if_none_match = request.headers.get('If-None-Match')
+            if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            return Response(data, headers=headers)
+        return wrapper
+    return decorator
@@ -0,0 +1,97 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from managements.models import ChatConversation, ChatMessage
+
+
+def conversation_group(user_id, peer_id):
+    """Tên group của hội thoại giữa hai người, không phụ thuộc thứ tự"""
+    low, high = sorted([int(user_id), int(peer_id)])
+    return f'chat_{low}_{high}'
+
+
+def _group_send(group, event):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(group, event)
+
+
+def notify_message(chat_message):
+    """Đẩy tin nhắn vừa lưu tới các kết nối WebSocket của hội thoại"""
+    from managements.serializers import ChatMessageSerializer
+
+    data = ChatMessageSerializer(chat_message).data
+    _group_send(conversation_group(chat_message.sender_id, chat_message.receiver_id), {
+        'type': 'chat.message',
+        'message': dict(data),
+    })
+
+
+def notify_read(reader_id, peer_id, up_to=None, message_ids=None):
+    """
+    Đẩy xác nhận đã đọc cho các tin nhắn peer gửi tới reader: hoặc danh sách id,
+    hoặc mọi tin có id <= up_to (up_to=None nghĩa là toàn bộ hội thoại).
+    """
+    event = {'type': 'chat.read', 'reader': reader_id}
+    if message_ids is not None:
+        event['ids'] = list(message_ids)
+    else:
+        event['up_to'] = up_to
+    _group_send(conversation_group(reader_id, peer_id), event)
+
+
+def record_message(chat_message):
+    """Cập nhật hộp thư hai phía khi có tin nhắn mới: tin cuối và +1 chưa đọc cho người nhận"""
+    sides = (
+        (chat_message.sender_id, chat_message.receiver_id, 0),
+        (chat_message.receiver_id, chat_message.sender_id, 1),
+    )
+    for owner_id, peer_id, unread in sides:
+        values = {'last_message': chat_message, 'last_message_at': chat_message.timestamp}
+        conversations = ChatConversation.objects.filter(owner_id=owner_id, peer_id=peer_id)
+        if conversations.update(unread_count=F('unread_count') + unread, **values):
+            continue
+        try:
+            with transaction.atomic():
+                ChatConversation.objects.create(owner_id=owner_id, peer_id=peer_id, unread_count=unread, **values)
+        except IntegrityError:
+            # Request khác vừa tạo dòng này
+            conversations.update(unread_count=F('unread_count') + unread, **values)
+
+
+def refresh_conversation(owner_id, peer_id):
+    """Tính lại hộp thư owner-peer từ ChatMessage (khi tin nhắn bị sửa/xóa lẻ)"""
+    last = ChatMessage.objects.filter(
+        Q(sender_id=owner_id, receiver_id=peer_id) | Q(sender_id=peer_id, receiver_id=owner_id)
+    ).order_by('-id').only('id', 'timestamp').first()
+    if last is None:
+        ChatConversation.objects.filter(owner_id=owner_id, peer_id=peer_id).delete()
+        return
+    unread = ChatMessage.objects.filter(sender_id=peer_id, receiver_id=owner_id, is_read=False).count()
+    ChatConversation.objects.update_or_create(owner_id=owner_id, peer_id=peer_id, defaults={
+        'last_message': last, 'last_message_at': last.timestamp, 'unread_count': unread,
+    })
+
+
+def mark_read(reader, peer, up_to=None):
+    """
+    Đánh dấu đã đọc các tin nhắn peer gửi cho reader (tới id up_to nếu có) bằng một
+    câu UPDATE rồi trừ bộ đếm chưa đọc đúng số dòng vừa đổi. Trả về số tin đã đánh dấu.
+    """
+    queryset = ChatMessage.objects.filter(sender=peer, receiver=reader, is_read=False)
+    if up_to is not None:
+        queryset = queryset.filter(id__lte=up_to)
+
+    with transaction.atomic():
+        count = queryset.update(is_read=True, updated_at=timezone.now())
+        if count:
+            ChatConversation.objects.filter(owner=reader, peer=peer).update(unread_count=Case(
+                When(unread_count__gt=count, then=F('unread_count') - count), default=0,
+            ))
+    if count:
+        transaction.on_commit(lambda: notify_read(reader.id, peer.id, up_to=up_to))
+    return count
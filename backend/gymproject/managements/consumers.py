@@ -0,0 +1,73 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from managements.chat import conversation_group, mark_read
+from managements.models import ChatMessage, User
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Kênh WebSocket cho một hội thoại: ws/chat/<peer_id>/
+
+    Server đẩy về:
+        {"type": "message", "message": {...}}
+        {"type": "read", "reader": <id>, "up_to": <id>|null}   # mọi tin có id <= up_to (null: tất cả)
+        {"type": "read", "reader": <id>, "ids": [...]}
+    Client gửi lên:
+        {"type": "message", "message": "..."}
+        {"type": "read", "up_to": <id>}
+    """
+
+    async def connect(self):
+        self.user = self.scope.get('user')
+        if not self.user or not self.user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.peer = await self.get_peer(self.scope['url_route']['kwargs']['peer_id'])
+        if self.peer is None:
+            await self.close(code=4404)
+            return
+
+        self.group_name = conversation_group(self.user.id, self.peer.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        action = content.get('type')
+        if action == 'message':
+            message = (content.get('message') or '').strip()
+            if not message or len(message) > 1000:
+                await self.send_json({'type': 'error', 'message': 'Tin nhắn không hợp lệ'})
+                return
+            # post_save sẽ đẩy tin nhắn tới cả hai phía
+            await self.save_message(message)
+        elif action == 'read':
+            up_to = content.get('up_to')
+            if up_to is not None:
+                try:
+                    up_to = int(up_to)
+                except (TypeError, ValueError):
+                    await self.send_json({'type': 'error', 'message': 'up_to phải là id tin nhắn'})
+                    return
+            await database_sync_to_async(mark_read)(self.user, self.peer, up_to)
+        else:
+            await self.send_json({'type': 'error', 'message': 'Loại sự kiện không hợp lệ'})
+
+    async def chat_message(self, event):
+        await self.send_json({'type': 'message', 'message': event['message']})
+
+    async def chat_read(self, event):
+        await self.send_json({'type': 'read', **{k: v for k, v in event.items() if k != 'type'}})
+
+    @database_sync_to_async
+    def get_peer(self, peer_id):
+        return User.objects.filter(id=peer_id, is_active=True).first()
+
+    @database_sync_to_async
+    def save_message(self, message):
+        return ChatMessage.objects.create(sender=self.user, receiver=self.peer, message=message)
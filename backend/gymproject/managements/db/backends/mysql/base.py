@@ -0,0 +1,10 @@
+from django.db.backends.mysql import base
+
+from managements.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """Backend MySQL (pymysql) dùng pool kết nối: ENGINE = 'managements.db.backends.mysql'"""
+
+    def ping_connection(self, connection):
+        connection.ping(reconnect=False)
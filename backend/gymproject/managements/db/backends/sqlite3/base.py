@@ -0,0 +1,10 @@
+from django.db.backends.sqlite3 import base
+
+from managements.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """Bản SQLite của backend có pool, để chạy thử pool ở máy dev (bench_db_pool)"""
+
+    def ping_connection(self, connection):
+        connection.execute('SELECT 1')
@@ -0,0 +1,51 @@
+from django.core.exceptions import MiddlewareNotUsed
+
+from managements.db.routers import mark_sticky, replica_options, reset_routing, routing
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaMiddleware:
+    """
+    Cho phép ReplicaRouter đọc từ replica trong request an toàn, và đánh dấu user
+    đọc từ primary một thời gian sau khi họ POST/PUT/PATCH/DELETE thành công.
+    Chỉ chạy khi READ_REPLICAS['ALIASES'] có replica.
+    """
+
+    def __init__(self, get_response):
+        if not replica_options()['ALIASES']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        safe = request.method in SAFE_METHODS
+        token = routing(request, allow_replica=safe)
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_routing(token)
+
+        if safe and response.streaming:
+            # Nội dung stream (export/) được đọc sau khi middleware trả về
+            stream = self.astream if response.is_async else self.stream
+            response.streaming_content = stream(response.streaming_content, request)
+        if not safe and response.status_code < 400:
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                mark_sticky(user.pk)
+        return response
+
+    def stream(self, content, request):
+        token = routing(request, allow_replica=True)
+        try:
+            yield from content
+        finally:
+            reset_routing(token)
+
+    async def astream(self, content, request):
+        token = routing(request, allow_replica=True)
+        try:
+            async for part in content:
+                yield part
+        finally:
+            reset_routing(token)
@@ -0,0 +1,247 @@
+import hashlib
+import threading
+import time
+from collections import deque
+from operator import itemgetter
+
+from django.db.utils import OperationalError
+
+
+class PoolTimeout(OperationalError):
+    """Hết kết nối trong pool (kể cả overflow) và chờ quá TIMEOUT giây"""
+
+
+class ConnectionPool:
+    """
+    Pool kết nối DB-API dùng chung giữa các thread của một tiến trình.
+
+    - max_size: số kết nối rảnh được giữ lại để dùng tiếp.
+    - max_overflow: số kết nối được mở thêm khi pool đã dùng hết; trả về là đóng luôn.
+    - timeout: số giây chờ khi đã mở đủ max_size + max_overflow kết nối.
+    - recycle: kết nối cũ hơn số giây này bị đóng thay vì dùng lại (nhỏ hơn wait_timeout của MySQL).
+    - pre_ping: kiểm tra kết nối bằng ping trước khi cho mượn, kết nối hỏng bị thay bằng kết nối mới.
+    """
+
+    def __init__(self, ping, max_size=10, max_overflow=10, timeout=10, recycle=3600, pre_ping=True):
+        self.ping = ping
+        self.max_size = max_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self._idle = deque()
+        self._checked_out = {}
+        self._open = 0
+        self._condition = threading.Condition()
+        self.closed = False
+        self.counters = dict.fromkeys(
+            ('created', 'reused', 'recycled', 'ping_failures', 'overflow_closed', 'waits', 'timeouts'), 0
+        )
+
+    def _count(self, name):
+        self.counters[name] += 1
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _forget(self):
+        with self._condition:
+            self._open -= 1
+            self._condition.notify()
+
+    def _checkout(self):
+        """(kết nối rảnh, thời điểm tạo) hoặc (None, None) nếu được phép mở kết nối mới"""
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            waited = False
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._open < self.max_size + self.max_overflow:
+                    self._open += 1
+                    return None, None
+                if not waited:
+                    waited = True
+                    self._count('waits')
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._count('timeouts')
+                    raise PoolTimeout(
+                        f'Hết kết nối trong pool ({self.max_size} + {self.max_overflow} overflow) '
+                        f'sau {self.timeout} giây chờ.'
+                    )
+                self._condition.wait(remaining)
+
+    def acquire(self, creator):
+        while True:
+            connection, created_at = self._checkout()
+            if connection is None:
+                try:
+                    connection = creator()
+                except Exception:
+                    self._forget()
+                    raise
+                created_at = time.monotonic()
+                with self._condition:
+                    self._count('created')
+                    self._checked_out[id(connection)] = created_at
+                return connection
+
+            if self.recycle is not None and time.monotonic() - created_at > self.recycle:
+                self._close(connection)
+                self._forget()
+                with self._condition:
+                    self._count('recycled')
+                continue
+            if self.pre_ping and not self._alive(connection):
+                self._close(connection)
+                self._forget()
+                with self._condition:
+                    self._count('ping_failures')
+                continue
+            with self._condition:
+                self._count('reused')
+                self._checked_out[id(connection)] = created_at
+            return connection
+
+    def _alive(self, connection):
+        try:
+            self.ping(connection)
+        except Exception:
+            return False
+        return True
+
+    def release(self, connection, usable=True):
+        """Trả kết nối về pool; kết nối hỏng, quá hạn hoặc thừa (overflow) bị đóng"""
+        with self._condition:
+            created_at = self._checked_out.pop(id(connection), None)
+            keep = (
+                usable and not self.closed and created_at is not None and len(self._idle) < self.max_size
+                and (self.recycle is None or time.monotonic() - created_at <= self.recycle)
+            )
+            if keep:
+                self._idle.append((connection, created_at))
+                self._condition.notify()
+                return
+            if usable and created_at is not None and len(self._idle) >= self.max_size:
+                self._count('overflow_closed')
+        self._close(connection)
+        if created_at is not None:
+            self._forget()
+
+    def close_idle(self):
+        with self._condition:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._condition.notify_all()
+        for connection, _ in idle:
+            self._close(connection)
+
+    def close(self):
+        """Bỏ pool (tham số kết nối đã đổi): đóng kết nối rảnh, kết nối đang mượn bị đóng khi trả về"""
+        with self._condition:
+            self.closed = True
+        self.close_idle()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': len(self._checked_out),
+                'max_size': self.max_size,
+                'max_overflow': self.max_overflow,
+                **self.counters,
+            }
+
+
+# alias -> (chữ ký tham số kết nối, pool)
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool_signature(conn_params, options):
+    """Băm tham số kết nối + POOL: đổi NAME/HOST/... (override_settings, test DB) là pool mới"""
+    raw = repr((sorted(conn_params.items(), key=itemgetter(0)), sorted(options.items())))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def get_pool(alias, options, ping, signature=None):
+    entry = _pools.get(alias)
+    if entry is not None and entry[0] == signature:
+        return entry[1]
+    with _pools_lock:
+        entry = _pools.get(alias)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        pool = ConnectionPool(
+            ping,
+            max_size=options.get('MAX_SIZE', 10),
+            max_overflow=options.get('MAX_OVERFLOW', 10),
+            timeout=options.get('TIMEOUT', 10),
+            recycle=options.get('RECYCLE', 3600),
+            pre_ping=options.get('PRE_PING', True),
+        )
+        _pools[alias] = (signature, pool)
+    if entry is not None:
+        # Kết nối rảnh của pool cũ trỏ tới DB cũ, không được cho mượn nữa
+        entry[1].close()
+    return pool
+
+
+def close_pool(alias):
+    with _pools_lock:
+        entry = _pools.pop(alias, None)
+    if entry is not None:
+        entry[1].close()
+
+
+def pool_stats():
+    """Số liệu của các pool trong tiến trình hiện tại, theo alias"""
+    return {alias: pool.stats() for alias, (_, pool) in list(_pools.items())}
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Mixin cho DatabaseWrapper: lấy kết nối từ pool thay vì mở mới, và close() trả kết nối
+    về pool thay vì đóng hẳn. Cấu hình qua khóa POOL của DATABASES[alias].
+    """
+
+    def ping_connection(self, connection):
+        raise NotImplementedError
+
+    def get_pool(self, conn_params):
+        options = self.settings_dict.get('POOL', {})
+        return get_pool(self.alias, options, self.ping_connection, pool_signature(conn_params, options))
+
+    @property
+    def pool(self):
+        return self.get_pool(self.get_connection_params())
+
+    def get_new_connection(self, conn_params):
+        creator = super().get_new_connection
+        # Nhớ pool đã cho mượn để trả đúng chỗ kể cả khi tham số kết nối đổi giữa chừng
+        self._borrowed_from = self.get_pool(conn_params)
+        return self._borrowed_from.acquire(lambda: creator(conn_params))
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # Đóng giữa atomic block thì wrapper còn giữ kết nối: đóng hẳn, không trả về pool
+        usable = not self.in_atomic_block
+        with self.wrap_database_errors:
+            if usable and not self.get_autocommit():
+                # Không để transaction dang dở cho request sau
+                try:
+                    self.connection.rollback()
+                except Exception:
+                    usable = False
+            if usable and self.errors_occurred:
+                usable = self.is_usable()
+        pool = getattr(self, '_borrowed_from', None) or self.pool
+        self._borrowed_from = None
+        pool.release(self.connection, usable=usable)
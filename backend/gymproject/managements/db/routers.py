@@ -0,0 +1,117 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_KEY = 'replica-sticky:{}'
+
+_state = ContextVar('managements_replica_routing', default=None)
+
+
+def replica_options():
+    options = getattr(settings, 'READ_REPLICAS', {})
+    return {
+        'ALIASES': list(options.get('ALIASES', [])),
+        'STICKY_SECONDS': options.get('STICKY_SECONDS', 10),
+        'PRIMARY_APPS': set(options.get('PRIMARY_APPS', ())),
+    }
+
+
+def mark_sticky(user_id):
+    """User vừa ghi dữ liệu: đọc từ primary trong STICKY_SECONDS giây (read-your-writes)"""
+    cache.set(STICKY_KEY.format(user_id), True, replica_options()['STICKY_SECONDS'])
+
+
+def is_sticky(user_id):
+    return bool(cache.get(STICKY_KEY.format(user_id)))
+
+
+class ReplicaState:
+    """Trạng thái định tuyến của một request; replica chỉ được dùng cho request an toàn (GET/HEAD/OPTIONS)"""
+
+    def __init__(self, request, allow_replica, replica):
+        self.request = request
+        self.allow_replica = allow_replica
+        self.replica = replica
+        self.user_id = None
+        self.alias = None
+        self._resolving = False
+
+    def read_alias(self):
+        if not self.allow_replica or self._resolving:
+            return DEFAULT_DB_ALIAS
+        # request.user có thể chưa được nạp (session) hoặc vừa được DRF gán sau khi xác thực token
+        self._resolving = True
+        try:
+            user = getattr(self.request, 'user', None)
+            user_id = user.pk if user is not None and user.is_authenticated else None
+        finally:
+            self._resolving = False
+        if self.alias is None or user_id != self.user_id:
+            self.user_id = user_id
+            self.alias = DEFAULT_DB_ALIAS if user_id and is_sticky(user_id) else self.replica
+        return self.alias
+
+
+@contextmanager
+def primary_reads():
+    """
+    Đọc từ primary trong khối này. Dùng khi kết quả được ghi vào cache: ngay sau khi signal
+    vô hiệu hóa một namespace, replica có thể còn trễ và dữ liệu cũ sẽ bị cache suốt TTL.
+    """
+    token = _state.set(None)
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+def routing(request, allow_replica):
+    """Đặt trạng thái định tuyến cho request; trả về token để reset_routing"""
+    aliases = replica_options()['ALIASES']
+    return _state.set(ReplicaState(request, allow_replica and bool(aliases), random.choice(aliases) if aliases else None))
+
+
+def reset_routing(token):
+    _state.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Đọc từ replica (DATABASES theo READ_REPLICAS['ALIASES']) cho request GET, trừ khi:
+    - không nằm trong request (lệnh quản trị, worker, signal sau commit...);
+    - đang ở trong transaction trên primary (phải thấy dữ liệu vừa ghi);
+    - model thuộc PRIMARY_APPS (session, token OAuth2 vừa cấp...);
+    - user vừa ghi dữ liệu trong STICKY_SECONDS giây.
+    Mọi thao tác ghi và migrate đều chạy trên primary. READ_REPLICAS được đọc lại mỗi lần
+    (override_settings trong test có hiệu lực).
+    """
+
+    @property
+    def replicas(self):
+        return set(replica_options()['ALIASES'])
+
+    def db_for_read(self, model, **hints):
+        options = replica_options()
+        if not options['ALIASES'] or model._meta.app_label in options['PRIMARY_APPS']:
+            return DEFAULT_DB_ALIAS
+        state = _state.get()
+        if state is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replica là bản sao của primary nên quan hệ giữa các DB này luôn hợp lệ
+        databases = self.replicas | {DEFAULT_DB_ALIAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in self.replicas
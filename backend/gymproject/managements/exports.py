@@ -0,0 +1,100 @@
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from managements.models import Activity, HealthDiary, HealthRecord, MealPlan, WorkoutPlan
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+# Các bảng có thể xuất: (model, cột, quan hệ nhiều-nhiều xuất dạng danh sách id)
+EXPORTS = {
+    'healthrecord': (HealthRecord, ['id', 'date', 'water_intake', 'steps', 'heart_rate', 'height', 'weight', 'bmi'], None),
+    'healthdiary': (HealthDiary, ['id', 'date', 'content', 'feeling'], None),
+    'workoutplan': (WorkoutPlan, ['id', 'date', 'name', 'description', 'sets', 'reps'], 'activities'),
+    'mealplan': (MealPlan, ['id', 'date', 'name', 'description', 'calories_intake', 'goal'], None),
+}
+
+
+def export_columns(kind):
+    _, fields, m2m = EXPORTS[kind]
+    return fields + [m2m] if m2m else list(fields)
+
+
+def iter_chunks(kind, user, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Duyệt lịch sử của user theo từng chunk keyset (id > id cuối), mỗi lần một danh sách dòng,
+    nên bộ nhớ không phụ thuộc độ dài lịch sử, kể cả với driver MySQL vốn đọc hết kết quả của một câu.
+    """
+    model, fields, m2m = EXPORTS[kind]
+    queryset = model.objects.filter(user=user, active=True).order_by('id')
+    if m2m:
+        queryset = queryset.prefetch_related(Prefetch(m2m, queryset=Activity.objects.only('id')))
+
+    last_id = 0
+    while True:
+        chunk = queryset.filter(id__gt=last_id)[:chunk_size]
+        if m2m:
+            rows = [
+                {**{field: getattr(obj, field) for field in fields}, m2m: [a.id for a in getattr(obj, m2m).all()]}
+                for obj in chunk
+            ]
+        else:
+            rows = list(chunk.values(*fields))
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+
+class Echo:
+    """Đối tượng giả file cho csv.writer: trả về luôn dòng vừa ghi thay vì lưu lại"""
+
+    def write(self, value):
+        return value
+
+
+def csv_values(row, columns):
+    return [';'.join(str(v) for v in row[c]) if isinstance(row[c], list) else row[c] for c in columns]
+
+
+def iter_csv(kind, user):
+    """Dòng tiêu đề rồi mỗi chunk một đoạn CSV"""
+    columns = export_columns(kind)
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for rows in iter_chunks(kind, user):
+        yield ''.join(writer.writerow(csv_values(row, columns)) for row in rows)
+
+
+def iter_ndjson(kinds, user):
+    for kind in kinds:
+        for rows in iter_chunks(kind, user):
+            yield ''.join(
+                json.dumps({'type': kind, **row}, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n' for row in rows
+            )
+
+
+def iter_export(kind, user, export_format):
+    """kind = tên bảng hoặc 'all' (chỉ hỗ trợ với ndjson vì các bảng khác cột)"""
+    if export_format == 'csv':
+        return iter_csv(kind, user)
+    kinds = list(EXPORTS) if kind == 'all' else [kind]
+    return iter_ndjson(kinds, user)
+
+
+async def aiter_export(kind, user, export_format):
+    """
+    iter_export cho ASGI: StreamingHttpResponse gặp iterator đồng bộ sẽ đọc hết vào bộ nhớ
+    trước khi gửi. Ở đây mỗi bước (một query chunk) chạy qua sync_to_async, không chặn event loop.
+    """
+    chunks = iter_export(kind, user, export_format)
+    fetch = sync_to_async(next)
+    while True:
+        chunk = await fetch(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
@@ -0,0 +1,208 @@
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PKOnlyObject, PrimaryKeyRelatedField
+
+
+class FastPathUnsupported(Exception):
+    """Serializer có field mà đường nhanh không dựng lại được, cần dùng serializer thường"""
+
+
+# Kế hoạch đã phân tích cho từng serializer class (chỉ phụ thuộc vào khai báo field)
+_plans = {}
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        raise FastPathUnsupported(f'{model.__name__}.{name}')
+
+
+def _build_plan(serializer, model, prefix=''):
+    """
+    Phân tích các field đọc được của serializer thành danh sách (loại, tên, dữ liệu):
+    'value' đọc thẳng một cột, 'method' gọi SerializerMethodField trên instance dựng từ
+    các cột khai báo trong fast_sources, 'nested' là serializer lồng qua khóa ngoại,
+    'many' là danh sách pk của quan hệ nhiều-nhiều.
+    """
+    plan = []
+    fast_sources = getattr(type(serializer), 'fast_sources', {})
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        source = field.source
+        if isinstance(field, serializers.SerializerMethodField):
+            if name not in fast_sources:
+                raise FastPathUnsupported(name)
+            # Cột theo đúng thứ tự concrete_fields, luôn kèm pk, để dùng Model.from_db
+            wanted = {model._meta.pk.attname} | {_model_field(model, s).attname for s in fast_sources[name]}
+            attnames = [f.attname for f in model._meta.concrete_fields if f.attname in wanted]
+            plan.append(('method', name, (field.method_name, [prefix + a for a in attnames], attnames)))
+        elif source == '*' or '.' in source:
+            raise FastPathUnsupported(name)
+        elif isinstance(field, ManyRelatedField):
+            model_field = _model_field(model, source)
+            if prefix or not model_field.many_to_many or not isinstance(field.child_relation, PrimaryKeyRelatedField) \
+                    or field.child_relation.pk_field is not None:
+                raise FastPathUnsupported(name)
+            plan.append(('many', name, model_field))
+        elif isinstance(field, serializers.ListSerializer):
+            raise FastPathUnsupported(name)
+        elif isinstance(field, serializers.BaseSerializer):
+            model_field = _model_field(model, source)
+            if not (model_field.many_to_one or model_field.one_to_one) or model_field.auto_created:
+                raise FastPathUnsupported(name)
+            related = model_field.related_model
+            nested_prefix = f'{prefix}{source}__'
+            plan.append(('nested', name, (
+                nested_prefix + related._meta.pk.attname, _build_plan(field, related, nested_prefix),
+            )))
+        elif isinstance(field, PrimaryKeyRelatedField):
+            if field.pk_field is not None:
+                raise FastPathUnsupported(name)
+            plan.append(('value', name, prefix + _model_field(model, source).attname))
+        else:
+            model_field = _model_field(model, source)
+            if not model_field.concrete or model_field.is_relation:
+                raise FastPathUnsupported(name)
+            plan.append(('value', name, prefix + source))
+    return plan
+
+
+def get_plan(serializer_class):
+    plan = _plans.get(serializer_class)
+    if plan is None:
+        plan = _plans[serializer_class] = _build_plan(serializer_class(), serializer_class.Meta.model)
+    return plan
+
+
+class FastSerializer:
+    """
+    Đường đọc nhanh cho danh sách: lấy dữ liệu bằng values_list() và dựng output qua
+    các hàm trích xuất đã biên dịch sẵn, không tạo model instance hay serializer cho
+    từng dòng. Kết quả giống hệt serializer gốc vì vẫn dùng to_representation của
+    từng field và chính các SerializerMethodField.
+
+        fast = FastSerializer(HealthRecordSerializer, context)
+        rows = fast.values(queryset)          # có thể đưa qua paginator
+        data = fast.serialize(page_rows)
+    """
+
+    def __init__(self, serializer_class, context=None):
+        plan = get_plan(serializer_class)
+        self.model = serializer_class.Meta.model
+        self.serializer = serializer_class(context=context or {})
+        self.paths = [self.model._meta.pk.attname]
+        self.many = []
+        self.build = self._compile(plan, self.serializer, self.model)
+
+    def _index(self, path):
+        if path not in self.paths:
+            self.paths.append(path)
+        return self.paths.index(path)
+
+    def _compile(self, plan, serializer, model):
+        """Hàm dựng dict cho một cấp serializer; các method field dùng chung một instance mỗi dòng"""
+        extractors = []
+        method_attnames = set()
+        for kind, name, data in plan:
+            field = serializer.fields[name]
+            if kind == 'value':
+                to_representation = field.to_representation
+                if isinstance(field, PrimaryKeyRelatedField):
+                    # Giống use_pk_only_optimization của DRF: field nhận đối tượng có .pk
+                    to_representation = lambda value, field=field: field.to_representation(PKOnlyObject(value))
+                extractors.append((name, self._value(self._index(data), to_representation)))
+            elif kind == 'method':
+                method_name, paths, attnames = data
+                method_attnames.update(attnames)
+                extractors.append((name, self._method(getattr(field.parent, method_name))))
+            elif kind == 'nested':
+                pk_path, nested_plan = data
+                nested = self._compile(nested_plan, field, field.Meta.model)
+                extractors.append((name, self._nested(self._index(pk_path), nested)))
+            else:
+                slot = len(self.many)
+                self.many.append(data)
+                extractors.append((name, self._many(slot)))
+
+        if not method_attnames:
+            def build(row, related):
+                return {name: extractor(row, related, None) for name, extractor in extractors}
+            return build
+
+        # Cột theo đúng thứ tự concrete_fields như Model.from_db yêu cầu
+        attnames = [f.attname for f in model._meta.concrete_fields if f.attname in method_attnames]
+        paths = {}
+        for kind, name, data in plan:
+            if kind == 'method':
+                paths.update(zip(data[2], data[1]))
+        indexes = [self._index(paths[attname]) for attname in attnames]
+
+        def build(row, related):
+            instance = model.from_db(None, attnames, [row[i] for i in indexes])
+            return {name: extractor(row, related, instance) for name, extractor in extractors}
+        return build
+
+    @staticmethod
+    def _value(index, to_representation):
+        def extract(row, related, instance):
+            value = row[index]
+            return None if value is None else to_representation(value)
+        return extract
+
+    @staticmethod
+    def _method(method):
+        def extract(row, related, instance):
+            return method(instance)
+        return extract
+
+    @staticmethod
+    def _nested(pk_index, build):
+        def extract(row, related, instance):
+            if row[pk_index] is None:
+                return None
+            return build(row, related)
+        return extract
+
+    @staticmethod
+    def _many(slot):
+        def extract(row, related, instance):
+            return related[slot].get(row[0], [])
+        return extract
+
+    def values(self, queryset):
+        return queryset.prefetch_related(None).values_list(*self.paths)
+
+    def _related(self, rows):
+        # Mỗi quan hệ nhiều-nhiều là một query cho cả trang, theo thứ tự mặc định của model đích
+        ids = [row[0] for row in rows]
+        related = []
+        for model_field in self.many:
+            lookup = model_field.related_query_name()
+            grouped = {}
+            if ids:
+                pairs = model_field.related_model._default_manager.filter(
+                    **{f'{lookup}__in': ids}
+                ).values_list(lookup, 'pk')
+                for owner_id, pk in pairs:
+                    grouped.setdefault(owner_id, []).append(pk)
+            related.append(grouped)
+        return related
+
+    def serialize(self, rows):
+        rows = list(rows)
+        related = self._related(rows) if self.many else []
+        build = self.build
+        return [build(row, related) for row in rows]
+
+
+def fast_serializer(serializer_class, context=None):
+    """FastSerializer nếu serializer hỗ trợ đường nhanh và FAST_SERIALIZATION bật, ngược lại None"""
+    if not getattr(settings, 'FAST_SERIALIZATION', True):
+        return None
+    try:
+        return FastSerializer(serializer_class, context)
+    except FastPathUnsupported:
+        return None
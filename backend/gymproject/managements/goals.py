@@ -0,0 +1,137 @@
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from managements.caches import invalidate_namespace, namespaced_key
+from managements.db.routers import primary_reads
+from managements.models import DailyHealthSummary, HealthRecord, UserGoal
+
+GOAL_NAMESPACE = 'goal-progress'
+GOAL_TREND_DAYS = 30
+
+
+def progress_percent(start_weight, current_weight, target_weight):
+    """
+    Phần trăm hoàn thành mục tiêu cân nặng (0 - 100) tính từ cân nặng lúc đặt mục tiêu,
+    dùng cho cả giảm và tăng cân. None nếu thiếu số liệu.
+    """
+    if start_weight is None or current_weight is None or target_weight is None:
+        return None
+    if start_weight == target_weight:
+        return 100.0
+    percent = (start_weight - current_weight) / (start_weight - target_weight) * 100
+    return round(min(max(percent, 0.0), 100.0), 1)
+
+
+def least_squares_slope(points):
+    """Hệ số góc của đường hồi quy bình phương tối thiểu qua các điểm (x, y); None nếu < 2 điểm"""
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    denominator = sum((x - mean_x) ** 2 for x, _ in points)
+    if denominator == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / denominator
+
+
+def goal_namespace(user_id):
+    return f'{GOAL_NAMESPACE}:{user_id}'
+
+
+def invalidate_goal_progress(user_id):
+    invalidate_namespace(goal_namespace(user_id))
+
+
+def weight_trend(user_id, today, days=None):
+    """
+    Cân nặng trung bình theo ngày trong `days` ngày gần nhất (lấy từ DailyHealthSummary
+    vốn được cập nhật dần khi có HealthRecord) và độ dốc kg/ngày.
+    """
+    days = days or getattr(settings, 'GOAL_TREND_DAYS', GOAL_TREND_DAYS)
+    start = today - timedelta(days=days - 1)
+    points = [
+        ((date - start).days, weight)
+        for date, weight in DailyHealthSummary.objects.filter(
+            user_id=user_id, date__range=(start, today), weight_avg__isnull=False,
+        ).order_by('date').values_list('date', 'weight_avg')
+    ]
+    return points, least_squares_slope(points)
+
+
+def build_goal_progress(goal, current_weight, slope, today):
+    target = goal.target_weight
+    progress = progress_percent(goal.start_weight, current_weight, target)
+    remaining = None if target is None or current_weight is None else round(target - current_weight, 2)
+
+    # Đã đạt khi cân nặng hiện tại bằng hoặc vượt mục tiêu theo hướng của mục tiêu
+    reached = None
+    if remaining is not None:
+        direction = None if goal.start_weight is None else target - goal.start_weight
+        reached = remaining == 0 or bool(direction and remaining * direction <= 0)
+
+    # Ngày dự kiến đạt mục tiêu nếu xu hướng hiện tại đang đi về phía mục tiêu
+    projected_date = None
+    if reached is False and slope and remaining * slope > 0:
+        projected_date = today + timedelta(days=math.ceil(remaining / slope))
+
+    on_track = None
+    if goal.target_date and reached is not None:
+        on_track = reached or (projected_date is not None and projected_date <= goal.target_date)
+
+    return {
+        'id': goal.id,
+        'goal_type': goal.goal_type,
+        'target_weight': target,
+        'target_date': goal.target_date,
+        'start_weight': goal.start_weight,
+        'current_weight': current_weight,
+        'remaining': remaining,
+        'progress': progress,
+        'slope_per_week': None if slope is None else round(slope * 7, 3),
+        'reached': reached,
+        'projected_date': projected_date,
+        'on_track': on_track,
+    }
+
+
+def start_weight_subquery():
+    """Cân nặng trung bình của ngày đầu tiên có số liệu kể từ khi đặt mục tiêu (annotate trên UserGoal)"""
+    return Subquery(
+        DailyHealthSummary.objects.filter(
+            user_id=OuterRef('user_id'), date__gte=OuterRef('created_date'), weight_avg__isnull=False,
+        ).order_by('date').values('weight_avg')[:1]
+    )
+
+
+def goals_with_start_weight(user_id):
+    return UserGoal.objects.filter(user_id=user_id, active=True).annotate(start_weight=start_weight_subquery())
+
+
+def get_goals_progress(user):
+    """
+    Tiến độ mọi mục tiêu của user, cache theo từng mục tiêu (GOAL_PROGRESS_CACHE_TIMEOUT).
+    Cache của user bị vô hiệu hóa khi HealthRecord hoặc mục tiêu thay đổi; chuỗi cân nặng
+    chỉ được đọc khi có mục tiêu chưa có trong cache và dùng chung cho các mục tiêu đó.
+    """
+    today = timezone.localdate()
+    goals = list(goals_with_start_weight(user.id))
+    keys = {goal.id: namespaced_key(goal_namespace(user.id), goal.id, today.isoformat()) for goal in goals}
+    cached = cache.get_many(list(keys.values()))
+
+    missing = [goal for goal in goals if keys[goal.id] not in cached]
+    if missing:
+        with primary_reads():
+            current_weight = HealthRecord.objects.filter(
+                user_id=user.id, active=True, weight__isnull=False
+            ).order_by('-date', '-id').values_list('weight', flat=True).first()
+            _, slope = weight_trend(user.id, today)
+        computed = {keys[goal.id]: build_goal_progress(goal, current_weight, slope, today) for goal in missing}
+        cache.set_many(computed, getattr(settings, 'GOAL_PROGRESS_CACHE_TIMEOUT', 3600))
+        cached.update(computed)
+
+    return [cached[keys[goal.id]] for goal in goals]
@@ -0,0 +1,358 @@
+import io
+import logging
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import connections, models, transaction
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps
+
+from managements.models import ImageStatus
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
+
+# Các phiên bản ảnh: tên -> (rộng, cao, cắt vuông hay giữ tỉ lệ)
+IMAGE_VARIANTS = {
+    'thumbnail': (150, 150, True),
+    'medium': (600, 600, False),
+}
+
+# File tạm mang theo bản ghi và field cần xử lý để xử lý lại được sau khi tiến trình khởi động lại
+TEMP_NAME_RE = re.compile(r'^(?P<label>\w+\.\w+)-(?P<pk>\d+)-(?P<field>\w+)-[0-9a-f]{32}\.\w+$')
+# File tạm cũ hơn chừng này giây mà chưa được xử lý xong thì coi như việc đã mất
+IMAGE_STALE_SECONDS = 15 * 60
+
+# Thư mục lưu theo (model, field), giống folder của các CloudinaryField
+IMAGE_FOLDERS = {
+    ('managements.User', 'avatar'): 'avatar',
+    ('managements.Activity', 'image'): 'activity',
+    ('managements.MealPlan', 'image'): 'mealplan_images',
+}
+
+
+class InvalidImage(Exception):
+    pass
+
+
+class ImageStorage:
+    """Nơi lưu ảnh đã xử lý. save() trả về {'public_id': giá trị lưu vào field ảnh, 'url': ...}"""
+
+    def save(self, content, folder, name):
+        raise NotImplementedError
+
+
+class CloudinaryImageStorage(ImageStorage):
+    def save(self, content, folder, name):
+        import cloudinary.uploader
+
+        result = cloudinary.uploader.upload(
+            io.BytesIO(content), folder=folder, public_id=os.path.splitext(name)[0],
+            overwrite=True, resource_type='image',
+        )
+        return {'public_id': result['public_id'], 'url': result['secure_url']}
+
+
+class LocalImageStorage(ImageStorage):
+    """Lưu vào MEDIA_ROOT, dùng thay Cloudinary khi phát triển và kiểm thử"""
+
+    @cached_property
+    def storage(self):
+        return FileSystemStorage(location=settings.MEDIA_ROOT, base_url=settings.MEDIA_URL)
+
+    def save(self, content, folder, name):
+        stored = self.storage.save(f'{folder}/{name}', ContentFile(content))
+        return {'public_id': stored, 'url': self.storage.url(stored)}
+
+
+_storage = None
+_executor = None
+
+
+def get_image_storage():
+    global _storage
+    if _storage is None:
+        backend = getattr(settings, 'IMAGE_STORAGE_BACKEND', 'managements.images.CloudinaryImageStorage')
+        _storage = import_string(backend)()
+    return _storage
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_WORKERS', 2), thread_name_prefix='image-worker'
+        )
+    return _executor
+
+
+def status_field(field):
+    return f'{field}_status'
+
+
+def variants_field(field):
+    return f'{field}_variants'
+
+
+@lru_cache(maxsize=10000)
+def cloudinary_url(public_id, version=None, image_format=None, delivery_type='upload', resource_type='image'):
+    from cloudinary import CloudinaryResource
+
+    return CloudinaryResource(
+        public_id, version=version, format=image_format, type=delivery_type, resource_type=resource_type,
+    ).url
+
+
+@lru_cache(maxsize=10000)
+def storage_url(name):
+    # ImageField của project dùng storage mặc định
+    return default_storage.url(name)
+
+
+def resolve_url(value):
+    """URL của giá trị một field ảnh (CloudinaryResource / FieldFile), nhớ theo public_id"""
+    if not value or isinstance(value, str):
+        # Chuỗi vừa gán trong bộ nhớ, chưa qua field (chưa có URL)
+        return None
+    public_id = getattr(value, 'public_id', None)
+    if public_id is not None:
+        return cloudinary_url(public_id, value.version, value.format, value.type, value.resource_type)
+    return storage_url(value.name)
+
+
+def image_url(instance, field, variant='original'):
+    """
+    URL ảnh cho serializer: lấy URL đã lưu sẵn lúc xử lý ảnh (<field>_variants), chỉ
+    các bản ghi cũ chưa có mới phải dựng URL (có nhớ theo public_id).
+    """
+    variants = getattr(instance, variants_field(field))
+    if variants:
+        return variants.get(variant) or variants.get('original')
+    return resolve_url(getattr(instance, field))
+
+
+def store_image_url(instance, field):
+    """Lưu sẵn URL ảnh gốc khi ảnh được gán trực tiếp (trang admin), không qua worker"""
+    url = resolve_url(getattr(instance, field))
+    setattr(instance, variants_field(field), {'original': url} if url else {})
+    setattr(instance, status_field(field), ImageStatus.READY if url else '')
+    type(instance).objects.filter(pk=instance.pk).update(**{
+        variants_field(field): getattr(instance, variants_field(field)),
+        status_field(field): getattr(instance, status_field(field)),
+    })
+
+
+def backfill_image_urls(model, field, chunk_size=1000):
+    """Lưu URL ảnh gốc cho các bản ghi có ảnh nhưng chưa có <field>_variants"""
+    total = 0
+    queryset = model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''}).filter(
+        **{variants_field(field): {}}
+    ).only('pk', field, variants_field(field), status_field(field)).order_by('pk')
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return total
+        for instance in chunk:
+            setattr(instance, variants_field(field), {'original': resolve_url(getattr(instance, field))})
+            setattr(instance, status_field(field), ImageStatus.READY)
+        model.objects.bulk_update(chunk, [variants_field(field), status_field(field)])
+        total += len(chunk)
+        last_pk = chunk[-1].pk
+
+
+def validate_upload(upload):
+    """Kiểm tra nhanh trong request (kích thước, định dạng qua header), chưa giải mã ảnh"""
+    max_size = getattr(settings, 'IMAGE_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+    if upload.size > max_size:
+        raise InvalidImage(f'Ảnh tối đa {max_size // (1024 * 1024)} MB.')
+    try:
+        image_format = Image.open(upload).format
+    except Exception:
+        raise InvalidImage('File không phải ảnh hợp lệ.')
+    finally:
+        upload.seek(0)
+    if image_format not in ALLOWED_FORMATS:
+        raise InvalidImage('Chỉ hỗ trợ ảnh JPEG, PNG, WEBP hoặc GIF.')
+    return ALLOWED_FORMATS[image_format]
+
+
+def _update_fields(instance, *fields):
+    # Ghi kèm updated_at để thay đổi đi vào sync/
+    extra = [name for name in ('updated_date', 'updated_at') if hasattr(instance, name)]
+    return list(fields) + extra
+
+
+def upload_temp_dir():
+    return Path(getattr(settings, 'IMAGE_UPLOAD_TEMP_DIR', Path(settings.MEDIA_ROOT) / 'uploads-tmp'))
+
+
+def accept_upload(instance, field, upload):
+    """
+    Nhận ảnh upload: lưu file tạm trên đĩa, đánh dấu bản ghi 'pending' rồi giao cho
+    worker sau khi transaction commit. Request không phải chờ upload lên Cloudinary.
+    Việc nằm trong bộ nhớ của tiến trình web nên mất khi khởi động lại: lệnh
+    recover_image_uploads xử lý lại từ file tạm (xem recover_uploads).
+    """
+    extension = validate_upload(upload)
+    temp_dir = upload_temp_dir()
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    temp_path = temp_dir / f'{instance._meta.label_lower}-{instance.pk}-{field}-{uuid.uuid4().hex}{extension}'
+    with open(temp_path, 'wb') as destination:
+        for chunk in upload.chunks():
+            destination.write(chunk)
+
+    setattr(instance, status_field(field), ImageStatus.PENDING)
+    setattr(instance, variants_field(field), {})
+    instance.save(update_fields=_update_fields(instance, status_field(field), variants_field(field)))
+
+    task = (instance._meta.label, instance.pk, field, str(temp_path))
+    transaction.on_commit(lambda: submit(*task))
+
+
+def submit(model_label, pk, field, temp_path):
+    if getattr(settings, 'IMAGE_WORKERS', 2) == 0:
+        # Xử lý ngay trong tiến trình gọi (kiểm thử, lệnh quản trị)
+        process_image(model_label, pk, field, temp_path)
+        return
+    get_executor().submit(_run_in_worker, model_label, pk, field, temp_path)
+
+
+def _run_in_worker(*task):
+    try:
+        process_image(*task)
+    finally:
+        # Kết nối DB của luồng worker không tự đóng như trong request
+        connections.close_all()
+
+
+def render_variants(content):
+    """Các phiên bản JPEG đã thu nhỏ của ảnh gốc: {tên: bytes}"""
+    image = Image.open(io.BytesIO(content))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    variants = {}
+    for name, (width, height, crop) in getattr(settings, 'IMAGE_VARIANTS', IMAGE_VARIANTS).items():
+        if crop:
+            resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail((width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        resized.save(buffer, 'JPEG', quality=85, optimize=True)
+        variants[name] = buffer.getvalue()
+    return variants
+
+
+def store_original(instance, field, content, storage, folder, name):
+    """
+    Lưu ảnh gốc, gán vào field và trả về URL. CloudinaryField lưu public_id của storage ảnh;
+    ImageField/FileField chỉ hiểu tên file trong storage của chính field (upload_to,
+    STORAGES['default']) nên ảnh gốc phải được lưu qua storage đó.
+    """
+    if isinstance(instance._meta.get_field(field), models.FileField):
+        file = getattr(instance, field)
+        file.save(name, ContentFile(content), save=False)
+        return file.url
+    original = storage.save(content, folder, name)
+    setattr(instance, field, original['public_id'])
+    return original['url']
+
+
+def process_image(model_label, pk, field, temp_path):
+    """Chạy trong worker: tạo các phiên bản ảnh, lưu qua storage và cập nhật bản ghi"""
+    model = apps.get_model(model_label)
+    queryset = model.objects.filter(pk=pk)
+    try:
+        queryset.update(**{status_field(field): ImageStatus.PROCESSING})
+        with open(temp_path, 'rb') as source:
+            content = source.read()
+        variants = render_variants(content)
+
+        instance = queryset.first()
+        if instance is None:
+            return
+        storage = get_image_storage()
+        folder = IMAGE_FOLDERS.get((model_label, field), field)
+        base_name = f'{model._meta.model_name}-{pk}-{uuid.uuid4().hex[:8]}'
+        urls = {'original': store_original(
+            instance, field, content, storage, folder, base_name + os.path.splitext(temp_path)[1],
+        )}
+        for name, data in variants.items():
+            urls[name] = storage.save(data, folder, f'{base_name}_{name}.jpg')['url']
+
+        setattr(instance, status_field(field), ImageStatus.READY)
+        setattr(instance, variants_field(field), urls)
+        # save() để các signal làm mới cache phụ thuộc (danh mục, token, roster...)
+        instance.save(update_fields=_update_fields(instance, field, status_field(field), variants_field(field)))
+    except Exception:
+        logger.exception('Xử lý ảnh %s #%s (%s) thất bại', model_label, pk, field)
+        queryset.update(**{status_field(field): ImageStatus.FAILED})
+    finally:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def image_fields():
+    """(model, field) của mọi field ảnh được xử lý qua accept_upload"""
+    return [(apps.get_model(label), field) for label, field in IMAGE_FOLDERS]
+
+
+def recover_uploads(stale_seconds=None):
+    """
+    Dọn việc xử lý ảnh bị mất khi tiến trình web dừng (executor chỉ nằm trong bộ nhớ):
+    - bản ghi pending/processing không còn file tạm: không thể xử lý lại, đánh dấu failed;
+    - file tạm cũ hơn stale_seconds mà bản ghi vẫn chờ: xử lý lại ngay trong tiến trình gọi;
+    - file tạm cũ còn lại (bản ghi đã xong, đã xóa hoặc tên không hợp lệ): xóa.
+    File mới hơn stale_seconds được để lại cho worker đang chạy.
+    """
+    stale_seconds = IMAGE_STALE_SECONDS if stale_seconds is None else stale_seconds
+    waiting = (ImageStatus.PENDING, ImageStatus.PROCESSING)
+    # Đọc bản ghi trước khi liệt kê file: accept_upload ghi file trước khi đánh dấu pending
+    pending = {
+        (model._meta.label_lower, pk, field)
+        for model, field in image_fields()
+        for pk in model.objects.filter(**{f'{status_field(field)}__in': waiting}).values_list('pk', flat=True)
+    }
+    temp_dir = upload_temp_dir()
+    paths = sorted(temp_dir.iterdir()) if temp_dir.is_dir() else []
+
+    result = {'processed': 0, 'deleted': 0, 'failed': 0}
+    with_files = set()
+    now = time.time()
+    for path in paths:
+        match = TEMP_NAME_RE.match(path.name)
+        task = (match['label'], int(match['pk']), match['field']) if match else None
+        if task in pending:
+            with_files.add(task)
+        if now - path.stat().st_mtime < stale_seconds:
+            continue
+        if task in pending:
+            model = apps.get_model(task[0])
+            process_image(model._meta.label, task[1], task[2], str(path))
+            result['processed'] += 1
+        else:
+            path.unlink(missing_ok=True)
+            result['deleted'] += 1
+
+    for label, pk, field in pending - with_files:
+        result['failed'] += apps.get_model(label).objects.filter(
+            pk=pk, **{f'{status_field(field)}__in': waiting}
+        ).update(**{status_field(field): ImageStatus.FAILED})
+    return result
+
@@ -0,0 +1,161 @@
+import uuid
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from rest_framework import serializers
+
+from managements.models import HealthRecord
+from managements.serializers import HealthRecordBulkItemSerializer, compute_bmi
+from managements.signals import health_records_changed
+from managements.summaries import record_day
+
+# Số lần ghi lại một chunk khi request khác vừa ghi cùng idempotency_key
+INSERT_ATTEMPTS = 3
+
+
+class TooManyItems(Exception):
+    pass
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def insert_chunk(user, pending, chunk_size):
+    """
+    Ghi các bản ghi trong pending [(index, record)] trong một savepoint và gán pk cho từng
+    record. Backend không trả pk từ bulk_create (MySQL) thì gắn cả lô một ingest_batch tạm
+    rồi đọc lại id theo thứ tự dòng của câu INSERT (id tự tăng đơn điệu trong một câu).
+    Request khác vừa ghi cùng idempotency_key làm lỗi IntegrityError: rollback savepoint,
+    đọc lại các key đã có bằng truy vấn khóa (thấy được dòng vừa commit kể cả ở
+    REPEATABLE READ) rồi ghi lại phần còn lại.
+    Trả về ([(index, record)] đã tạo, {key: id} đã có từ trước).
+    """
+    existing = {}
+    returns_pk = connection.features.can_return_rows_from_bulk_insert
+    for _ in range(INSERT_ATTEMPTS):
+        batch = None if returns_pk else uuid.uuid4()
+        records = [record for _, record in pending]
+        for record in records:
+            record.ingest_batch = batch
+        try:
+            with transaction.atomic():
+                HealthRecord.objects.bulk_create(records, batch_size=chunk_size)
+        except IntegrityError:
+            keys = [record.idempotency_key for record in records if record.idempotency_key]
+            found = dict(
+                HealthRecord.objects.select_for_update()
+                .filter(user=user, idempotency_key__in=keys).values_list('idempotency_key', 'id')
+            ) if keys else {}
+            if not found:
+                raise
+            existing.update(found)
+            pending = [(index, record) for index, record in pending if record.idempotency_key not in found]
+            if not pending:
+                return [], existing
+            continue
+        if batch is not None:
+            inserted = HealthRecord.objects.filter(ingest_batch=batch)
+            for record, record_id in zip(records, inserted.order_by('id').values_list('id', flat=True)):
+                record.pk = record_id
+                record.ingest_batch = None
+            inserted.update(ingest_batch=None)
+        return pending, existing
+    raise IntegrityError('Không ghi được lô HealthRecord do trùng idempotency_key.')
+
+
+def ingest_health_records(user, items, chunk_size=None, max_items=None):
+    """
+    Ghi một lô HealthRecord trong một transaction: kiểm tra từng phần tử bằng một
+    serializer dùng chung, tính BMI cho cả chunk, bỏ qua các idempotency_key đã có
+    và ghi bằng bulk_create theo từng chunk. Phần tử lỗi được báo lại theo index.
+    Phần tử có date (lịch sử từ thiết bị) giữ nguyên thời điểm đó thay vì lúc nhận.
+    """
+    chunk_size = chunk_size or getattr(settings, 'HEALTH_BULK_CHUNK_SIZE', 500)
+    max_items = max_items or getattr(settings, 'HEALTH_BULK_MAX_ITEMS', 5000)
+    validator = HealthRecordBulkItemSerializer()
+
+    created = []
+    duplicates = []
+    errors = []
+    seen_keys = {}
+    days = set()
+
+    with transaction.atomic():
+        for chunk in _chunks(enumerate(items), chunk_size):
+            if chunk[-1][0] >= max_items:
+                raise TooManyItems(max_items)
+
+            valid = []
+            for index, item in chunk:
+                try:
+                    data = validator.run_validation(item)
+                except serializers.ValidationError as exc:
+                    errors.append({'index': index, 'errors': exc.detail})
+                    continue
+
+                key = data.pop('idempotency_key', None)
+                if key and key in seen_keys:
+                    duplicates.append({'index': index, 'idempotency_key': key, 'id': seen_keys[key]})
+                    continue
+                if key:
+                    seen_keys[key] = None
+                valid.append((index, key, data))
+
+            keys = [key for _, key, _ in valid if key]
+            existing = dict(
+                HealthRecord.objects.filter(user=user, idempotency_key__in=keys).values_list('idempotency_key', 'id')
+            ) if keys else {}
+
+            pending = []
+            dates = {}
+            for index, key, data in valid:
+                if key in existing:
+                    seen_keys[key] = existing[key]
+                    duplicates.append({'index': index, 'idempotency_key': key, 'id': existing[key]})
+                    continue
+                date = data.pop('date', None)
+                record = HealthRecord(user=user, idempotency_key=key, **data)
+                # BMI cho cả chunk trong một lượt
+                record.bmi = compute_bmi(record.height, record.weight)
+                pending.append((index, record))
+                if date is not None:
+                    dates[index] = date
+            if not pending:
+                continue
+
+            inserted, raced = insert_chunk(user, pending, chunk_size)
+            indexes = {record.idempotency_key: index for index, record in pending if record.idempotency_key}
+            for key, record_id in raced.items():
+                seen_keys[key] = record_id
+                duplicates.append({'index': indexes[key], 'idempotency_key': key, 'id': record_id})
+
+            # bulk_create luôn ghi date = lúc nhận (auto_now_add) nên đặt lại ngày gửi lên sau khi ghi
+            dated = []
+            for index, record in inserted:
+                if index in dates:
+                    record.date = dates[index]
+                    dated.append(record)
+                days.add(record_day(record))
+                if record.idempotency_key:
+                    seen_keys[record.idempotency_key] = record.pk
+                created.append({'index': index, 'id': record.pk})
+            if dated:
+                HealthRecord.objects.bulk_update(dated, ['date'], batch_size=chunk_size)
+
+        if created:
+            # bulk_create không phát signal nên cập nhật dữ liệu phụ thuộc sau khi commit
+            transaction.on_commit(lambda: health_records_changed(user.id, days))
+
+    # Phần tử trùng key trong cùng lô trỏ về bản ghi vừa được tạo
+    for duplicate in duplicates:
+        if duplicate['id'] is None:
+            duplicate['id'] = seen_keys.get(duplicate['idempotency_key'])
+    created.sort(key=lambda row: row['index'])
+    return {'created': created, 'duplicates': duplicates, 'errors': errors}
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from managements.summaries import backfill_daily_summaries
+
+
+class Command(BaseCommand):
+    help = 'Dựng lại bảng DailyHealthSummary từ lịch sử HealthRecord (xử lý theo từng nhóm người dùng)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Chỉ backfill cho user id này (có thể lặp lại)')
+        parser.add_argument('--since', help='Chỉ dựng lại từ ngày này (YYYY-MM-DD)')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Số người dùng mỗi lượt')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError('--since phải có dạng YYYY-MM-DD')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size phải lớn hơn 0')
+
+        def on_chunk(user_count, summary_count):
+            self.stdout.write(f'  {user_count} người dùng -> {summary_count} dòng tổng hợp')
+
+        total = backfill_daily_summaries(
+            user_ids=options['users'],
+            since=since,
+            chunk_size=options['chunk_size'],
+            on_chunk=on_chunk,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Đã ghi {total} dòng tổng hợp.'))
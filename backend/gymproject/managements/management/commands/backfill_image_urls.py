@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from managements.images import backfill_image_urls
+from managements.models import Activity, MealPlan, User
+
+IMAGE_MODELS = ((User, 'avatar'), (Activity, 'image'), (MealPlan, 'image'))
+
+
+class Command(BaseCommand):
+    help = 'Lưu sẵn URL ảnh gốc cho các bản ghi có ảnh nhưng chưa qua bước xử lý ảnh'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for model, field in IMAGE_MODELS:
+            total = backfill_image_urls(model, field, chunk_size=options['chunk_size'])
+            self.stdout.write(f'  {model.__name__}.{field}: {total} bản ghi')
+        self.stdout.write(self.style.SUCCESS('Hoàn tất.'))
@@ -0,0 +1,100 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from managements.models import Activity, User
+from managements.profiling import percentile
+from managements.search import fold_text, index_activities, search_activities
+
+# Âm tiết tiếng Việt ghép từ phụ âm đầu + vần để có bộ từ vựng đủ lớn, giống dữ liệu thật
+ONSETS = ['b', 'c', 'ch', 'd', 'đ', 'g', 'h', 'kh', 'l', 'm', 'n', 'ng', 'nh', 'ph', 'r', 's', 't', 'th', 'tr', 'v', 'x']
+RIMES = ['a', 'à', 'á', 'ạ', 'ai', 'an', 'ang', 'ánh', 'ao', 'ay', 'ắt', 'âm', 'e', 'ê', 'ền', 'i', 'iêu', 'o', 'ô',
+         'ơi', 'ong', 'ộng', 'u', 'ưa', 'ương', 'út', 'uy']
+WORDS = [onset + rime for onset in ONSETS for rime in RIMES]
+
+
+class Command(BaseCommand):
+    help = ('So sánh độ trễ tìm kiếm Activity giữa name__icontains và chỉ mục đảo. '
+            'Dữ liệu giả được tạo trong transaction và rollback khi xong.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000, help='Số Activity giả lập')
+        parser.add_argument('--repeat', type=int, default=20, help='Số lần chạy mỗi truy vấn')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42, help='Seed cho dữ liệu giả và truy vấn mẫu')
+        parser.add_argument('--json', action='store_true', help='In kết quả dạng JSON')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            results = self.run(options)
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2, ensure_ascii=False))
+            return
+        self.stdout.write(f"{'query':<16}{'path':<10}{'hits':>8}{'mean ms':>10}{'p95 ms':>10}")
+        for row in results['queries']:
+            for path in ('icontains', 'index'):
+                r = row[path]
+                self.stdout.write(f"{row['query']:<16}{path:<10}{r['hits']:>8}{r['mean_ms']:>10.2f}{r['p95_ms']:>10.2f}")
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        user = User.objects.create(username='bench-search', email='bench-search@example.com')
+
+        started = time.perf_counter()
+        names = [' '.join(rng.choices(WORDS, k=3)) for _ in range(options['count'])]
+        Activity.objects.bulk_create([
+            Activity(user=user, name=name, description='<p>' + ' '.join(rng.choices(WORDS, k=12)) + '</p>')
+            for name in names
+        ], batch_size=2000)
+        seeded = time.perf_counter() - started
+
+        started = time.perf_counter()
+        index_activities(Activity.objects.filter(user=user))
+        indexed = time.perf_counter() - started
+
+        # Truy vấn lấy từ chính dữ liệu (cùng seed thì cùng truy vấn): 1 từ, 2 từ, bỏ dấu, và tiền tố
+        samples = [name.split() for name in rng.sample(names, 4)]
+        queries = [
+            samples[0][0],
+            ' '.join(samples[1][:2]),
+            fold_text(' '.join(samples[2][:2])),
+            samples[3][0] + ' ' + samples[3][1][:2],
+        ]
+
+        base = Activity.objects.filter(active=True)
+        paths = {
+            'icontains': lambda q: base.filter(name__icontains=q).order_by('-id'),
+            'index': lambda q: search_activities(base, q),
+        }
+        results = []
+        for q in queries:
+            row = {'query': q}
+            for name, build in paths.items():
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    queryset = build(q)
+                    hits = queryset.count()
+                    list(queryset[:options['page_size']])
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                row[name] = {
+                    'hits': hits,
+                    'mean_ms': statistics.mean(timings),
+                    'p95_ms': percentile(timings, 95),
+                }
+            results.append(row)
+
+        return {
+            'activities': options['count'],
+            'seed': options['seed'],
+            'seed_seconds': seeded,
+            'index_seconds': indexed,
+            'queries': results,
+        }
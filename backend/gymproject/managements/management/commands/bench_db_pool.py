@@ -0,0 +1,185 @@
+import json
+import statistics
+import threading
+import time
+from importlib.util import find_spec
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+
+from managements.db.pool import PoolTimeout, close_pool
+from managements.profiling import percentile
+
+
+class Command(BaseCommand):
+    help = ('Chạy thử pool kết nối (managements/db): đo chu kỳ mở kết nối - query - đóng như một request '
+            'với backend gốc và backend có pool, nhiều thread song song. --verify kiểm tra dùng lại kết nối, '
+            'thay kết nối hỏng, giới hạn overflow/timeout và rollback khi trả về pool. '
+            '--sqlite PATH để chạy trên file SQLite thay cho DATABASES[--database].')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--sqlite', help='File SQLite dùng làm DB thay thế')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200, help='Số request mỗi thread')
+        parser.add_argument('--queries', type=int, default=3, help='Số query mỗi request')
+        parser.add_argument('--max-size', type=int)
+        parser.add_argument('--max-overflow', type=int)
+        parser.add_argument('--verify', action='store_true')
+        parser.add_argument('--json', action='store_true', help='In kết quả dạng JSON')
+
+    def handle(self, *args, **options):
+        base = dict(connections.settings[options['database']])
+        if options['sqlite']:
+            base.update(ENGINE='django.db.backends.sqlite3', NAME=options['sqlite'])
+        vendor = base['ENGINE'].rsplit('.', 1)[-1]
+        stock, pooled = f'django.db.backends.{vendor}', f'managements.db.backends.{vendor}'
+        if find_spec(pooled) is None:
+            raise CommandError(f'Chưa có backend pool cho {vendor}.')
+
+        pool_options = dict(base.get('POOL', {}))
+        if options['max_size'] is not None:
+            pool_options['MAX_SIZE'] = options['max_size']
+        if options['max_overflow'] is not None:
+            pool_options['MAX_OVERFLOW'] = options['max_overflow']
+
+        if options['verify']:
+            for line in self.verify(base, pooled):
+                self.stdout.write(line)
+
+        results = [
+            self.run(self.settings_for(base, stock), options),
+            self.run(self.settings_for(base, pooled, pool_options), options),
+        ]
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'engine':<34}{'mean µs':>10}{'p95 µs':>10}{'req/s':>10}{'connects':>10}")
+        for row in results:
+            self.stdout.write(f"{row['engine']:<34}{row['mean_us']:>10.0f}{row['p95_us']:>10.0f}"
+                              f"{row['requests_per_s']:>10.0f}{row['connects']:>10}")
+            if row['pool']:
+                self.stdout.write(f"  pool: {row['pool']}")
+
+    def settings_for(self, base, engine, pool=None, alias='bench-db-pool'):
+        settings_dict = {**base, 'ENGINE': engine, 'POOL': pool or {}}
+        # configure_settings điền các khóa mặc định (AUTOCOMMIT, OPTIONS, TIME_ZONE...) như với DATABASES
+        return alias, connections.configure_settings({'default': settings_dict})['default']
+
+    def run(self, config, options):
+        alias, settings_dict = config
+        backend = load_backend(settings_dict['ENGINE'])
+        timings = []
+        lock = threading.Lock()
+        errors = []
+
+        def worker():
+            wrapper = backend.DatabaseWrapper(settings_dict, alias)
+            local = []
+            try:
+                for _ in range(options['requests']):
+                    started = time.perf_counter()
+                    with wrapper.cursor() as cursor:
+                        for _ in range(options['queries']):
+                            cursor.execute('SELECT 1')
+                            cursor.fetchone()
+                    wrapper.close()
+                    local.append((time.perf_counter() - started) * 1e6)
+            except Exception as exc:
+                errors.append(exc)
+            with lock:
+                timings.extend(local)
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if errors:
+            raise CommandError(f'{settings_dict["ENGINE"]}: {errors[0]!r}')
+
+        pool = None
+        connects = len(timings)
+        if hasattr(backend.DatabaseWrapper, 'pool'):
+            pool = backend.DatabaseWrapper(settings_dict, alias).pool.stats()
+            connects = pool['created']
+            close_pool(alias)
+
+        timings.sort()
+        return {
+            'engine': settings_dict['ENGINE'],
+            'requests': len(timings),
+            'mean_us': statistics.mean(timings),
+            'p95_us': percentile(timings, 95),
+            'requests_per_s': len(timings) / elapsed,
+            'connects': connects,
+            'pool': pool,
+        }
+
+    def verify(self, base, engine):
+        """Các kiểm tra chức năng của pool, mỗi kiểm tra một alias (pool) riêng"""
+        def wrapper_for(name, **pool):
+            alias, settings_dict = self.settings_for(base, engine, pool, alias=f'bench-db-pool-{name}')
+            return load_backend(engine).DatabaseWrapper(settings_dict, alias)
+
+        def check(name, ok):
+            if not ok:
+                raise CommandError(f'Pool: kiểm tra "{name}" thất bại.')
+            return f'ok  {name}'
+
+        # Dùng lại kết nối giữa các request
+        wrapper = wrapper_for('reuse')
+        wrapper.ensure_connection()
+        first = wrapper.connection
+        wrapper.close()
+        wrapper.ensure_connection()
+        yield check('dùng lại kết nối', wrapper.connection is first and wrapper.pool.stats()['created'] == 1)
+        wrapper.close()
+        close_pool(wrapper.alias)
+
+        # Kết nối hỏng trong pool bị phát hiện bằng ping và thay bằng kết nối mới
+        wrapper = wrapper_for('ping')
+        wrapper.ensure_connection()
+        broken = wrapper.connection
+        wrapper.close()
+        broken.close()
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        stats = wrapper.pool.stats()
+        yield check('thay kết nối hỏng', wrapper.connection is not broken and stats['ping_failures'] == 1)
+        wrapper.close()
+        close_pool(wrapper.alias)
+
+        # Giới hạn max_size + max_overflow, hết thì chờ rồi báo PoolTimeout; overflow bị đóng khi trả về
+        wrappers = [wrapper_for('limit', MAX_SIZE=1, MAX_OVERFLOW=1, TIMEOUT=0.2) for _ in range(3)]
+        wrappers[0].ensure_connection()
+        wrappers[1].ensure_connection()
+        try:
+            wrappers[2].ensure_connection()
+            timed_out = False
+        except PoolTimeout:
+            timed_out = True
+        wrappers[0].close()
+        wrappers[1].close()
+        stats = wrappers[0].pool.stats()
+        yield check('giới hạn overflow', timed_out and stats['timeouts'] == 1 and stats['overflow_closed'] == 1
+                    and stats['open'] == 1)
+        close_pool(wrappers[0].alias)
+
+        # Transaction dang dở bị rollback khi kết nối trả về pool
+        wrapper = wrapper_for('rollback')
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TEMPORARY TABLE bench_db_pool_check (id INTEGER)')
+        wrapper.set_autocommit(False)
+        with wrapper.cursor() as cursor:
+            cursor.execute('INSERT INTO bench_db_pool_check (id) VALUES (1)')
+        wrapper.close()
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM bench_db_pool_check')
+            yield check('rollback khi trả về pool', cursor.fetchone()[0] == 0)
+            cursor.execute('DROP TABLE bench_db_pool_check')
+        wrapper.close()
+        close_pool(wrapper.alias)
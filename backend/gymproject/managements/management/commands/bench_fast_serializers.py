@@ -0,0 +1,120 @@
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from managements.fastpath import FastSerializer
+from managements.models import Activity, ChatMessage, HealthRecord, MealPlan, User, WorkoutPlan
+from managements.serializers import (ChatMessageSerializer, HealthRecordSerializer, MealPlanSerializer,
+                                     WorkoutPlanSerializer)
+
+
+class Command(BaseCommand):
+    help = ('So sánh serializer thường với đường đọc nhanh (fastpath) trên danh sách lớn: số dòng/giây '
+            '(gồm cả truy vấn), bộ nhớ cấp phát tối đa và kiểm tra output giống hệt. '
+            'Dữ liệu giả được rollback khi xong.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--json', action='store_true', help='In kết quả dạng JSON')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            results = self.run(options)
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'serializer':<14}{'rows':>7}{'mode':>6}{'mean ms':>10}{'rows/s':>10}"
+                          f"{'peak KiB':>10}{'same':>6}")
+        for row in results:
+            self.stdout.write(
+                f"{row['serializer']:<14}{row['rows']:>7}{row['mode']:>6}{row['mean_ms']:>10.1f}"
+                f"{row['rows_per_s']:>10.0f}{row['peak_kib']:>10.0f}{str(row['identical']):>6}"
+            )
+
+    def seed(self, rows):
+        users = User.objects.bulk_create([
+            User(username=f'bench-fast-{i}', email=f'bench-fast-{i}@example.com', avatar=f'avatar/bench-{i}')
+            for i in range(50)
+        ])
+        activities = Activity.objects.bulk_create([
+            Activity(user=users[0], name=f'Activity {i}') for i in range(20)
+        ])
+        start = date(2020, 1, 1)
+        HealthRecord.objects.bulk_create([
+            HealthRecord(user=users[i % 50], date=start + timedelta(days=i // 50), steps=i, height=170, weight=65,
+                         bmi=22.49, water_intake=1.5, heart_rate=70)
+            for i in range(rows)
+        ], batch_size=1000)
+        MealPlan.objects.bulk_create([
+            MealPlan(user=users[i % 50], name=f'Meal {i}', date=start, image=f'mealplan_images/bench-{i}.jpg')
+            for i in range(rows)
+        ], batch_size=1000)
+        ChatMessage.objects.bulk_create([
+            ChatMessage(sender=users[i % 50], receiver=users[(i + 1) % 50], message=f'm{i}') for i in range(rows)
+        ], batch_size=1000)
+        plans = WorkoutPlan.objects.bulk_create([
+            WorkoutPlan(user=users[i % 50], name=f'Plan {i}', date=start, sets=3, reps=10) for i in range(rows)
+        ], batch_size=1000)
+        WorkoutPlan.activities.through.objects.bulk_create([
+            WorkoutPlan.activities.through(workoutplan_id=plan.id, activity_id=activities[(plan.id + k) % 20].id)
+            for plan in plans for k in range(3)
+        ], batch_size=1000)
+        return users
+
+    def measure(self, render, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render()
+            timings.append((time.perf_counter() - started) * 1000)
+        tracemalloc.start()
+        data = render()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return data, statistics.mean(timings), peak
+
+    def run(self, options):
+        context = {'request': APIRequestFactory().get('/')}
+        results = []
+        for rows in options['rows']:
+            sid = transaction.savepoint()
+            users = self.seed(rows)
+            cases = (
+                ('healthrecord', HealthRecordSerializer, HealthRecord.objects.filter(user__in=users)),
+                ('mealplan', MealPlanSerializer, MealPlan.objects.filter(user__in=users)),
+                ('chatmessage', ChatMessageSerializer, ChatMessage.objects.filter(sender__in=users)),
+                ('workoutplan', WorkoutPlanSerializer, WorkoutPlan.objects.filter(user__in=users)),
+            )
+            for name, serializer_class, queryset in cases:
+                def drf():
+                    objects = serializer_class.setup_eager_loading(queryset)
+                    return serializer_class(objects, many=True, context=context).data
+
+                def fast():
+                    fast_serializer = FastSerializer(serializer_class, context)
+                    return fast_serializer.serialize(fast_serializer.values(serializer_class.setup_eager_loading(queryset)))
+
+                measured = {mode: self.measure(render, options['repeat']) for mode, render in (('drf', drf), ('fast', fast))}
+                identical = JSONRenderer().render(measured['drf'][0]) == JSONRenderer().render(measured['fast'][0])
+                for mode, (_, mean_ms, peak) in measured.items():
+                    results.append({
+                        'serializer': name,
+                        'rows': rows,
+                        'mode': mode,
+                        'mean_ms': mean_ms,
+                        'rows_per_s': rows / mean_ms * 1000 if mean_ms else 0,
+                        'peak_kib': peak / 1024,
+                        'identical': identical,
+                    })
+            transaction.savepoint_rollback(sid)
+        return results
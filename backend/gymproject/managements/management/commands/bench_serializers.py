@@ -0,0 +1,116 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from managements.images import cloudinary_url, storage_url
+from managements.models import Activity, ChatMessage, MealPlan, User
+from managements.serializers import ActivitySerializer, ChatMessageSerializer, MealPlanSerializer, UserReadSerializer
+
+
+def legacy_url(value):
+    # Cách cũ: dựng URL cho từng dòng của mỗi request
+    return value.url if value and hasattr(value, 'url') else None
+
+
+class LegacyUserReadSerializer(UserReadSerializer):
+    def get_avatar_url(self, user):
+        return legacy_url(user.avatar)
+
+
+class LegacyActivitySerializer(ActivitySerializer):
+    def get_image_url(self, obj):
+        return legacy_url(obj.image)
+
+
+class LegacyMealPlanSerializer(MealPlanSerializer):
+    user = LegacyUserReadSerializer(read_only=True)
+
+    def get_image_url(self, obj):
+        return self.context['request'].build_absolute_uri(obj.image.url) if obj.image else None
+
+
+class LegacyChatMessageSerializer(ChatMessageSerializer):
+    sender = LegacyUserReadSerializer(read_only=True)
+    receiver = LegacyUserReadSerializer(read_only=True)
+
+
+class Command(BaseCommand):
+    help = ('Đo thời gian serialize danh sách (mặc định 1000 dòng) với URL ảnh dựng theo từng dòng, '
+            'nhớ theo public_id và lưu sẵn. Dữ liệu giả được rollback khi xong.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--json', action='store_true', help='In kết quả dạng JSON')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            results = self.run(options)
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'serializer':<16}{'mode':<10}{'mean ms':>10}{'min ms':>10}")
+        for row in results['results']:
+            self.stdout.write(f"{row['serializer']:<16}{row['mode']:<10}{row['mean_ms']:>10.2f}{row['min_ms']:>10.2f}")
+
+    def measure(self, serializer_class, objects, context, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            serializer_class(objects, many=True, context=context).data
+            timings.append((time.perf_counter() - started) * 1000)
+        return {'mean_ms': statistics.mean(timings), 'min_ms': min(timings)}
+
+    def run(self, options):
+        rows = options['rows']
+        context = {'request': APIRequestFactory().get('/')}
+        users = User.objects.bulk_create([
+            User(username=f'bench-ser-{i}', email=f'bench-ser-{i}@example.com', avatar=f'avatar/bench-{i}')
+            for i in range(50)
+        ])
+        Activity.objects.bulk_create([
+            Activity(user=users[0], name=f'Activity {i}', image=f'activity/bench-{i}') for i in range(rows)
+        ], batch_size=1000)
+        MealPlan.objects.bulk_create([
+            MealPlan(user=users[i % 50], name=f'Meal {i}', date='2026-01-01', image=f'mealplan_images/bench-{i}.jpg')
+            for i in range(rows)
+        ], batch_size=1000)
+        ChatMessage.objects.bulk_create([
+            ChatMessage(sender=users[i % 50], receiver=users[(i + 1) % 50], message=f'm{i}') for i in range(rows)
+        ], batch_size=1000)
+
+        cases = (
+            ('activity', Activity.objects.filter(user=users[0]), LegacyActivitySerializer, ActivitySerializer,
+             [(Activity, 'image')]),
+            ('mealplan', MealPlan.objects.filter(user__in=users).select_related('user'), LegacyMealPlanSerializer,
+             MealPlanSerializer, [(MealPlan, 'image'), (User, 'avatar')]),
+            ('chatmessage', ChatMessage.objects.filter(sender__in=users).select_related('sender', 'receiver'),
+             LegacyChatMessageSerializer, ChatMessageSerializer, [(User, 'avatar')]),
+        )
+        results = []
+        for name, queryset, legacy_class, serializer_class, image_fields in cases:
+            objects = list(queryset)
+            if legacy_class:
+                results.append({'serializer': name, 'mode': 'per-row', **self.measure(legacy_class, objects, context, options['repeat'])})
+
+            cloudinary_url.cache_clear()
+            storage_url.cache_clear()
+            results.append({'serializer': name, 'mode': 'memo', **self.measure(serializer_class, objects, context, options['repeat'])})
+
+            # Giống sau khi chạy backfill_image_urls: URL đã nằm sẵn trong <field>_variants
+            for model, field in image_fields:
+                for obj in objects:
+                    target = obj if isinstance(obj, model) else None
+                    targets = [target] if target else [getattr(obj, f) for f in ('user', 'sender', 'receiver') if hasattr(obj, f)]
+                    for instance in targets:
+                        if not getattr(instance, f'{field}_variants'):
+                            setattr(instance, f'{field}_variants', {'original': legacy_url(getattr(instance, field))})
+            results.append({'serializer': name, 'mode': 'stored', **self.measure(serializer_class, objects, context, options['repeat'])})
+
+        return {'rows': rows, 'results': results}
@@ -0,0 +1,47 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from oauth2_provider.contrib.rest_framework import OAuth2Authentication
+from oauth2_provider.models import get_access_token_model
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from managements.authentication import CachedOAuth2Authentication, token_cache
+from managements.models import User
+
+
+class Command(BaseCommand):
+    help = ('So sánh số query và thời gian xác thực mỗi request giữa OAuth2Authentication '
+            'và CachedOAuth2Authentication. Dữ liệu tạm được rollback khi xong.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create(username='bench-auth', email='bench-auth@example.com')
+            get_access_token_model().objects.create(
+                user=user, token='bench-auth-token', scope='read write',
+                expires=timezone.now() + timedelta(hours=1),
+            )
+            factory = APIRequestFactory()
+            token_cache.clear()
+
+            for name, backend in (('OAuth2Authentication', OAuth2Authentication()),
+                                  ('CachedOAuth2Authentication', CachedOAuth2Authentication())):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    for _ in range(options['requests']):
+                        request = Request(factory.get('/', HTTP_AUTHORIZATION='Bearer bench-auth-token'))
+                        assert backend.authenticate(request)[0].pk == user.pk
+                    elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{name:<28} {len(queries) / options["requests"]:.3f} query/request  '
+                    f'{elapsed / options["requests"] * 1e6:.1f} µs/request'
+                )
+            transaction.set_rollback(True)
+        token_cache.clear()
@@ -0,0 +1,407 @@
+import json
+import logging
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from oauth2_provider.models import get_access_token_model
+
+from managements.authentication import token_cache
+from managements.chat import refresh_conversation
+from managements.models import (Activity, ChatMessage, HealthDiary, HealthRecord, MealPlan, Role, User,
+                                UserConnection, UserGoal, WorkoutPlan)
+from managements.profiling import percentile
+from managements.search import index_activities
+from managements.serializers import compute_bmi
+from managements.summaries import backfill_daily_summaries
+from managements.urls import router
+
+PERCENTILES = (50, 90, 95, 99)
+ACTIVITY_NAMES = ('Chạy bộ', 'Đạp xe', 'Bơi lội', 'Squat', 'Deadlift', 'Yoga', 'Plank', 'Hít đất',
+                  'Nhảy dây', 'Kéo xà', 'Leo núi', 'Đi bộ nhanh')
+MEAL_GOALS = ('maintain', 'lose', 'gain')
+
+# Giá trị cho tham số trong url_path của các action (ngoài pk)
+ACTION_KWARGS = {
+    'user_id': lambda data: data['exerciser'].id,
+    'peer_id': lambda data: data['coach'].id,
+    'goal': lambda data: 'lose',
+}
+
+# Các request có query string hoặc ghi dữ liệu, chạy thêm ngoài các route GET của router
+EXTRA_SCENARIOS = (
+    ('activity-search', 'get', '/activity/?q=chay', None),
+    ('healthrecord-trends-365', 'get', '/healthrecord/trends/?days=365', None),
+    ('workoutplan-weekly-summary-month', 'get', '/workoutplan/weekly-summary/?start={month_ago}&end={today}', None),
+    ('export-healthrecord-csv', 'get', '/export/healthrecord/?format=csv', None),
+    ('export-all-ndjson', 'get', '/export/all/?format=ndjson', None),
+    ('healthrecord-create', 'post', '/healthrecord/', lambda data: {
+        'steps': 8000, 'water_intake': 2.0, 'heart_rate': 72, 'height': 170, 'weight': 65,
+    }),
+    ('healthrecord-bulk-100', 'post', '/healthrecord/bulk/', lambda data: [
+        {'steps': 100 * i, 'heart_rate': 70, 'height': 170, 'weight': 65} for i in range(100)
+    ]),
+    ('chat-send-message', 'post', '/chatmessage/send-message/', lambda data: {
+        'receiver_id': data['coach'].id, 'message': 'Chào coach',
+    }),
+)
+
+
+@contextmanager
+def historical_dates(*fields):
+    """Tạm tắt auto_now_add để bulk_create được dữ liệu với ngày trong quá khứ"""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def reload_created(queryset, objects, key):
+    """
+    bulk_create trên MySQL không gán pk cho đối tượng: đọc lại các dòng vừa chèn (queryset lọc
+    theo dữ liệu riêng của lần seed) và trả về theo đúng thứ tự của objects, khớp bằng key.
+    """
+    rows = {key(row): row for row in queryset}
+    return [rows[key(obj)] for obj in objects]
+
+
+class Command(BaseCommand):
+    help = ('Sinh dữ liệu giả (user đủ các Role, nhiều năm HealthRecord, lịch sử chat, kế hoạch tập có '
+            'activities) rồi chạy tải lặp lại được qua mọi route trong managements/urls.py. Báo cáo '
+            'percentile độ trễ, số query mỗi request và bộ nhớ cấp phát; dùng --json/--output để so sánh '
+            'giữa các commit. Dữ liệu được rollback khi xong.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exercisers', type=int, default=40)
+        parser.add_argument('--coaches', type=int, default=5)
+        parser.add_argument('--days', type=int, default=730, help='Số ngày lịch sử HealthRecord mỗi học viên')
+        parser.add_argument('--messages', type=int, default=200, help='Số tin nhắn mỗi cặp học viên - coach')
+        parser.add_argument('--plans', type=int, default=100, help='Số kế hoạch tập mỗi học viên')
+        parser.add_argument('--requests', type=int, default=20, help='Số request đo cho mỗi endpoint và role')
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--alloc-requests', type=int, default=3, help='Số request đo bộ nhớ (tracemalloc)')
+        parser.add_argument('--roles', nargs='+', choices=['exerciser', 'coach', 'admin'],
+                            default=['exerciser', 'coach', 'admin'])
+        parser.add_argument('--only', nargs='+', help='Chỉ chạy các endpoint có tên chứa một trong các chuỗi này')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', action='store_true', help='In kết quả dạng JSON')
+        parser.add_argument('--output', help='Ghi kết quả JSON ra file')
+        parser.add_argument('--baseline', help='File JSON của lần chạy trước để so sánh p95 và số query')
+        parser.add_argument('--max-regression', type=float,
+                            help='Báo lỗi khi p95 tăng quá số %% này hoặc số query tăng so với --baseline')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = {(row['name'], row['role']): row for row in json.load(f)['endpoints']}
+
+        # Cache riêng cho lần chạy để dữ liệu bị rollback không còn trong cache thật;
+        # 403/404 là kết quả mong đợi với một số role nên không ghi log từng request
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-api',
+            }}):
+                with transaction.atomic():
+                    started = time.perf_counter()
+                    data = self.seed(options)
+                    seed_seconds = time.perf_counter() - started
+                    results = self.run(data, options)
+                    transaction.set_rollback(True)
+        finally:
+            request_logger.setLevel(level)
+            token_cache.clear()
+
+        report = {
+            'meta': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'seed': options['seed'],
+                'seed_seconds': round(seed_seconds, 2),
+                'dataset': data['counts'],
+                'requests': options['requests'],
+                'warmup': options['warmup'],
+            },
+            'endpoints': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+        regressions = self.compare(results, baseline, options['max_regression']) if baseline else []
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+        else:
+            self.print_table(data, seed_seconds, results)
+        if regressions:
+            raise CommandError('Chậm hơn baseline: ' + ', '.join(regressions))
+
+    def print_table(self, data, seed_seconds, results):
+        self.stdout.write(f"dataset: {data['counts']} (seed {seed_seconds:.1f}s)")
+        self.stdout.write(f"{'endpoint':<36}{'role':<10}{'status':<8}{'p50':>8}{'p95':>8}{'p99':>8}"
+                          f"{'queries':>9}{'alloc KiB':>11}{'Δp95':>8}{'Δqueries':>10}")
+        for row in results:
+            status_codes = ','.join(str(code) for code in row['status'])
+            delta_p95 = f"{row['delta_p95_pct']:+.0f}%" if 'delta_p95_pct' in row else ''
+            delta_queries = f"{row['delta_queries']:+.1f}" if 'delta_queries' in row else ''
+            self.stdout.write(
+                f"{row['name']:<36}{row['role']:<10}{status_codes:<8}{row['p50_ms']:>8.1f}{row['p95_ms']:>8.1f}"
+                f"{row['p99_ms']:>8.1f}{row['queries_mean']:>9.1f}{row['alloc_peak_kib']:>11.0f}"
+                f"{delta_p95:>8}{delta_queries:>10}"
+            )
+
+    def compare(self, results, baseline, max_regression):
+        """Ghi chênh lệch so với baseline vào từng dòng, trả về các endpoint vượt ngưỡng"""
+        regressions = []
+        for row in results:
+            previous = baseline.get((row['name'], row['role']))
+            if previous is None:
+                continue
+            row['delta_queries'] = round(row['queries_mean'] - previous['queries_mean'], 2)
+            if previous['p95_ms']:
+                row['delta_p95_pct'] = round((row['p95_ms'] / previous['p95_ms'] - 1) * 100, 1)
+            if max_regression is not None and (
+                    row['delta_queries'] > 0 or row.get('delta_p95_pct', 0) > max_regression):
+                regressions.append(f"{row['name']} ({row['role']})")
+        return regressions
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        today = timezone.localdate()
+        now = timezone.now()
+
+        admin = User.objects.create(username='bench-api-admin', email='bench-api-admin@example.com', role=Role.Admin)
+        coaches = User.objects.bulk_create([
+            User(username=f'bench-api-coach-{i}', email=f'bench-api-coach-{i}@example.com', role=Role.Coach)
+            for i in range(options['coaches'])
+        ])
+        exercisers = User.objects.bulk_create([
+            User(username=f'bench-api-user-{i}', email=f'bench-api-user-{i}@example.com', role=Role.Exerciser,
+                 first_name=f'User {i}')
+            for i in range(options['exercisers'])
+        ])
+        coaches = reload_created(User.objects.filter(username__startswith='bench-api-coach-'), coaches,
+                                 lambda user: user.username)
+        exercisers = reload_created(User.objects.filter(username__startswith='bench-api-user-'), exercisers,
+                                    lambda user: user.username)
+        UserConnection.objects.bulk_create([
+            UserConnection(user=user, coach=coaches[i % len(coaches)], status='pending' if i % 10 == 9 else 'accepted')
+            for i, user in enumerate(exercisers)
+        ])
+
+        activities = Activity.objects.bulk_create([
+            Activity(user=coaches[i % len(coaches)], name=f'{name} {i}', description=f'Bài tập {name.lower()}',
+                     calories_burned=rng.randint(50, 600), time=rng.randint(10, 90))
+            for i, name in enumerate(ACTIVITY_NAMES * 10)
+        ])
+        activities = reload_created(Activity.objects.filter(user__in=coaches), activities,
+                                    lambda activity: (activity.user_id, activity.name))
+        index_activities(Activity.objects.filter(id__in=[a.id for a in activities]))
+
+        records = []
+        diaries = []
+        for user in exercisers:
+            weight = rng.uniform(55, 95)
+            height = rng.uniform(150, 190)
+            for day in range(options['days']):
+                weight += rng.uniform(-0.2, 0.18)
+                moment = now - timedelta(days=day, hours=rng.randint(0, 12))
+                records.append(HealthRecord(
+                    user=user, date=moment, steps=rng.randint(1000, 15000), water_intake=round(rng.uniform(1, 3), 1),
+                    heart_rate=rng.randint(55, 110), height=height, weight=round(weight, 1),
+                    bmi=compute_bmi(height, weight),
+                ))
+                if day % 7 == 0:
+                    diaries.append(HealthDiary(user=user, date=moment, content=f'Nhật ký ngày {day}', feeling='Ổn'))
+
+        messages = []
+        for i, user in enumerate(exercisers):
+            coach = coaches[i % len(coaches)]
+            for m in range(options['messages']):
+                sender, receiver = (user, coach) if m % 2 else (coach, user)
+                messages.append(ChatMessage(
+                    sender=sender, receiver=receiver, message=f'Tin nhắn {m}', is_read=m < options['messages'] - 5,
+                    timestamp=now - timedelta(minutes=(options['messages'] - m) * 30),
+                ))
+
+        with historical_dates(HealthRecord._meta.get_field('date'), HealthDiary._meta.get_field('date'),
+                              ChatMessage._meta.get_field('timestamp')):
+            HealthRecord.objects.bulk_create(records, batch_size=1000)
+            HealthDiary.objects.bulk_create(diaries, batch_size=1000)
+            ChatMessage.objects.bulk_create(messages, batch_size=1000)
+
+        plans = WorkoutPlan.objects.bulk_create([
+            WorkoutPlan(user=user, name=f'Buổi tập {p}', date=today - timedelta(days=p * 3),
+                        sets=rng.randint(2, 5), reps=rng.randint(6, 15))
+            for user in exercisers for p in range(options['plans'])
+        ], batch_size=1000)
+        plans = reload_created(WorkoutPlan.objects.filter(user__in=exercisers), plans,
+                               lambda plan: (plan.user_id, plan.name))
+        through = WorkoutPlan.activities.through
+        through.objects.bulk_create([
+            through(workoutplan_id=plan.id, activity_id=activity.id)
+            for plan in plans for activity in rng.sample(activities, rng.randint(1, 5))
+        ], batch_size=1000)
+
+        MealPlan.objects.bulk_create([
+            MealPlan(user=user, name=f'Thực đơn {p}', date=today - timedelta(days=p), goal=MEAL_GOALS[p % 3],
+                     calories_intake=rng.randint(1500, 3000))
+            for user in exercisers for p in range(30)
+        ], batch_size=1000)
+        UserGoal.objects.bulk_create([
+            UserGoal(user=user, goal_type='lose', target_weight=60, target_date=today + timedelta(days=90))
+            for user in exercisers
+        ])
+
+        # bulk_create không phát signal: dựng lại bảng tổng hợp và hộp thư như khi ghi từng bản ghi
+        user_ids = [user.id for user in exercisers]
+        backfill_daily_summaries(user_ids=user_ids)
+        for i, user in enumerate(exercisers):
+            coach = coaches[i % len(coaches)]
+            refresh_conversation(user.id, coach.id)
+            refresh_conversation(coach.id, user.id)
+
+        users = {'exerciser': exercisers[0], 'coach': coaches[0], 'admin': admin}
+        tokens = {}
+        for role, user in users.items():
+            token = f'bench-api-{role}-{options["seed"]}'
+            get_access_token_model().objects.create(
+                user=user, token=token, scope='read write', expires=now + timedelta(hours=2),
+            )
+            tokens[role] = token
+
+        exerciser = exercisers[0]
+        return {
+            'users': users,
+            'tokens': tokens,
+            'exerciser': exerciser,
+            'coach': coaches[0],
+            'pks': {
+                'user': exerciser.id,
+                'activity': activities[0].id,
+                'workoutplan': WorkoutPlan.objects.filter(user=exerciser).values_list('id', flat=True).first(),
+                'mealplan': MealPlan.objects.filter(user=exerciser).values_list('id', flat=True).first(),
+                'healthrecord': HealthRecord.objects.filter(user=exerciser).values_list('id', flat=True).first(),
+                'healthdiary': HealthDiary.objects.filter(user=exerciser).values_list('id', flat=True).first(),
+                'chat': ChatMessage.objects.filter(sender=exerciser).values_list('id', flat=True).first(),
+                'connection': UserConnection.objects.filter(user=exerciser).values_list('id', flat=True).first(),
+                'goal': UserGoal.objects.filter(user=exerciser).values_list('id', flat=True).first(),
+                'export': 'healthrecord',
+            },
+            'counts': {
+                'users': 1 + len(coaches) + len(exercisers),
+                'activities': len(activities),
+                'health_records': len(records),
+                'health_diaries': len(diaries),
+                'chat_messages': len(messages),
+                'workout_plans': len(plans),
+            },
+        }
+
+    def scenarios(self, data):
+        """(tên, method, path, body) cho mọi route GET của router và các kịch bản thêm"""
+        scenarios = []
+        for prefix, viewset, basename in router.registry:
+            scenarios.append((f'{prefix}-list', 'get', f'/{prefix}/', None))
+            pk = data['pks'].get(basename)
+            if hasattr(viewset, 'retrieve') and pk is not None:
+                scenarios.append((f'{prefix}-detail', 'get', f'/{prefix}/{pk}/', None))
+            for extra in viewset.get_extra_actions():
+                if 'get' not in extra.mapping:
+                    continue
+                url_path = extra.url_path
+                for name, value in ACTION_KWARGS.items():
+                    url_path = url_path.replace(f'(?P<{name}>[^/.]+)', str(value(data)))
+                if extra.detail:
+                    if pk is None:
+                        continue
+                    url_path = f'{pk}/{url_path}'
+                scenarios.append((f'{prefix}-{extra.url_path.split("/")[0]}', 'get', f'/{prefix}/{url_path}/', None))
+
+        today = timezone.localdate()
+        for name, method, path, body in EXTRA_SCENARIOS:
+            path = path.format(today=today, month_ago=today - timedelta(days=30))
+            scenarios.append((name, method, path, body(data) if body else None))
+        return scenarios
+
+    def request(self, client, method, path, body):
+        if method == 'get':
+            return client.get(path)
+        return client.generic(method.upper(), path, json.dumps(body), content_type='application/json')
+
+    def measure(self, client, method, path, body, options):
+        for _ in range(options['warmup']):
+            self.request(client, method, path, body)
+
+        timings = []
+        queries = []
+        statuses = Counter()
+        size = 0
+        for _ in range(options['requests']):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = self.request(client, method, path, body)
+                content = b''.join(response.streaming_content) if response.streaming else response.content
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            statuses[response.status_code] += 1
+            size = len(content)
+
+        # Đo bộ nhớ riêng vì tracemalloc làm chậm request
+        peaks = []
+        for _ in range(options['alloc_requests']):
+            tracemalloc.start()
+            response = self.request(client, method, path, body)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        timings.sort()
+        result = {f'p{p}_ms': round(percentile(timings, p), 3) for p in PERCENTILES}
+        result.update({
+            'mean_ms': round(statistics.mean(timings), 3),
+            'max_ms': round(timings[-1], 3),
+            'queries_mean': round(statistics.mean(queries), 2),
+            'queries_max': max(queries),
+            'alloc_peak_kib': round(max(peaks) / 1024, 1) if peaks else 0,
+            'response_kib': round(size / 1024, 1),
+            'status': dict(sorted(statuses.items())),
+        })
+        return result
+
+    def run(self, data, options):
+        results = []
+        scenarios = self.scenarios(data)
+        if options['only']:
+            scenarios = [s for s in scenarios if any(part in s[0] for part in options['only'])]
+
+        for role in options['roles']:
+            client = Client(HTTP_AUTHORIZATION=f'Bearer {data["tokens"][role]}')
+            for name, method, path, body in scenarios:
+                results.append({
+                    'name': name,
+                    'role': role,
+                    'method': method.upper(),
+                    'path': path,
+                    'requests': options['requests'],
+                    **self.measure(client, method, path, body, options),
+                })
+        return results
@@ -0,0 +1,224 @@
+import json
+import logging
+import re
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+
+from managements.authentication import token_cache
+from managements.management.commands.benchmark_api import Command as BenchmarkCommand
+from managements.profiling import query_signature
+
+# SQLite < 3.36 in "SCAN TABLE x", bản mới in "SCAN x"; có "USING ... INDEX" là quét theo index
+SQLITE_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+# Django đặt tên bảng trong ngoặc và alias (T3, U0...) không ngoặc: "bang"."cot", U0."cot"
+COLUMN_RE = re.compile(r'[`"]?(\w+)[`"]?\.[`"](\w+)[`"]')
+# FROM "bang" U0, INNER JOIN `bang` T3, FROM "bang" AS "alias"
+TABLE_RE = re.compile(r'(?:FROM|JOIN) [`"](\w+)[`"](?: (?:AS )?[`"]?(\w+)[`"]?)?')
+CLAUSE_END_RE = re.compile(r' (?:GROUP BY|ORDER BY|HAVING|LIMIT) ')
+# Danh sách cột của subquery nằm giữa WHERE ngoài và WHERE của subquery, không phải cột lọc
+SUBQUERY_SELECT_RE = re.compile(r'\(SELECT .*? FROM ')
+# Cột cờ (ít giá trị) không đáng dùng index; lọc chỉ theo cờ thì quét toàn bảng là bình thường
+FLAG_COLUMNS = {'active', 'is_active'}
+# Danh mục dùng chung (mọi người đọc toàn bộ danh sách): được phép quét toàn bảng nếu không truyền --allow
+CATALOG_TABLES = ['managements_activity', 'managements_mealplan']
+# Từ khóa có thể đứng ngay sau tên bảng, không phải alias
+SQL_KEYWORDS = {'where', 'inner', 'left', 'right', 'outer', 'cross', 'on', 'group', 'order', 'limit', 'having', 'union'}
+
+
+def table_aliases(sql):
+    """{alias hoặc tên bảng: tên bảng} của mọi bảng trong câu, kể cả trong subquery"""
+    aliases = {}
+    for table, alias in TABLE_RE.findall(sql):
+        aliases[table] = table
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+def filter_columns(sql, table):
+    """Các cột của table (qua tên hoặc alias) được lọc trong mọi mệnh đề WHERE (cả subquery), trừ cột cờ"""
+    aliases = table_aliases(sql)
+    table = aliases.get(table, table)
+    columns = set()
+    for where in sql.split(' WHERE ')[1:]:
+        where = SUBQUERY_SELECT_RE.sub('(', CLAUSE_END_RE.split(where)[0])
+        columns.update(column for name, column in COLUMN_RE.findall(where) if aliases.get(name, name) == table)
+    return sorted(columns - FLAG_COLUMNS)
+
+
+def user_owned_tables():
+    """Bảng có khóa ngoại tới User: số dòng tăng theo số người dùng nên không được quét toàn bảng"""
+    user_model = get_user_model()
+    return {
+        model._meta.db_table
+        for model in apps.get_models()
+        if any(field.many_to_one and field.related_model is user_model for field in model._meta.concrete_fields)
+    }
+
+
+def explain_sqlite(cursor, sql, params):
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+    for row in cursor.fetchall():
+        detail = row[-1]
+        match = SQLITE_SCAN_RE.match(detail)
+        if match and 'USING' not in detail:
+            yield 'full_scan', match.group(1), detail
+        elif 'TEMP B-TREE' in detail:
+            yield 'filesort', None, detail
+
+
+def explain_mysql(cursor, sql, params):
+    cursor.execute(f'EXPLAIN {sql}', params)
+    columns = [column[0] for column in cursor.description]
+    for values in cursor.fetchall():
+        row = dict(zip(columns, values))
+        detail = f"type={row['type']} key={row['key']} rows={row['rows']} {row['Extra'] or ''}".strip()
+        if row['type'] == 'ALL':
+            yield 'full_scan', row['table'], detail
+        if 'Using filesort' in (row['Extra'] or ''):
+            yield 'filesort', row['table'], detail
+
+
+EXPLAINERS = {
+    'sqlite': explain_sqlite,
+    'mysql': explain_mysql,
+}
+
+
+class Command(BaseCommand):
+    help = ('Sinh dữ liệu giả như benchmark_api, gọi mọi route của managements/urls.py với từng role, rồi '
+            'EXPLAIN mỗi câu truy vấn đã chạy. Báo lỗi nếu quét toàn bảng của người dùng (có khóa ngoại '
+            'tới User) hoặc bảng được lọc theo cột (không tính cột cờ active), trừ bảng trong --allow; '
+            'filesort (sắp xếp không theo index) được liệt kê, '
+            '--fail-on-filesort để coi là lỗi. Dữ liệu được rollback khi xong.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exercisers', type=int, default=20)
+        parser.add_argument('--coaches', type=int, default=3)
+        parser.add_argument('--days', type=int, default=180, help='Số ngày lịch sử HealthRecord mỗi học viên')
+        parser.add_argument('--messages', type=int, default=100, help='Số tin nhắn mỗi cặp học viên - coach')
+        parser.add_argument('--plans', type=int, default=30, help='Số kế hoạch tập mỗi học viên')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--roles', nargs='+', choices=['exerciser', 'coach', 'admin'],
+                            default=['exerciser', 'coach', 'admin'])
+        parser.add_argument('--only', nargs='+', help='Chỉ chạy các endpoint có tên chứa một trong các chuỗi này')
+        parser.add_argument('--allow', nargs='*', default=CATALOG_TABLES, metavar='TABLE',
+                            help='Bảng được phép quét toàn bảng (mặc định các bảng danh mục: %(default)s)')
+        parser.add_argument('--fail-on-filesort', action='store_true')
+        parser.add_argument('--json', action='store_true', help='In kết quả dạng JSON')
+
+    def handle(self, *args, **options):
+        explainer = EXPLAINERS.get(connection.vendor)
+        if explainer is None:
+            raise CommandError(f'Chưa hỗ trợ EXPLAIN cho {connection.vendor}.')
+
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'explain-queries',
+            }}):
+                with transaction.atomic():
+                    bench = BenchmarkCommand(stdout=self.stdout, stderr=self.stderr)
+                    data = bench.seed(options)
+                    queries = self.collect(bench, data, options)
+                    findings = self.explain(explainer, queries)
+                    transaction.set_rollback(True)
+        finally:
+            request_logger.setLevel(level)
+            token_cache.clear()
+
+        failures = self.failures(findings, options)
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'database': connection.vendor,
+                'queries': len(queries),
+                'findings': findings,
+                'failures': len(failures),
+            }, indent=2, ensure_ascii=False))
+        else:
+            self.print_findings(queries, findings, failures)
+        if failures:
+            raise CommandError(f'{len(failures)} câu truy vấn quét toàn bảng hoặc filesort (xem danh sách ở trên).')
+
+    def failures(self, findings, options):
+        """
+        Quét toàn bảng của người dùng hoặc lọc theo cột mà không dùng index, trừ bảng trong --allow.
+        Admin xem toàn bộ danh sách (không lọc theo cột) thì quét toàn bảng là đúng yêu cầu.
+        """
+        allowed = set(options['allow'])
+        owned = user_owned_tables()
+        failures = []
+        for f in findings:
+            if f['kind'] == 'filesort':
+                if options['fail_on_filesort']:
+                    failures.append(f)
+                continue
+            if f['table'] in allowed:
+                continue
+            admin_listing = not f['filter_columns'] and all(e.endswith('(admin)') for e in f['endpoints'])
+            if f['filter_columns'] or (f['table'] in owned and not admin_listing):
+                failures.append(f)
+        return failures
+
+    @contextmanager
+    def capture(self, queries, endpoint):
+        """Gom các câu SELECT/UPDATE/DELETE theo chữ ký SQL, giữ tham số của lần chạy đầu"""
+        def wrapper(execute, sql, params, many, context):
+            if not many and sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+                entry = queries.setdefault(query_signature(sql), {'sql': sql, 'params': params, 'endpoints': set()})
+                entry['endpoints'].add(endpoint)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(wrapper):
+            yield
+
+    def collect(self, bench, data, options):
+        scenarios = bench.scenarios(data)
+        if options['only']:
+            scenarios = [s for s in scenarios if any(part in s[0] for part in options['only'])]
+
+        queries = {}
+        for role in options['roles']:
+            client = Client(HTTP_AUTHORIZATION=f'Bearer {data["tokens"][role]}')
+            for name, method, path, body in scenarios:
+                with self.capture(queries, f'{name} ({role})'):
+                    response = bench.request(client, method, path, body)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+        return queries
+
+    def explain(self, explainer, queries):
+        findings = []
+        with connection.cursor() as cursor:
+            for entry in queries.values():
+                aliases = table_aliases(entry['sql'])
+                for kind, table, detail in explainer(cursor, entry['sql'], entry['params']):
+                    table = aliases.get(table, table)
+                    findings.append({
+                        'kind': kind,
+                        'table': table,
+                        'detail': detail,
+                        'filter_columns': filter_columns(entry['sql'], table) if table else [],
+                        'sql': entry['sql'],
+                        'endpoints': sorted(entry['endpoints']),
+                    })
+        return findings
+
+    def print_findings(self, queries, findings, failures):
+        self.stdout.write(f'{len(queries)} câu truy vấn khác nhau, {connection.vendor}')
+        for finding in findings:
+            mark = 'FAIL' if finding in failures else 'ok  '
+            self.stdout.write(f"{mark} {finding['kind']:<10}{finding['table'] or '':<34}{finding['detail']}")
+            if finding in failures:
+                self.stdout.write(f"     {finding['sql'][:300]}")
+                self.stdout.write(f"     {', '.join(finding['endpoints'][:5])}")
+        if not failures:
+            self.stdout.write('Không có lỗi (no failures).')
@@ -0,0 +1,42 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from managements.exports import EXPORT_FORMATS, EXPORTS, iter_export
+from managements.models import User
+
+
+class Command(BaseCommand):
+    help = 'Xuất lịch sử sức khỏe / kế hoạch của một người dùng ra CSV hoặc NDJSON (ghi dạng stream)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help='id hoặc username')
+        parser.add_argument('--kind', default='all', choices=list(EXPORTS) + ['all'])
+        parser.add_argument('--format', dest='export_format', default='ndjson', choices=EXPORT_FORMATS)
+        parser.add_argument('--output-dir', help='Thư mục ghi file (mặc định in ra stdout)')
+
+    def handle(self, *args, **options):
+        lookup = Q(username=options['user'])
+        if options['user'].isdigit():
+            lookup |= Q(id=int(options['user']))
+        user = User.objects.filter(lookup).first()
+        if not user:
+            raise CommandError('Người dùng không tồn tại.')
+
+        kind, export_format = options['kind'], options['export_format']
+        # CSV mỗi bảng một file vì các bảng khác cột
+        kinds = list(EXPORTS) if kind == 'all' and export_format == 'csv' else [kind]
+        if len(kinds) > 1 and not options['output_dir']:
+            raise CommandError('Xuất tất cả dạng csv cần --output-dir.')
+
+        for kind in kinds:
+            if options['output_dir']:
+                path = Path(options['output_dir']) / f'{user.username}-{kind}.{export_format}'
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with path.open('w', encoding='utf-8', newline='') as output:
+                    output.writelines(iter_export(kind, user, export_format))
+                self.stdout.write(self.style.SUCCESS(f'Đã ghi {path}'))
+            else:
+                sys.stdout.writelines(iter_export(kind, user, export_format))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from managements.images import IMAGE_STALE_SECONDS, recover_uploads
+
+
+class Command(BaseCommand):
+    help = ('Xử lý lại ảnh upload bị mất khi tiến trình web khởi động lại (chạy khi deploy hoặc định kỳ): '
+            'ảnh còn file tạm được xử lý lại, bản ghi không còn file tạm bị đánh dấu failed, '
+            'file tạm không còn dùng bị xóa.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-seconds', type=int, default=IMAGE_STALE_SECONDS,
+                            help='Chỉ xử lý/xóa file tạm cũ hơn số giây này (file mới đang được worker xử lý)')
+
+    def handle(self, *args, **options):
+        result = recover_uploads(options['stale_seconds'])
+        self.stdout.write(
+            f"  Xử lý lại: {result['processed']}, đánh dấu lỗi: {result['failed']}, xóa file tạm: {result['deleted']}"
+        )
+        self.stdout.write(self.style.SUCCESS('Hoàn tất.'))
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('managements', '0015_chatmessage_chat_conversation_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyHealthSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('record_count', models.PositiveIntegerField(default=0)),
+                ('steps_min', models.FloatField(blank=True, null=True)),
+                ('steps_max', models.FloatField(blank=True, null=True)),
+                ('steps_avg', models.FloatField(blank=True, null=True)),
+                ('steps_sum', models.FloatField(blank=True, null=True)),
+                ('water_intake_min', models.FloatField(blank=True, null=True)),
+                ('water_intake_max', models.FloatField(blank=True, null=True)),
+                ('water_intake_avg', models.FloatField(blank=True, null=True)),
+                ('water_intake_sum', models.FloatField(blank=True, null=True)),
+                ('heart_rate_min', models.FloatField(blank=True, null=True)),
+                ('heart_rate_max', models.FloatField(blank=True, null=True)),
+                ('heart_rate_avg', models.FloatField(blank=True, null=True)),
+                ('heart_rate_sum', models.FloatField(blank=True, null=True)),
+                ('weight_min', models.FloatField(blank=True, null=True)),
+                ('weight_max', models.FloatField(blank=True, null=True)),
+                ('weight_avg', models.FloatField(blank=True, null=True)),
+                ('weight_sum', models.FloatField(blank=True, null=True)),
+                ('bmi_min', models.FloatField(blank=True, null=True)),
+                ('bmi_max', models.FloatField(blank=True, null=True)),
+                ('bmi_avg', models.FloatField(blank=True, null=True)),
+                ('bmi_sum', models.FloatField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_health_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
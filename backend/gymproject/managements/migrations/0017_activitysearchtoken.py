@@ -0,0 +1,27 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('managements', '0016_dailyhealthsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivitySearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('activity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='managements.activity')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'activity'], name='activity_search_token_idx')],
+                'unique_together': {('activity', 'token')},
+            },
+        ),
+    ]
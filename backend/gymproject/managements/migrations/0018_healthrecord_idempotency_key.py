@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('managements', '0017_activitysearchtoken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='healthrecord',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='healthrecord',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='healthrecord_idempotency_key'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.2 on 2026-10-18 13:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def build_conversations(apps, schema_editor):
+    ChatMessage = apps.get_model('managements', 'ChatMessage')
+    ChatConversation = apps.get_model('managements', 'ChatConversation')
+
+    conversations = {}
+    pairs = ChatMessage.objects.values('sender', 'receiver').annotate(
+        last_id=Max('id'), unread=Count('id', filter=Q(is_read=False))
+    ).order_by()
+    for pair in pairs:
+        for owner, peer in ((pair['sender'], pair['receiver']), (pair['receiver'], pair['sender'])):
+            entry = conversations.setdefault((owner, peer), {'last_id': 0, 'unread': 0})
+            entry['last_id'] = max(entry['last_id'], pair['last_id'])
+        conversations[(pair['receiver'], pair['sender'])]['unread'] += pair['unread']
+
+    timestamps = dict(ChatMessage.objects.filter(
+        id__in=[entry['last_id'] for entry in conversations.values()]
+    ).values_list('id', 'timestamp'))
+    ChatConversation.objects.bulk_create([
+        ChatConversation(owner_id=owner, peer_id=peer, last_message_id=entry['last_id'],
+                         last_message_at=timestamps.get(entry['last_id']), unread_count=entry['unread'])
+        for (owner, peer), entry in conversations.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('managements', '0019_sync_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatConversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='managements.chatmessage')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to=settings.AUTH_USER_MODEL)),
+                ('peer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-last_message_at'],
+                'indexes': [models.Index(fields=['owner', '-last_message_at'], name='chat_inbox_idx')],
+                'unique_together': {('owner', 'peer')},
+            },
+        ),
+        migrations.RunPython(build_conversations, migrations.RunPython.noop),
+    ]
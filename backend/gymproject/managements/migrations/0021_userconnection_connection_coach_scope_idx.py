@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-18 14:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('managements', '0020_chatconversation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userconnection',
+            index=models.Index(fields=['coach', 'status', 'user'], name='connection_coach_scope_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('managements', '0021_userconnection_connection_coach_scope_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Đang chờ xử lý'), ('processing', 'Đang xử lý'), ('ready', 'Hoàn tất'), ('failed', 'Lỗi')], default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='activity',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='mealplan',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Đang chờ xử lý'), ('processing', 'Đang xử lý'), ('ready', 'Hoàn tất'), ('failed', 'Lỗi')], default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='mealplan',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Đang chờ xử lý'), ('processing', 'Đang xử lý'), ('ready', 'Hoàn tất'), ('failed', 'Lỗi')], default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
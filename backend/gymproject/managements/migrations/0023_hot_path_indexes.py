@@ -0,0 +1,39 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('managements', '0022_image_status_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workoutplan',
+            index=models.Index(fields=['user', 'date'], name='workoutplan_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mealplan',
+            index=models.Index(fields=['goal', 'active'], name='mealplan_goal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthrecord',
+            index=models.Index(fields=['user', 'active', 'date'], name='healthrecord_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthdiary',
+            index=models.Index(fields=['user', 'date'], name='healthdiary_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthdiary',
+            index=models.Index(fields=['date'], name='healthdiary_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['receiver', 'is_read', 'sender'], name='chat_unread_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+from managements.search import token_weights
+
+
+def backfill_search_tokens(apps, schema_editor):
+    """Dựng chỉ mục tìm kiếm cho các Activity có từ trước 0017 (chưa có token nào)"""
+    Activity = apps.get_model('managements', 'Activity')
+    ActivitySearchToken = apps.get_model('managements', 'ActivitySearchToken')
+
+    batch = []
+    activities = Activity.objects.filter(search_tokens=None).only('id', 'name', 'description').order_by('id')
+    for activity in activities.iterator(chunk_size=1000):
+        batch.extend(
+            ActivitySearchToken(activity_id=activity.id, token=token, weight=weight)
+            for token, weight in token_weights(activity.name, activity.description).items()
+        )
+        if len(batch) >= 10000:
+            ActivitySearchToken.objects.bulk_create(batch, batch_size=1000)
+            batch = []
+    ActivitySearchToken.objects.bulk_create(batch, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('managements', '0023_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('managements', '0024_backfill_activity_search_tokens'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['sender', 'timestamp', 'id'], name='chat_sent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['receiver', 'timestamp', 'id'], name='chat_received_idx'),
+        ),
+    ]
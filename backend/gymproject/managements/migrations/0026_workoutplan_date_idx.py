@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-18 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('managements', '0025_chat_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workoutplan',
+            index=models.Index(fields=['date'], name='workoutplan_date_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.2 on 2026-10-18 21:20
+
+from django.db import migrations, models
+
+
+def clear_generated_keys(apps, schema_editor):
+    # Khóa 'bulk-<uuid>' do bulk ingest tự sinh cho phần tử không gửi idempotency_key
+    HealthRecord = apps.get_model('managements', 'HealthRecord')
+    HealthRecord.objects.filter(idempotency_key__startswith='bulk-').update(idempotency_key=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('managements', '0026_workoutplan_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='healthrecord',
+            name='ingest_batch',
+            field=models.UUIDField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(clear_generated_keys, migrations.RunPython.noop),
+    ]
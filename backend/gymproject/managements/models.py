@@ -9,6 +9,8 @@ from enum import IntEnum
 class BaseModel(models.Model):
     created_date = models.DateField(auto_now_add=True, null=True)
     updated_date = models.DateField(auto_now=True, null=True)
+    # Mốc thay đổi chính xác tới micro giây, dùng cho đồng bộ tăng dần (sync)
+    updated_at = models.DateTimeField(auto_now=True)
     active = models.BooleanField(default=True)
 
     class Meta:
@@ -26,8 +28,18 @@ class Role(IntEnum):
         return [(role.value, role.name.capitalize()) for role in cls]
 
 
+class ImageStatus(models.TextChoices):
+    PENDING = 'pending', 'Đang chờ xử lý'
+    PROCESSING = 'processing', 'Đang xử lý'
+    READY = 'ready', 'Hoàn tất'
+    FAILED = 'failed', 'Lỗi'
+
+
 class User(AbstractUser):
     avatar = CloudinaryField('avatar', null=True, blank=True, folder='avatar', default='')
+    # Trạng thái xử lý ảnh upload bất đồng bộ và URL các phiên bản (original/medium/thumbnail)
+    avatar_status = models.CharField(max_length=20, choices=ImageStatus.choices, blank=True, default='')
+    avatar_variants = models.JSONField(default=dict, blank=True)
     email = models.EmailField(unique=True, null=False, max_length=255)
     role = models.IntegerField(
         choices=Role.choices(),
@@ -46,12 +58,30 @@ class Activity(BaseModel):
     time = models.IntegerField(null=True, blank=True)
     date = models.DateField(default=timezone.localdate)
     image = CloudinaryField('activity_image', null=True, blank=True)
+    image_status = models.CharField(max_length=20, choices=ImageStatus.choices, blank=True, default='')
+    image_variants = models.JSONField(default=dict, blank=True)
     active = models.BooleanField(default=True)
 
     def __str__(self):
         return self.name
 
 
+class ActivitySearchToken(models.Model):
+    """Chỉ mục đảo cho tìm kiếm Activity: mỗi token (đã bỏ dấu) kèm trọng số"""
+    activity = models.ForeignKey(Activity, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=64)
+    weight = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.token} -> {self.activity_id}"
+
+    class Meta:
+        unique_together = ('activity', 'token')
+        indexes = [
+            models.Index(fields=['token', 'activity'], name='activity_search_token_idx'),
+        ]
+
+
 class WorkoutPlan(BaseModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
@@ -64,6 +94,15 @@ class WorkoutPlan(BaseModel):
     def __str__(self):
         return self.name
 
+    class Meta(BaseModel.Meta):
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='workoutplan_sync_idx'),
+            # Kế hoạch theo khoảng ngày của một người (weekly-summary, roster)
+            models.Index(fields=['user', 'date'], name='workoutplan_user_date_idx'),
+            # Kế hoạch của tất cả theo khoảng ngày (thống kê admin)
+            models.Index(fields=['date'], name='workoutplan_date_idx'),
+        ]
+
 
 class MealPlan(BaseModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -73,11 +112,20 @@ class MealPlan(BaseModel):
     calories_intake = models.FloatField(null=True, blank=True)
     goal = models.CharField(max_length=20, choices=[('maintain', 'Duy trì'), ('lose', 'Giảm cân'), ('gain', 'Tăng cơ')], default='maintain')
     image = models.ImageField(upload_to='mealplan_images/', null=True, blank=True)
+    image_status = models.CharField(max_length=20, choices=ImageStatus.choices, blank=True, default='')
+    image_variants = models.JSONField(default=dict, blank=True)
     active = models.BooleanField(default=True)
 
     def __str__(self):
         return self.name
 
+    class Meta(BaseModel.Meta):
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='mealplan_sync_idx'),
+            # Thực đơn gợi ý theo mục tiêu (mealplans-by-goal)
+            models.Index(fields=['goal', 'active'], name='mealplan_goal_idx'),
+        ]
+
 
 
 class CoachProfile(BaseModel):
@@ -99,6 +147,54 @@ class HealthRecord(BaseModel):
     height = models.FloatField(null=True, blank=True)
     weight = models.FloatField(null=True, blank=True)
     bmi = models.FloatField(editable=False, blank=True, null=True)
+    # Khóa chống trùng khi thiết bị đeo gửi lại cùng một lô dữ liệu
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+    # Đánh dấu tạm một lô bulk_create để đọc lại id trên backend không trả pk (MySQL); NULL sau khi ghi
+    ingest_batch = models.UUIDField(null=True, blank=True, editable=False, db_index=True)
+
+    class Meta(BaseModel.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='healthrecord_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='healthrecord_sync_idx'),
+            # Bản ghi của một người theo khoảng thời gian (tổng hợp ngày, tiến độ mục tiêu)
+            models.Index(fields=['user', 'active', 'date'], name='healthrecord_user_date_idx'),
+        ]
+
+
+class DailyHealthSummary(models.Model):
+    """Tổng hợp HealthRecord theo ngày của từng người dùng (min/max/avg/sum)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_health_summaries')
+    date = models.DateField()
+    record_count = models.PositiveIntegerField(default=0)
+    steps_min = models.FloatField(null=True, blank=True)
+    steps_max = models.FloatField(null=True, blank=True)
+    steps_avg = models.FloatField(null=True, blank=True)
+    steps_sum = models.FloatField(null=True, blank=True)
+    water_intake_min = models.FloatField(null=True, blank=True)
+    water_intake_max = models.FloatField(null=True, blank=True)
+    water_intake_avg = models.FloatField(null=True, blank=True)
+    water_intake_sum = models.FloatField(null=True, blank=True)
+    heart_rate_min = models.FloatField(null=True, blank=True)
+    heart_rate_max = models.FloatField(null=True, blank=True)
+    heart_rate_avg = models.FloatField(null=True, blank=True)
+    heart_rate_sum = models.FloatField(null=True, blank=True)
+    weight_min = models.FloatField(null=True, blank=True)
+    weight_max = models.FloatField(null=True, blank=True)
+    weight_avg = models.FloatField(null=True, blank=True)
+    weight_sum = models.FloatField(null=True, blank=True)
+    bmi_min = models.FloatField(null=True, blank=True)
+    bmi_max = models.FloatField(null=True, blank=True)
+    bmi_avg = models.FloatField(null=True, blank=True)
+    bmi_sum = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.date}"
+
+    class Meta:
+        unique_together = ('user', 'date')
+        ordering = ['-date']
 
 
 class HealthDiary(BaseModel):
@@ -113,6 +209,12 @@ class HealthDiary(BaseModel):
     class Meta:
         unique_together = []
         ordering = ['-id']
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='healthdiary_sync_idx'),
+            # Danh sách nhật ký sắp theo -date: của một người, và của tất cả (admin, thống kê)
+            models.Index(fields=['user', 'date'], name='healthdiary_user_date_idx'),
+            models.Index(fields=['date'], name='healthdiary_date_idx'),
+        ]
 
 
 class ChatMessage(BaseModel):
@@ -128,6 +230,39 @@ class ChatMessage(BaseModel):
     class Meta:
         ordering = ['timestamp']
         unique_together = ('sender', 'receiver', 'timestamp')
+        indexes = [
+            # Phân trang keyset theo hội thoại: (sender, receiver) + (timestamp, id)
+            models.Index(fields=['sender', 'receiver', 'timestamp', 'id'], name='chat_conversation_idx'),
+            # Danh sách tin của một user (chatmessage/): nhánh đã gửi và nhánh đã nhận
+            models.Index(fields=['sender', 'timestamp', 'id'], name='chat_sent_idx'),
+            models.Index(fields=['receiver', 'timestamp', 'id'], name='chat_received_idx'),
+            models.Index(fields=['sender', 'updated_at'], name='chat_sender_sync_idx'),
+            models.Index(fields=['receiver', 'updated_at'], name='chat_receiver_sync_idx'),
+            # Đếm / đánh dấu tin chưa đọc của người nhận theo từng người gửi
+            models.Index(fields=['receiver', 'is_read', 'sender'], name='chat_unread_idx'),
+        ]
+
+
+class ChatConversation(models.Model):
+    """
+    Hộp thư của owner: mỗi người chat cùng (peer) một dòng, gồm tin nhắn cuối và số
+    tin peer gửi mà owner chưa đọc. Được cập nhật khi có tin nhắn / đánh dấu đã đọc.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversations')
+    peer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    last_message = models.ForeignKey(ChatMessage, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    unread_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.owner.username} - {self.peer.username} ({self.unread_count})"
+
+    class Meta:
+        unique_together = ('owner', 'peer')
+        ordering = ['-last_message_at']
+        indexes = [
+            models.Index(fields=['owner', '-last_message_at'], name='chat_inbox_idx'),
+        ]
 
 
 class UserGoal(BaseModel):
@@ -140,6 +275,11 @@ class UserGoal(BaseModel):
     def __str__(self):
         return f"Mục tiêu của {self.user.username} - {self.goal_type}"
 
+    class Meta(BaseModel.Meta):
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='usergoal_sync_idx'),
+        ]
+
 
 class UserConnection(BaseModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="user_connections")
@@ -156,3 +296,7 @@ class UserConnection(BaseModel):
 
     class Meta:
         unique_together = ('user', 'coach')
+        indexes = [
+            # Phạm vi dữ liệu của coach: học viên đã chấp nhận kết nối
+            models.Index(fields=['coach', 'status', 'user'], name='connection_coach_scope_idx'),
+        ]
@@ -1,4 +1,109 @@
+import heapq
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from itertools import islice
+from operator import attrgetter
+
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
 
 class Pagination(pagination.PageNumberPagination):
-    page_size = 5
\ No newline at end of file
+    page_size = 5
+
+
+class KeysetPagination(pagination.BasePagination):
+    """
+    Phân trang theo con trỏ (keyset) trên cặp (timestamp, id).
+
+    - Không có con trỏ: trả về trang mới nhất.
+    - ?before=<cursor>: tải các bản ghi cũ hơn ("load older").
+    - ?after=<cursor>: lấy các bản ghi mới hơn ("poll newer").
+
+    Kết quả trong trang luôn xếp tăng dần theo thời gian.
+
+    queryset có thể là danh sách các nhánh (ví dụ hai chiều của một hội thoại): mỗi nhánh là
+    một câu ORDER BY ... LIMIT n+1 đi thẳng trên index, kết quả được trộn lại trong Python.
+    Gộp các nhánh bằng OR khiến DB phải đọc và sắp xếp toàn bộ lịch sử ở mỗi trang.
+    """
+    page_size = 30
+    max_page_size = 100
+    page_size_query_param = 'limit'
+    ordering = ('timestamp', 'id')
+    invalid_cursor_message = 'Con trỏ không hợp lệ.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        before = self.decode_cursor(request.query_params.get('before'))
+        after = self.decode_cursor(request.query_params.get('after'))
+        branches = queryset if isinstance(queryset, (list, tuple)) else [queryset]
+
+        descending = after is None
+        merged = heapq.merge(
+            *(self.fetch(branch, before, after) for branch in branches),
+            key=attrgetter(*self.ordering), reverse=descending,
+        )
+        rows = list(islice(merged, self.page_size + 1))
+        if after is not None:
+            self.has_newer = len(rows) > self.page_size
+            rows = rows[:self.page_size]
+            self.has_older = True
+        else:
+            self.has_older = len(rows) > self.page_size
+            rows = rows[:self.page_size][::-1]
+            self.has_newer = before is not None
+
+        self.page = rows
+        # Khi không có bản ghi mới, client tiếp tục poll bằng con trỏ cũ
+        self.newer_cursor = self.encode_cursor(rows[-1]) if rows else request.query_params.get('after')
+        self.older_cursor = self.encode_cursor(rows[0]) if rows and self.has_older else None
+        return rows
+
+    def fetch(self, queryset, before, after):
+        """
+        page_size + 1 dòng của một nhánh tính từ con trỏ. Điều kiện viết dạng khoảng
+        (timestamp >= t AND NOT (timestamp = t AND id <= pk)) để DB quét theo index thay vì OR.
+        """
+        field, tie = self.ordering
+        limit = self.page_size + 1
+        if after is not None:
+            queryset = queryset.filter(**{f'{field}__gte': after[0]}).exclude(
+                **{field: after[0], f'{tie}__lte': after[1]}
+            )
+            return list(queryset.order_by(field, tie)[:limit])
+        if before is not None:
+            queryset = queryset.filter(**{f'{field}__lte': before[0]}).exclude(
+                **{field: before[0], f'{tie}__gte': before[1]}
+            )
+        return list(queryset.order_by(f'-{field}', f'-{tie}')[:limit])
+
+    def get_paginated_response(self, data):
+        return Response({
+            'older': self.older_cursor,
+            'newer': self.newer_cursor,
+            'has_older': self.has_older,
+            'has_newer': self.has_newer,
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, obj):
+        field, tie = self.ordering
+        raw = f'{getattr(obj, field).isoformat()}|{getattr(obj, tie)}'
+        return urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            value, pk = urlsafe_b64decode(cursor.encode('ascii')).decode('ascii').rsplit('|', 1)
+            return datetime.fromisoformat(value), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
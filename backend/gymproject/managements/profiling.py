@@ -0,0 +1,251 @@
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+from rest_framework.serializers import BaseSerializer
+
+from managements.fastpath import FastSerializer
+
+# Chuỗi IN (%s, %s, ...) có độ dài khác nhau vẫn là cùng một câu truy vấn
+IN_PLACEHOLDERS_RE = re.compile(r'\((?:%s, )+%s\)')
+
+_current = ContextVar('managements_profile', default=None)
+
+
+def profiling_options():
+    options = getattr(settings, 'PROFILING', {})
+    return {
+        'ENABLED': options.get('ENABLED', False),
+        'BUFFER_SIZE': options.get('BUFFER_SIZE', 2000),
+        'DUPLICATE_THRESHOLD': options.get('DUPLICATE_THRESHOLD', 3),
+    }
+
+
+def percentile(values, p):
+    """Percentile theo nearest-rank trên danh sách đã sắp xếp"""
+    if not values:
+        return None
+    rank = max(1, -(-p * len(values) // 100))
+    return values[int(rank) - 1]
+
+
+def query_signature(sql):
+    return IN_PLACEHOLDERS_RE.sub('(...)', sql)
+
+
+class RingBuffer:
+    """Giữ N bản ghi profile gần nhất của tiến trình (mỗi worker có buffer riêng)"""
+
+    def __init__(self, size):
+        self._records = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def append(self, record):
+        with self._lock:
+            self._records.append(record)
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def __len__(self):
+        return len(self._records)
+
+
+profile_buffer = RingBuffer(profiling_options()['BUFFER_SIZE'])
+
+
+class RequestProfile:
+    """Số liệu của một request đang chạy: query (theo chữ ký SQL) và thời gian serialize"""
+
+    def __init__(self):
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.signatures = Counter()
+        self.serializer_seconds = 0.0
+        self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_seconds += time.perf_counter() - started
+            self.query_count += 1
+            self.signatures[query_signature(sql)] += 1
+
+
+def _timed(func):
+    """Cộng thời gian của lời gọi ngoài cùng (serializer lồng nhau không bị tính hai lần)"""
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        profile.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.serializer_depth -= 1
+            if not profile.serializer_depth:
+                profile.serializer_seconds += time.perf_counter() - started
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+def instrument_serializers():
+    """Đo thời gian BaseSerializer.data và FastSerializer.serialize (chỉ khi bật profiling)"""
+    if hasattr(BaseSerializer.data.fget, '__wrapped__'):
+        return
+    BaseSerializer.data = property(_timed(BaseSerializer.data.fget))
+    FastSerializer.serialize = _timed(FastSerializer.serialize)
+
+
+def endpoint_name(request, view_func):
+    """Tên action DRF như workoutplan-weekly-summary; None với view không phải DRF"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return None
+    actions = getattr(view_func, 'actions', None)
+    basename = getattr(view_func, 'initkwargs', {}).get('basename')
+    if actions and basename:
+        action = actions.get(request.method.lower())
+        if action:
+            return f"{basename}-{action.replace('_', '-')}"
+    match = request.resolver_match
+    return match.url_name if match and match.url_name else cls.__name__
+
+
+class ProfilingMiddleware:
+    """
+    Ghi lại cho mỗi request tới view DRF: thời gian xử lý, số query và thời gian query,
+    các câu lặp lại (dấu hiệu N+1), thời gian serialize và kích thước response.
+    Chỉ chạy khi PROFILING['ENABLED']; xem kết quả ở trang admin profiling/.
+    """
+
+    def __init__(self, get_response):
+        options = profiling_options()
+        if not options['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.duplicate_threshold = options['DUPLICATE_THRESHOLD']
+        instrument_serializers()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            with self.recording(profile):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        endpoint = getattr(request, '_profiling_endpoint', None)
+        if endpoint is None:
+            return response
+        if response.streaming:
+            # Query của response dạng stream (export/) chạy khi gửi nội dung, ghi lại sau khi gửi xong
+            stream = self.astream if response.is_async else self.stream
+            response.streaming_content = stream(
+                response.streaming_content, request, response, endpoint, profile, started
+            )
+        else:
+            profile_buffer.append(self.build_record(request, response, endpoint, profile, started))
+        return response
+
+    def recording(self, profile):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(profile))
+        return stack
+
+    def stream(self, content, request, response, endpoint, profile, started):
+        size = 0
+        try:
+            with self.recording(profile):
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            profile_buffer.append(self.build_record(request, response, endpoint, profile, started, size))
+
+    async def astream(self, content, request, response, endpoint, profile, started):
+        # Query của iterator async chạy trong thread của sync_to_async: gắn execute_wrapper ở thread đó
+        size = 0
+        recording = await sync_to_async(self.recording)(profile)
+        try:
+            async for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            await sync_to_async(recording.close)()
+            profile_buffer.append(self.build_record(request, response, endpoint, profile, started, size))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._profiling_endpoint = endpoint_name(request, view_func)
+
+    def build_record(self, request, response, endpoint, profile, started, size=None):
+        duplicates = [
+            {'sql': sql, 'count': count}
+            for sql, count in profile.signatures.most_common(5) if count >= self.duplicate_threshold
+        ]
+        return {
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'at': timezone.now().isoformat(),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+            'queries': profile.query_count,
+            'query_ms': round(profile.query_seconds * 1000, 3),
+            'duplicates': duplicates,
+            'serializer_ms': round(profile.serializer_seconds * 1000, 3),
+            'response_bytes': size if response.streaming else len(response.content),
+        }
+
+
+def endpoint_report(records=None):
+    """Gộp các bản ghi trong buffer theo endpoint, endpoint chậm nhất (p95) lên đầu"""
+    records = profile_buffer.records() if records is None else records
+    grouped = {}
+    for record in records:
+        grouped.setdefault(record['endpoint'], []).append(record)
+
+    report = []
+    for endpoint, rows in grouped.items():
+        durations = sorted(row['duration_ms'] for row in rows)
+        sizes = [row['response_bytes'] for row in rows if row['response_bytes'] is not None]
+        duplicates = Counter()
+        for row in rows:
+            for duplicate in row['duplicates']:
+                duplicates[duplicate['sql']] = max(duplicates[duplicate['sql']], duplicate['count'])
+        count = len(rows)
+        report.append({
+            'endpoint': endpoint,
+            'requests': count,
+            'p50_ms': percentile(durations, 50),
+            'p95_ms': percentile(durations, 95),
+            'max_ms': durations[-1],
+            'queries_avg': round(sum(row['queries'] for row in rows) / count, 2),
+            'queries_max': max(row['queries'] for row in rows),
+            'query_ms_avg': round(sum(row['query_ms'] for row in rows) / count, 3),
+            'serializer_ms_avg': round(sum(row['serializer_ms'] for row in rows) / count, 3),
+            'response_bytes_avg': round(sum(sizes) / len(sizes)) if sizes else None,
+            'n_plus_one_requests': sum(1 for row in rows if row['duplicates']),
+            'duplicates': [{'sql': sql, 'count': n} for sql, n in duplicates.most_common(3)],
+        })
+    report.sort(key=lambda row: row['p95_ms'], reverse=True)
+    return report
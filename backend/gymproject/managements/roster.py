@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from managements.caches import invalidate_namespace, namespaced_key
+from managements.db.routers import primary_reads
+from managements.goals import progress_percent, start_weight_subquery
+from managements.models import DailyHealthSummary, HealthRecord, User, UserConnection, UserGoal, WorkoutPlan
+from managements.serializers import UserReadSerializer
+
+ROSTER_NAMESPACE = 'coach-roster'
+ROSTER_STEP_DAYS = 7
+
+
+def roster_namespace(coach_id):
+    return f'{ROSTER_NAMESPACE}:{coach_id}'
+
+
+def invalidate_roster(coach_id):
+    invalidate_namespace(roster_namespace(coach_id))
+
+
+def invalidate_client_rosters(user_id):
+    """Làm mới roster của mọi coach đang theo dõi user (khi dữ liệu của user thay đổi)"""
+    coach_ids = UserConnection.objects.filter(
+        user_id=user_id, status='accepted', active=True
+    ).values_list('coach_id', flat=True)
+    for coach_id in coach_ids:
+        invalidate_roster(coach_id)
+
+
+def build_roster(coach):
+    """
+    Chỉ số của mọi học viên đã kết nối (accepted) với coach. Mỗi chỉ số là một câu
+    GROUP BY / IN trên toàn bộ học viên nên số query cố định, không phụ thuộc số học viên.
+    """
+    today = timezone.localdate()
+    # "Mới nhất" theo ngày (bản ghi nhập bù có thể có id lớn hơn nhưng ngày cũ hơn), rồi theo id
+    clients = list(
+        User.objects.filter(
+            user_connections__coach=coach, user_connections__status='accepted', user_connections__active=True,
+            is_active=True,
+        ).annotate(
+            latest_record_id=Subquery(
+                HealthRecord.objects.filter(user_id=OuterRef('pk'), active=True, weight__isnull=False)
+                .order_by('-date', '-id').values('id')[:1]
+            ),
+            latest_goal_id=Subquery(
+                UserGoal.objects.filter(user_id=OuterRef('pk'), active=True, target_weight__isnull=False)
+                .order_by('-created_date', '-id').values('id')[:1]
+            ),
+        ).order_by('id')
+    )
+    if not clients:
+        return []
+    client_ids = [client.id for client in clients]
+
+    # HealthRecord mới nhất có cân nặng của từng học viên
+    latest = {
+        row['user_id']: row
+        for row in HealthRecord.objects.filter(
+            id__in=[client.latest_record_id for client in clients if client.latest_record_id]
+        ).values('user_id', 'weight', 'bmi', 'date')
+    }
+
+    steps = dict(
+        DailyHealthSummary.objects.filter(
+            user_id__in=client_ids, date__gt=today - timedelta(days=ROSTER_STEP_DAYS), date__lte=today,
+        ).values('user_id').annotate(steps=Sum('steps_sum')).values_list('user_id', 'steps')
+    )
+
+    last_workouts = dict(
+        WorkoutPlan.objects.filter(user_id__in=client_ids, active=True, date__lte=today)
+        .values('user_id').annotate(last_date=Max('date')).values_list('user_id', 'last_date')
+    )
+
+    # Mục tiêu cân nặng mới nhất của từng học viên, kèm cân nặng ngày bắt đầu mục tiêu
+    goals = {
+        goal.user_id: goal
+        for goal in UserGoal.objects.filter(
+            id__in=[client.latest_goal_id for client in clients if client.latest_goal_id]
+        ).annotate(start_weight=start_weight_subquery())
+    }
+
+    roster = []
+    for client in clients:
+        record = latest.get(client.id)
+        goal = goals.get(client.id)
+        current_weight = record['weight'] if record else None
+        roster.append({
+            'user': UserReadSerializer(client).data,
+            'latest_weight': current_weight,
+            'latest_bmi': record['bmi'] if record else None,
+            'latest_record_at': record['date'] if record else None,
+            'steps_7d': int(steps.get(client.id) or 0),
+            'last_workout_date': last_workouts.get(client.id),
+            'goal': {
+                'id': goal.id,
+                'goal_type': goal.goal_type,
+                'target_weight': goal.target_weight,
+                'target_date': goal.target_date,
+                'start_weight': goal.start_weight,
+                'progress': progress_percent(goal.start_weight, current_weight, goal.target_weight),
+            } if goal else None,
+        })
+    return roster
+
+
+def get_roster(coach):
+    """Bản có cache theo coach (TTL = ROSTER_CACHE_TIMEOUT), bị vô hiệu hóa khi học viên ghi dữ liệu"""
+    key = namespaced_key(roster_namespace(coach.id), timezone.localdate().isoformat())
+    roster = cache.get(key)
+    if roster is None:
+        with primary_reads():
+            roster = build_roster(coach)
+        cache.set(key, roster, getattr(settings, 'ROSTER_CACHE_TIMEOUT', 300))
+    return roster
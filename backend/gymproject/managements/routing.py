@@ -0,0 +1,46 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.urls import re_path
+
+from managements import consumers
+from managements.authentication import lookup_token
+
+
+@database_sync_to_async
+def get_token_user(token):
+    result = lookup_token(token)
+    if result is None:
+        return AnonymousUser()
+    return result[0]
+
+
+class OAuth2TokenAuthMiddleware:
+    """
+    Xác thực WebSocket bằng access token OAuth2 (app mobile không có session).
+    Token lấy từ query string ?token=... hoặc header Authorization: Bearer ...
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        token = self.get_token(scope)
+        if token:
+            scope = dict(scope, user=await get_token_user(token))
+        return await self.app(scope, receive, send)
+
+    def get_token(self, scope):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        if query.get('token'):
+            return query['token'][0]
+        for name, value in scope.get('headers', []):
+            if name == b'authorization' and value.lower().startswith(b'bearer '):
+                return value[7:].decode().strip()
+        return None
+
+
+websocket_urlpatterns = [
+    re_path(r'^ws/chat/(?P<peer_id>\d+)/$', consumers.ChatConsumer.as_asgi()),
+]
@@ -0,0 +1,50 @@
+from managements.models import Role, User, UserConnection
+
+
+def connected_user_ids(coach):
+    """id các học viên đã chấp nhận kết nối với coach (dùng index connection_coach_scope_idx)"""
+    return UserConnection.objects.filter(
+        coach=coach, status='accepted', active=True
+    ).values_list('user_id', flat=True)
+
+
+def scope_user_ids(viewer):
+    """
+    Tập id user mà viewer được xem dữ liệu: None với Admin (không giới hạn), chính
+    mình và các học viên đã kết nối với Coach, chỉ chính mình với người dùng khác.
+    """
+    if viewer.role == Role.Admin:
+        return None
+    user_ids = {viewer.pk}
+    if viewer.role == Role.Coach:
+        user_ids.update(connected_user_ids(viewer))
+    return user_ids
+
+
+def scope_queryset(queryset, viewer, owner_field='user'):
+    """
+    Giới hạn queryset theo chủ sở hữu. Tập id được tính trước (một query trên index
+    của UserConnection) rồi lọc bằng IN trên index của owner_field: MySQL không
+    semi-join được subquery nằm trong OR nên không gộp "của mình OR học viên" thành subquery.
+    """
+    user_ids = scope_user_ids(viewer)
+    if user_ids is None:
+        return queryset
+    if len(user_ids) == 1:
+        return queryset.filter(**{f'{owner_field}_id': viewer.pk})
+    return queryset.filter(**{f'{owner_field}_id__in': sorted(user_ids)})
+
+
+def can_access_user(viewer, user_id):
+    user_ids = scope_user_ids(viewer)
+    return user_ids is None or int(user_id) in user_ids
+
+
+def get_scoped_user(viewer, user_id):
+    """User theo id nếu viewer được xem dữ liệu của user đó, ngược lại None"""
+    try:
+        if not can_access_user(viewer, user_id):
+            return None
+    except (TypeError, ValueError):
+        return None
+    return User.objects.filter(id=user_id).first()
@@ -0,0 +1,100 @@
+import html
+import re
+import unicodedata
+from collections import Counter
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery, Sum
+from django.utils.html import strip_tags
+
+from managements.models import Activity, ActivitySearchToken
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+MAX_TOKEN_LENGTH = 64
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+
+
+def fold_text(text):
+    """Bỏ thẻ HTML, chữ thường và bỏ dấu tiếng Việt: 'Chạy bộ <b>đều</b>' -> 'chay bo deu'"""
+    text = html.unescape(strip_tags(text or '')).lower().replace('đ', 'd')
+    text = unicodedata.normalize('NFD', text)
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    return [token[:MAX_TOKEN_LENGTH] for token in TOKEN_RE.findall(fold_text(text))]
+
+
+def token_weights(name, description):
+    """{token: trọng số} của một Activity; không dùng model nên migration gọi được"""
+    weights = Counter()
+    for token in tokenize(name):
+        weights[token] += NAME_WEIGHT
+    for token in tokenize(description):
+        weights[token] += DESCRIPTION_WEIGHT
+    return weights
+
+
+def activity_tokens(activity):
+    return [
+        ActivitySearchToken(activity_id=activity.id, token=token, weight=weight)
+        for token, weight in token_weights(activity.name, activity.description).items()
+    ]
+
+
+def index_activity(activity):
+    """Cập nhật chỉ mục cho một Activity (gọi sau khi lưu)"""
+    with transaction.atomic():
+        ActivitySearchToken.objects.filter(activity_id=activity.id).delete()
+        ActivitySearchToken.objects.bulk_create(activity_tokens(activity))
+
+
+def index_activities(queryset, chunk_size=1000):
+    """Dựng chỉ mục cho một tập Activity, đọc và ghi theo từng chunk"""
+    total = 0
+    batch = []
+    for activity in queryset.only('id', 'name', 'description').iterator(chunk_size=chunk_size):
+        batch.extend(activity_tokens(activity))
+        if len(batch) >= chunk_size * 10:
+            ActivitySearchToken.objects.bulk_create(batch, batch_size=chunk_size)
+            total += len(batch)
+            batch = []
+    ActivitySearchToken.objects.bulk_create(batch, batch_size=chunk_size)
+    return total + len(batch)
+
+
+def rebuild_index(chunk_size=1000):
+    with transaction.atomic():
+        ActivitySearchToken.objects.all().delete()
+        return index_activities(Activity.objects.order_by('id'), chunk_size=chunk_size)
+
+
+def search_activities(queryset, q):
+    """
+    Lọc và xếp hạng queryset Activity theo chỉ mục. Mọi từ đều phải khớp, từ cuối
+    khớp theo tiền tố (autocomplete). Điểm = tổng trọng số các token khớp.
+    """
+    terms = tokenize(q)
+    if not terms:
+        return queryset.none()
+
+    # Tiền tố viết dưới dạng khoảng [prefix, prefix + '{') để mọi DB đều dùng được index
+    # (token chỉ gồm [a-z0-9], '{' là ký tự ngay sau 'z')
+    prefix = terms[-1]
+    conditions = [Q(token=term) for term in terms[:-1]]
+    conditions.append(Q(token__gte=prefix, token__lt=prefix + '{'))
+
+    # Mỗi từ là một subquery IN trên index (token, activity); giao các tập kết quả
+    for condition in conditions:
+        queryset = queryset.filter(pk__in=ActivitySearchToken.objects.filter(condition).values('activity_id'))
+
+    rank = (
+        ActivitySearchToken.objects.filter(reduce(or_, conditions), activity_id=OuterRef('pk'))
+        .values('activity_id')
+        .annotate(rank=Sum('weight'))
+        .values('rank')
+    )
+    return queryset.annotate(search_rank=Subquery(rank)).order_by('-search_rank', '-id')
@@ -1,24 +1,40 @@
 from rest_framework import serializers
 from rest_framework.serializers import *
 from managements.models import *
+from managements.images import image_url
+
+
+class EagerLoadingMixin:
+    """Serializer khai báo các quan hệ cần join sẵn để tránh N+1 query"""
+    select_related_fields = []
+    prefetch_related_fields = []
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
 
 class UserSerializer(serializers.ModelSerializer):
     confirm_password = serializers.CharField(write_only=True, required=False)
     avatar_url = serializers.SerializerMethodField()
     role_name = serializers.SerializerMethodField()
+    # Cột mà các SerializerMethodField cần, dùng cho đường đọc nhanh (fastpath)
+    fast_sources = {"avatar_url": ["avatar", "avatar_variants"], "role_name": ["role"]}
 
     class Meta:
         model = User
         fields = [
-            "id", "username", "password", "confirm_password", "avatar_url",
+            "id", "username", "password", "confirm_password", "avatar_url", "avatar_status", "avatar_variants",
             "first_name", "last_name", "email", "role", "role_name"
         ]
+        read_only_fields = ["avatar_status", "avatar_variants"]
         extra_kwargs = {"password": {"write_only": True}}
 
     def get_avatar_url(self, obj):
-        if obj.avatar and hasattr(obj.avatar, 'url'):
-            return obj.avatar.url
-        return None
+        return image_url(obj, 'avatar')
 
     def get_role_name(self, obj):
         role_map = {0: "Admin", 1: "Exerciser", 2: "Coach"}
@@ -66,18 +82,17 @@ class UserSerializer(serializers.ModelSerializer):
 class UserReadSerializer(serializers.ModelSerializer):
     avatar_url = serializers.SerializerMethodField()
     role_name = serializers.SerializerMethodField()
+    fast_sources = {"avatar_url": ["avatar", "avatar_variants"], "role_name": ["role"]}
 
     def get_avatar_url(self, user):
-        if user.avatar and hasattr(user.avatar, 'url'):
-            return user.avatar.url
-        return None
+        return image_url(user, 'avatar')
 
     def get_role_name(self, user):
         return user.get_role_display()
 
     class Meta:
         model = User
-        fields = ["id", "username", "first_name", "last_name", "email", "avatar_url", "role", "role_name"]
+        fields = ["id", "username", "first_name", "last_name", "email", "avatar_url", "avatar_variants", "role", "role_name"]
 
 class ChangePasswordSerializer(serializers.Serializer):
     current_password = CharField(write_only=True, required=True)
@@ -97,22 +112,23 @@ class ChangePasswordSerializer(serializers.Serializer):
 
 class ActivitySerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    fast_sources = {'image_url': ['image', 'image_variants']}
 
     def get_image_url(self, obj):
-        if obj.image and hasattr(obj.image, 'url'):
-            return obj.image.url  # Cloudinary đã là full URL
-        return None
+        return image_url(obj, 'image')  # Cloudinary đã là full URL
 
     class Meta:
         model = Activity
-        fields = ['id', 'name', 'description', 'calories_burned', 'image_url']
+        fields = ['id', 'name', 'description', 'calories_burned', 'image_url', 'image_status', 'image_variants']
+        read_only_fields = ['image_status', 'image_variants']
 
 class ActivityStatisticsSerializer(serializers.ModelSerializer):
     class Meta:
         model = Activity
         fields = ['date', 'calories_burned', 'time']
 
-class WorkoutPlanSerializer(serializers.ModelSerializer):
+class WorkoutPlanSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    prefetch_related_fields = ['activities']
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
     activities = serializers.PrimaryKeyRelatedField(
         many=True, queryset=Activity.objects.all()
@@ -130,29 +146,35 @@ class WorkoutPlanSerializer(serializers.ModelSerializer):
 
 
 
-class MealPlanSerializer(serializers.ModelSerializer):
+class MealPlanSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ['user']
     # Sử dụng UserReadSerializer
     user = UserReadSerializer(read_only=True)
 
     # Thêm trường image_url
     image_url = serializers.SerializerMethodField()
+    fast_sources = {'image_url': ['image', 'image_variants']}
 
     class Meta:
         model = MealPlan
-        fields = ['id', 'user', 'name', 'date', 'description', 'calories_intake', 'image_url']
+        fields = ['id', 'user', 'name', 'date', 'description', 'calories_intake', 'image_url', 'image_status',
+                  'image_variants']
+        read_only_fields = ['image_status', 'image_variants']
 
     def get_image_url(self, obj):
+        url = image_url(obj, 'image')
         request = self.context.get('request')
-        if obj.image:
-            # build_absolute_uri trả về URL đầy đủ
-            return request.build_absolute_uri(obj.image.url)
-        return None
+        if url and url.startswith('/') and request:
+            # URL tương đối (storage cục bộ): build_absolute_uri trả về URL đầy đủ
+            return request.build_absolute_uri(url)
+        return url
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class UserGoalSerializer(serializers.ModelSerializer):
+class UserGoalSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ['user']
     # Đã sửa: Sử dụng UserReadSerializer
     user = UserReadSerializer(read_only=True)
     class Meta:
@@ -160,13 +182,22 @@ class UserGoalSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'goal_type', 'target_weight', 'target_date', 'description']
         read_only_fields = ['user']
 
-class CoachProfileSerializer(serializers.ModelSerializer):
+class CoachProfileSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ['user']
     user = UserSerializer()
     class Meta:
         model = CoachProfile
         fields = ['id', 'user', 'bio', 'specialties', 'years_of_experience', 'certifications']
 
-class HealthRecordSerializer(serializers.ModelSerializer):
+def compute_bmi(height, weight):
+    """BMI = cân nặng (kg) / chiều cao (m)^2; chiều cao lưu theo cm"""
+    if height and weight and height > 0:
+        return weight / ((height / 100) ** 2)
+    return None
+
+
+class HealthRecordSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ['user']
     user = UserSerializer(read_only=True)
 
     class Meta:
@@ -177,16 +208,29 @@ class HealthRecordSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         if validated_data is None:
             validated_data = {}
-        height = validated_data.get('height')
-        weight = validated_data.get('weight')
-        if height and weight and height > 0:
-            validated_data['bmi'] = weight / ((height / 100) ** 2)
-        else:
-            validated_data['bmi'] = None
+        validated_data['bmi'] = compute_bmi(validated_data.get('height'), validated_data.get('weight'))
         return super().create(validated_data)
 
 
-class HealthDiarySerializer(serializers.ModelSerializer):
+class HealthRecordBulkItemSerializer(serializers.ModelSerializer):
+    """Một phần tử trong lô dữ liệu gửi từ thiết bị đeo"""
+    idempotency_key = serializers.CharField(max_length=64, required=False, allow_null=True)
+    # Thời điểm đo trên thiết bị; bỏ trống thì lấy lúc nhận
+    date = serializers.DateTimeField(required=False)
+
+    class Meta:
+        model = HealthRecord
+        fields = ['water_intake', 'steps', 'heart_rate', 'height', 'weight', 'date', 'idempotency_key']
+
+
+class DailyHealthSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DailyHealthSummary
+        exclude = ['id', 'user']
+
+
+class HealthDiarySerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ['user']
     user = UserSerializer(read_only=True)
     date = serializers.DateTimeField(read_only=True)
 
@@ -194,7 +238,8 @@ class HealthDiarySerializer(serializers.ModelSerializer):
         model = HealthDiary
         fields = ['id', 'user', 'date', 'content', 'feeling']
 
-class ChatMessageSerializer(serializers.ModelSerializer):
+class ChatMessageSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ['sender', 'receiver']
     sender = UserReadSerializer(read_only=True)
     receiver = UserReadSerializer(read_only=True)
 
@@ -202,12 +247,22 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         model = ChatMessage
         fields = ['id', 'sender', 'receiver', 'message', 'timestamp', 'is_read']
 
+class ChatConversationSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ['peer', 'last_message__sender', 'last_message__receiver']
+    peer = UserReadSerializer(read_only=True)
+    last_message = ChatMessageSerializer(read_only=True)
+
+    class Meta:
+        model = ChatConversation
+        fields = ['peer', 'last_message', 'last_message_at', 'unread_count']
+
 # class TagSerializer(serializers.ModelSerializer):
 #     class Meta:
 #         model = Tag
 #         fields = ['id', 'name']
 
-class UserConnectionSerializer(serializers.ModelSerializer):
+class UserConnectionSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ['user', 'coach']
     user = UserSerializer()
     coach = UserSerializer()
     class Meta:
@@ -0,0 +1,169 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from oauth2_provider.models import get_access_token_model
+
+from managements.activity_stats import invalidate_activity_statistics, invalidate_statistics
+from managements.authentication import token_cache
+from managements.caches import ACTIVITY_NAMESPACE, MEALPLAN_NAMESPACE, invalidate_namespace
+from managements.chat import notify_message, notify_read, record_message, refresh_conversation
+from managements.goals import invalidate_goal_progress
+from managements.models import (
+    Activity, ChatMessage, HealthDiary, HealthRecord, MealPlan, User, UserConnection, UserGoal, WorkoutPlan,
+)
+from managements.roster import invalidate_client_rosters, invalidate_roster
+from managements.search import index_activity
+from managements.stats import invalidate_stats
+from managements.summaries import record_day, refresh_daily_summary
+
+# Cột User mà UserReadSerializer trả về (avatar_url từ avatar, role_name từ role)
+USER_DISPLAY_FIELDS = {'username', 'first_name', 'last_name', 'email', 'avatar', 'avatar_variants', 'role'}
+# Cột User không ảnh hưởng tới user đã cache trong token_cache (đăng nhập chỉ ghi last_login)
+USER_IGNORED_FIELDS = {'last_login'}
+
+
+def health_records_changed(user_id, days):
+    """
+    Cập nhật dữ liệu phụ thuộc khi HealthRecord của user thay đổi.
+    Gọi trực tiếp cho các đường ghi không phát signal (bulk_create, update()).
+    """
+    for day in set(days):
+        refresh_daily_summary(user_id, day)
+    invalidate_stats(days)
+    invalidate_goal_progress(user_id)
+    invalidate_client_rosters(user_id)
+
+
+@receiver(post_save, sender=ChatMessage)
+def chat_message_saved(sender, instance, created, **kwargs):
+    if created:
+        record_message(instance)
+        transaction.on_commit(lambda: notify_message(instance))
+        return
+    refresh_conversation(instance.receiver_id, instance.sender_id)
+    if instance.is_read:
+        transaction.on_commit(lambda: notify_read(instance.receiver_id, instance.sender_id, message_ids=[instance.id]))
+
+
+@receiver(post_delete, sender=ChatMessage)
+def chat_message_deleted(sender, instance, **kwargs):
+    refresh_conversation(instance.sender_id, instance.receiver_id)
+    refresh_conversation(instance.receiver_id, instance.sender_id)
+
+
+@receiver(post_save, sender=HealthRecord)
+@receiver(post_delete, sender=HealthRecord)
+def health_record_changed(sender, instance, **kwargs):
+    user_id, day = instance.user_id, record_day(instance)
+    transaction.on_commit(lambda: health_records_changed(user_id, [day]))
+
+
+@receiver(post_save, sender=Activity)
+@receiver(post_delete, sender=Activity)
+@receiver(post_save, sender=WorkoutPlan)
+@receiver(post_delete, sender=WorkoutPlan)
+@receiver(m2m_changed, sender=WorkoutPlan.activities.through)
+@receiver(post_save, sender=HealthDiary)
+@receiver(post_delete, sender=HealthDiary)
+@receiver(post_save, sender=UserGoal)
+@receiver(post_delete, sender=UserGoal)
+def stats_source_changed(sender, instance, **kwargs):
+    # Ngày mà bản ghi được tính vào thống kê; Activity (tên, active) ảnh hưởng mọi khoảng
+    if isinstance(instance, WorkoutPlan):
+        days = [instance.date]
+    elif isinstance(instance, HealthDiary):
+        days = [timezone.localdate(instance.date)]
+    elif isinstance(instance, UserGoal):
+        days = [instance.created_date] if instance.created_date else None
+    else:
+        days = None
+    invalidate_stats(days)
+
+
+@receiver(post_save, sender=WorkoutPlan)
+@receiver(post_delete, sender=WorkoutPlan)
+@receiver(post_save, sender=UserGoal)
+@receiver(post_delete, sender=UserGoal)
+def roster_source_changed(sender, instance, **kwargs):
+    invalidate_client_rosters(instance.user_id)
+
+
+@receiver(post_save, sender=WorkoutPlan)
+@receiver(post_delete, sender=WorkoutPlan)
+def workout_plan_changed(sender, instance, **kwargs):
+    invalidate_statistics(instance.user_id)
+
+
+@receiver(m2m_changed, sender=WorkoutPlan.activities.through)
+def workout_plan_activities_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            invalidate_statistics(instance.user_id)
+        return
+    # Thay đổi từ phía Activity: pk_set là id các kế hoạch (post_clear không có nên lấy ở pre_clear)
+    if action in ('post_add', 'post_remove'):
+        plans = WorkoutPlan.objects.filter(pk__in=pk_set)
+    elif action == 'pre_clear':
+        plans = instance.workoutplan_set.all()
+    else:
+        return
+    for user_id in set(plans.values_list('user_id', flat=True)):
+        invalidate_statistics(user_id)
+
+
+@receiver(post_save, sender=Activity)
+@receiver(pre_delete, sender=Activity)
+def activity_changed(sender, instance, **kwargs):
+    # pre_delete: sau khi xóa, các dòng nối với WorkoutPlan cũng đã bị xóa
+    invalidate_activity_statistics(instance)
+
+
+@receiver(post_save, sender=UserGoal)
+@receiver(post_delete, sender=UserGoal)
+def goal_changed(sender, instance, **kwargs):
+    invalidate_goal_progress(instance.user_id)
+
+
+@receiver(post_save, sender=UserConnection)
+@receiver(post_delete, sender=UserConnection)
+def connection_changed(sender, instance, **kwargs):
+    invalidate_roster(instance.coach_id)
+
+
+@receiver(post_save, sender=Activity)
+@receiver(post_delete, sender=Activity)
+def activity_catalog_changed(sender, **kwargs):
+    invalidate_namespace(ACTIVITY_NAMESPACE)
+
+
+@receiver(post_save, sender=Activity)
+def activity_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: index_activity(instance))
+
+
+@receiver(post_save, sender=MealPlan)
+@receiver(post_delete, sender=MealPlan)
+def mealplan_catalog_changed(sender, **kwargs):
+    invalidate_namespace(MEALPLAN_NAMESPACE)
+
+
+@receiver(post_save, sender=get_access_token_model())
+@receiver(post_delete, sender=get_access_token_model())
+def access_token_changed(sender, instance, **kwargs):
+    # revoke() và refresh token đều xóa/ghi lại AccessToken
+    token_cache.discard(instance.token_checksum)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # update_fields=None là lưu cả bản ghi (hoặc xóa): coi như mọi cột đều đổi
+    fields = None if update_fields is None else set(update_fields)
+    if fields is None or fields - USER_IGNORED_FIELDS:
+        token_cache.discard_user(instance.pk)
+    if fields is None or fields & USER_DISPLAY_FIELDS:
+        # MealPlan và roster nhúng thông tin hiển thị của user (UserReadSerializer)
+        invalidate_namespace(MEALPLAN_NAMESPACE)
+        invalidate_client_rosters(instance.pk)
@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from managements.caches import invalidate_namespace, namespaced_key
+from managements.db.routers import primary_reads
+from managements.models import DailyHealthSummary, HealthDiary, UserGoal, WorkoutPlan
+from managements.summaries import day_bounds
+
+# Khoảng còn mở (end >= hôm nay) bị vô hiệu hóa khi có ghi vào khoảng; khoảng đã đóng chỉ hết hạn theo TTL
+STATS_NAMESPACE = 'managements-stats'
+STATS_CLOSED_NAMESPACE = 'managements-stats-closed'
+STATS_DEFAULT_DAYS = 30
+STATS_MAX_DAYS = 366
+STATS_TOP_N = 20
+
+BMI_BUCKETS = (
+    ('Thiếu cân (< 18.5)', Q(bmi_avg__lt=18.5)),
+    ('Bình thường (18.5 - 24.9)', Q(bmi_avg__gte=18.5, bmi_avg__lt=25)),
+    ('Thừa cân (25 - 29.9)', Q(bmi_avg__gte=25, bmi_avg__lt=30)),
+    ('Béo phì (>= 30)', Q(bmi_avg__gte=30)),
+)
+
+
+def stats_range(start=None, end=None):
+    """Chuẩn hóa khoảng ngày: mặc định 30 ngày gần nhất, tối đa STATS_MAX_DAYS ngày"""
+    end = end or timezone.localdate()
+    start = start or end - timedelta(days=STATS_DEFAULT_DAYS - 1)
+    if start > end:
+        start, end = end, start
+    if (end - start).days >= STATS_MAX_DAYS:
+        start = end - timedelta(days=STATS_MAX_DAYS - 1)
+    return start, end
+
+
+def build_managements_stats(start, end):
+    """
+    Các số liệu cho trang thống kê admin. Mỗi mục là một câu GROUP BY chỉ đọc các dòng
+    trong khoảng ngày (qua index theo ngày) và trả về số dòng bị chặn (theo số ngày,
+    số bucket hoặc top N), không phụ thuộc kích thước bảng.
+    """
+    range_start, range_end = day_bounds(start)[0], day_bounds(end)[1]
+    summaries = DailyHealthSummary.objects.filter(date__range=(start, end))
+
+    bmi_counts = summaries.filter(bmi_avg__isnull=False).aggregate(**{
+        f'bucket_{i}': Count('id', filter=condition) for i, (_, condition) in enumerate(BMI_BUCKETS)
+    })
+    bmi_buckets = [
+        {'label': label, 'count': bmi_counts[f'bucket_{i}']} for i, (label, _) in enumerate(BMI_BUCKETS)
+    ]
+
+    daily_counts = list(
+        summaries.values('date').annotate(record_count=Sum('record_count')).order_by('date')
+    )
+
+    goal_stats = list(
+        UserGoal.objects.filter(active=True, created_date__range=(start, end))
+        .values('goal_type').annotate(goal_count=Count('id')).order_by('-goal_count')
+    )
+
+    diary_stats = list(
+        HealthDiary.objects.filter(active=True, date__gte=range_start, date__lt=range_end)
+        .values('user__username').annotate(diary_count=Count('id')).order_by('-diary_count')[:STATS_TOP_N]
+    )
+
+    # Đi từ các kế hoạch trong khoảng ngày sang bảng nối, không quét toàn bộ Activity
+    activity_stats = list(
+        WorkoutPlan.activities.through.objects.filter(
+            workoutplan__active=True, workoutplan__date__range=(start, end), activity__active=True,
+        )
+        .values('activity_id').annotate(name=F('activity__name'), activity_count=Count('id'))
+        .values('name', 'activity_count').order_by('-activity_count')[:STATS_TOP_N]
+    )
+
+    return {
+        'start': start,
+        'end': end,
+        'bmi_buckets': bmi_buckets,
+        'daily_counts': daily_counts,
+        'total_records': sum(row['record_count'] for row in daily_counts),
+        'goal_stats': goal_stats,
+        'diary_stats': diary_stats,
+        'activity_stats': activity_stats,
+        'generated_at': timezone.now(),
+    }
+
+
+def _open_start_key():
+    # Ngày bắt đầu sớm nhất trong các khoảng còn mở đang được cache (theo phiên bản hiện tại)
+    return namespaced_key(STATS_NAMESPACE, 'open-start')
+
+
+def invalidate_stats(days=None):
+    """
+    Dữ liệu nguồn thay đổi ở các ngày `days` (None: không gắn với ngày nào, vd. đổi tên Activity).
+    Chỉ vô hiệu hóa khi có khoảng còn mở trong cache chứa một trong các ngày đó; khoảng đã
+    đóng (end < hôm nay) không bị vô hiệu hóa theo từng lần ghi mà hết hạn theo STATS_CACHE_TIMEOUT.
+    """
+    open_start = cache.get(_open_start_key())
+    if open_start is None:
+        return
+    if days is None or any(day >= open_start for day in days):
+        invalidate_namespace(STATS_NAMESPACE)
+
+
+def get_managements_stats(start, end):
+    """Bản có cache (TTL = STATS_CACHE_TIMEOUT); khoảng còn mở bị vô hiệu hóa qua invalidate_stats"""
+    timeout = getattr(settings, 'STATS_CACHE_TIMEOUT', 300)
+    is_open = end >= timezone.localdate()
+    key = namespaced_key(STATS_NAMESPACE if is_open else STATS_CLOSED_NAMESPACE, start.isoformat(), end.isoformat())
+    stats = cache.get(key)
+    if stats is None:
+        if is_open:
+            # Ghi nhận trước khi tính để một lần ghi xảy ra trong lúc tính vẫn vô hiệu hóa được kết quả
+            open_start_key = _open_start_key()
+            open_start = cache.get(open_start_key)
+            cache.set(open_start_key, start if open_start is None else min(start, open_start), timeout)
+        with primary_reads():
+            stats = build_managements_stats(start, end)
+        cache.set(key, stats, timeout)
+    return stats
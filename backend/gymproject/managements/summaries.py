@@ -0,0 +1,98 @@
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from managements.models import DailyHealthSummary, HealthRecord, User
+
+HEALTH_METRICS = ('steps', 'water_intake', 'heart_rate', 'weight', 'bmi')
+
+
+def summary_aggregates():
+    """Các biểu thức aggregate dùng chung cho cập nhật từng ngày và backfill"""
+    aggregates = {'record_count': Count('id')}
+    for metric in HEALTH_METRICS:
+        aggregates[f'{metric}_min'] = Min(metric)
+        aggregates[f'{metric}_max'] = Max(metric)
+        aggregates[f'{metric}_avg'] = Avg(metric)
+        aggregates[f'{metric}_sum'] = Sum(metric)
+    return aggregates
+
+
+def day_bounds(day):
+    """Khoảng [start, end) của một ngày theo múi giờ hiện tại, để lọc được bằng index"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def record_day(record):
+    return timezone.localdate(record.date)
+
+
+def refresh_daily_summary(user_id, day):
+    """Tính lại dòng tổng hợp của một người dùng trong một ngày"""
+    start, end = day_bounds(day)
+    values = HealthRecord.objects.filter(
+        user_id=user_id, active=True, date__gte=start, date__lt=end
+    ).aggregate(**summary_aggregates())
+
+    if not values['record_count']:
+        DailyHealthSummary.objects.filter(user_id=user_id, date=day).delete()
+        return None
+
+    summary, _ = DailyHealthSummary.objects.update_or_create(user_id=user_id, date=day, defaults=values)
+    return summary
+
+
+def backfill_daily_summaries(user_ids=None, since=None, chunk_size=500, on_chunk=None):
+    """
+    Dựng lại bảng tổng hợp từ HealthRecord, xử lý theo từng nhóm chunk_size người dùng.
+    Mỗi nhóm là một câu GROUP BY (user, ngày) và được ghi trong một transaction.
+    """
+    users = User.objects.order_by('id')
+    if user_ids:
+        users = users.filter(id__in=user_ids)
+
+    last_id = 0
+    total = 0
+    while True:
+        chunk = list(users.filter(id__gt=last_id).values_list('id', flat=True)[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1]
+
+        records = HealthRecord.objects.filter(active=True, user_id__in=chunk)
+        existing = DailyHealthSummary.objects.filter(user_id__in=chunk)
+        if since:
+            records = records.filter(date__gte=day_bounds(since)[0])
+            existing = existing.filter(date__gte=since)
+
+        rows = (
+            records.annotate(day=TruncDate('date'))
+            .values('user_id', 'day')
+            .annotate(**summary_aggregates())
+            .order_by()
+        )
+        summaries = [
+            DailyHealthSummary(date=row.pop('day'), **row)
+            for row in rows.iterator(chunk_size=2000)
+        ]
+
+        with transaction.atomic():
+            existing.delete()
+            DailyHealthSummary.objects.bulk_create(summaries, batch_size=1000)
+
+        total += len(summaries)
+        if on_chunk:
+            on_chunk(len(chunk), len(summaries))
+    return total
+
+
+def trend_series(user, days):
+    """Chuỗi tổng hợp theo ngày cho `days` ngày gần nhất (tối đa `days` dòng)"""
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    series = DailyHealthSummary.objects.filter(user=user, date__range=(start, end)).order_by('date')
+    return start, end, series
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from managements.models import ChatMessage, HealthDiary, HealthRecord, MealPlan, UserGoal, WorkoutPlan
+from managements.serializers import (
+    ChatMessageSerializer, HealthDiarySerializer, HealthRecordSerializer, MealPlanSerializer,
+    UserGoalSerializer, WorkoutPlanSerializer,
+)
+
+# Các bảng được đồng bộ: (model, serializer, điều kiện sở hữu theo user)
+SYNC_MODELS = {
+    'healthrecord': (HealthRecord, HealthRecordSerializer, lambda user: Q(user=user)),
+    'healthdiary': (HealthDiary, HealthDiarySerializer, lambda user: Q(user=user)),
+    'workoutplan': (WorkoutPlan, WorkoutPlanSerializer, lambda user: Q(user=user)),
+    'mealplan': (MealPlan, MealPlanSerializer, lambda user: Q(user=user)),
+    'goal': (UserGoal, UserGoalSerializer, lambda user: Q(user=user)),
+    'chatmessage': (ChatMessage, ChatMessageSerializer, lambda user: Q(sender=user) | Q(receiver=user)),
+}
+
+
+def to_micros(value):
+    return int(value.timestamp() * 1_000_000)
+
+
+def from_micros(micros):
+    return datetime(1970, 1, 1, tzinfo=dt_timezone.utc) + timedelta(microseconds=micros)
+
+
+def encode_watermark(value, positions=None):
+    """
+    Watermark gửi cho client: số micro giây (UTC) để dùng thẳng trong query string. Bảng nào
+    bị cắt trang thì kèm vị trí (updated_at, id) của dòng cuối đã trả: "<mốc>,<bảng>-<updated_at>-<id>"
+    """
+    parts = [str(to_micros(value))]
+    for kind, (updated_at, pk) in (positions or {}).items():
+        parts.append(f'{kind}-{to_micros(updated_at)}-{pk}')
+    return ','.join(parts)
+
+
+def decode_watermark(value):
+    """(since, {bảng: (updated_at, id)}) hoặc None nếu watermark không hợp lệ"""
+    try:
+        since, *rest = value.split(',')
+        since = int(since)
+        positions = {}
+        for part in rest:
+            kind, updated_at, pk = part.split('-')
+            if kind not in SYNC_MODELS or int(updated_at) < 0:
+                return None
+            positions[kind] = (from_micros(int(updated_at)), int(pk))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if since < 0:
+        return None
+    return from_micros(since), positions
+
+
+def sync_changes(user, since=None, positions=None, limit=None, context=None):
+    """
+    Các dòng của user thay đổi từ mốc since (updated_at >= since), theo từng bảng:
+    bản ghi còn hiệu lực nằm trong 'updated', bản ghi đã xóa mềm (active=False) chỉ
+    trả về id trong 'deleted'. Lần đồng bộ đầu (since=None) chỉ lấy bản ghi còn hiệu lực.
+
+    Watermark trả về lùi SYNC_WATERMARK_OVERLAP giây so với lúc truy vấn để không bỏ
+    sót transaction commit muộn. Mỗi bảng lấy tối đa limit dòng theo (updated_at, id);
+    nếu còn dữ liệu thì has_more=True và watermark mang vị trí (updated_at, id) của dòng
+    cuối đã trả cho bảng đó, trang sau đi tiếp từ đúng vị trí này nên nhiều dòng cùng
+    updated_at (migration, mark_read cập nhật cả lô) vẫn được phân trang hết.
+    Client có thể nhận lại vài dòng nên cần ghi đè theo id.
+    """
+    limit = limit or getattr(settings, 'SYNC_PAGE_SIZE', 500)
+    overlap = timedelta(seconds=getattr(settings, 'SYNC_WATERMARK_OVERLAP', 5))
+    positions = positions or {}
+    watermark = timezone.now() - overlap
+    next_positions = {}
+    changes = {}
+
+    for kind, (model, serializer_class, owner) in SYNC_MODELS.items():
+        queryset = model.objects.filter(owner(user))
+        if kind in positions:
+            updated_at, pk = positions[kind]
+            queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+        elif since is None:
+            queryset = queryset.filter(active=True)
+        else:
+            queryset = queryset.filter(updated_at__gte=since)
+        queryset = serializer_class.setup_eager_loading(queryset.order_by('updated_at', 'id'))
+
+        rows = list(queryset[:limit + 1])
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_positions[kind] = (rows[-1].updated_at, rows[-1].id)
+
+        changes[kind] = {
+            'updated': serializer_class([row for row in rows if row.active], many=True, context=context).data,
+            'deleted': [row.id for row in rows if not row.active],
+        }
+
+    return {
+        'watermark': encode_watermark(watermark, next_positions),
+        'has_more': bool(next_positions),
+        'changes': changes,
+    }
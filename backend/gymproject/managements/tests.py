@@ -1,3 +1,1473 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone as dt_timezone
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import Q
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from oauth2_provider.models import get_access_token_model
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.test import APIClient, APIRequestFactory
+
+from managements import images, views
+from managements.activity_stats import get_activity_statistics
+from managements.authentication import TokenCache, _build_cache, token_cache, token_checksum
+from managements.caches import MEALPLAN_NAMESPACE, namespace_version
+from managements.consumers import ChatConsumer
+from managements.db.backends.sqlite3.base import DatabaseWrapper as PooledSQLiteWrapper
+from managements.db.pool import ConnectionPool, PoolTimeout, close_pool
+from managements.db.routers import STICKY_KEY
+from managements.exports import EXPORTS, aiter_export, iter_export
+from managements.fastpath import fast_serializer
+from managements.images import ImageStorage, image_url, store_image_url
+from managements.ingest import ingest_health_records, insert_chunk
+from managements.management.commands.benchmark_api import Command as BenchmarkCommand
+from managements.management.commands.explain_queries import Command as ExplainQueriesCommand, filter_columns
+from managements.models import (Activity, ActivitySearchToken, ChatConversation, ChatMessage, DailyHealthSummary,
+                                HealthDiary, HealthRecord, ImageStatus, MealPlan, Role, User, UserConnection,
+                                UserGoal, WorkoutPlan)
+from managements.scoping import can_access_user, get_scoped_user, scope_queryset
+from managements.profiling import endpoint_report, percentile, profile_buffer
+from managements.roster import roster_namespace
+from managements.stats import STATS_NAMESPACE, build_managements_stats, get_managements_stats, stats_range
+
+
+def create_user(username, role=Role.Exerciser, **kwargs):
+    return User.objects.create(username=username, email=f'{username}@example.com', role=role, **kwargs)
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        self.user = create_user('sync-user')
+        self.client = client_for(self.user)
+
+    def sync_all(self, since=None):
+        """Gọi sync/ tới khi has_more=False, trả về danh sách id healthrecord của từng trang"""
+        pages = []
+        for _ in range(20):
+            response = self.client.get('/sync/', {'since': since} if since else {})
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            pages.append([row['id'] for row in data['changes']['healthrecord']['updated']]
+                         + data['changes']['healthrecord']['deleted'])
+            since = data['watermark']
+            if not data['has_more']:
+                return pages, since
+        self.fail('sync/ không kết thúc phân trang')
+
+    @override_settings(SYNC_PAGE_SIZE=5)
+    def test_page_boundary_inside_equal_timestamps(self):
+        records = [HealthRecord.objects.create(user=self.user, steps=i) for i in range(12)]
+        # Cả lô cùng một updated_at (như migration 0019 hay mark_read)
+        HealthRecord.objects.filter(user=self.user).update(updated_at=timezone.now() - timezone.timedelta(minutes=1))
+
+        pages, _ = self.sync_all()
+
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual(sorted(sum(pages, [])), sorted(record.id for record in records))
+
+    @override_settings(SYNC_PAGE_SIZE=5)
+    def test_incremental_sync_after_equal_timestamp_batch(self):
+        HealthRecord.objects.bulk_create([HealthRecord(user=self.user, steps=i) for i in range(7)])
+        _, watermark = self.sync_all()
+
+        changed = list(HealthRecord.objects.filter(user=self.user).order_by('id')[:6])
+        HealthRecord.objects.filter(id__in=[record.id for record in changed]).update(
+            active=False, updated_at=timezone.now() + timezone.timedelta(seconds=10),
+        )
+        pages, _ = self.sync_all(watermark)
+
+        self.assertTrue({record.id for record in changed} <= set(sum(pages, [])))
+
+    def test_invalid_watermark(self):
+        for since in ('abc', '-1', '1,unknown-1-1', '1,healthrecord-x-1'):
+            self.assertEqual(self.client.get('/sync/', {'since': since}).status_code, 400)
+
+
+class SoftDeleteTests(TestCase):
+    """DELETE chỉ đặt active=False nên mọi đường đọc phải bỏ qua bản ghi đã xóa"""
+
+    def setUp(self):
+        self.user = create_user('soft-delete-user')
+        self.client = client_for(self.user)
+        self.today = timezone.localdate()
+        self.activity = Activity.objects.create(user=self.user, name='Squat', calories_burned=100, time=10)
+        self.plan = WorkoutPlan.objects.create(user=self.user, name='Ngày chân', date=self.today)
+        self.plan.activities.add(self.activity)
+        self.diary = HealthDiary.objects.create(user=self.user, content='Mệt')
+        self.goal = UserGoal.objects.create(user=self.user, goal_type='lose', target_weight=60)
+
+    def delete_all(self):
+        for path in (f'/workoutplan/{self.plan.id}/', f'/healthdiary/{self.diary.id}/', f'/goal/{self.goal.id}/'):
+            self.assertEqual(self.client.delete(path).status_code, 204)
+
+    def test_my_plans_and_weekly_summary(self):
+        self.assertEqual(len(self.client.get('/workoutplan/my-plans/').json()), 1)
+        self.delete_all()
+
+        self.assertEqual(self.client.get('/workoutplan/my-plans/').json(), [])
+        summary = self.client.get('/workoutplan/weekly-summary/').json()
+        self.assertEqual(summary['total_sessions'], 0)
+        self.assertEqual(summary['total_calories_burned'], 0)
+
+    def test_my_diaries(self):
+        self.assertEqual(self.client.get('/healthdiary/my_diaries/').json()['count'], 1)
+        self.delete_all()
+        self.assertEqual(self.client.get('/healthdiary/my_diaries/').json()['count'], 0)
+
+    def test_admin_stats(self):
+        stats = build_managements_stats(self.today, self.today)
+        self.assertEqual([row['activity_count'] for row in stats['activity_stats']], [1])
+        self.assertEqual([row['goal_count'] for row in stats['goal_stats']], [1])
+
+        self.delete_all()
+        stats = build_managements_stats(self.today, self.today)
+        self.assertEqual(stats['activity_stats'], [])
+        self.assertEqual(stats['goal_stats'], [])
+        self.assertEqual(stats['diary_stats'], [])
+
+
+class QueryCountTests(TestCase):
+    """Số query của mỗi endpoint không được tăng theo số dòng trả về (chặn N+1 quay lại)"""
+
+    def setUp(self):
+        cache.clear()
+        self.coach = create_user('qc-coach', role=Role.Coach)
+        self.exerciser = create_user('qc-exerciser')
+        UserConnection.objects.create(user=self.exerciser, coach=self.coach, status='accepted')
+        self.activities = [
+            Activity.objects.create(user=self.coach, name=f'Bài {i}', calories_burned=50, time=10) for i in range(3)
+        ]
+
+    def add_rows(self, count):
+        today = timezone.localdate()
+        for i in range(count):
+            HealthRecord.objects.create(user=self.exerciser, steps=i, weight=70)
+            HealthDiary.objects.create(user=self.exerciser, content=f'Ngày {i}')
+            plan = WorkoutPlan.objects.create(user=self.exerciser, name=f'Kế hoạch {i}', date=today)
+            plan.activities.add(*self.activities)
+            MealPlan.objects.create(user=self.coach, name=f'Thực đơn {i}', date=today, goal='lose')
+            UserGoal.objects.create(user=self.exerciser, goal_type='lose', target_weight=60)
+            ChatMessage.objects.create(sender=self.exerciser, receiver=self.coach, message='Chào coach')
+            ChatMessage.objects.create(sender=self.coach, receiver=self.exerciser, message='Chào bạn')
+
+    def assert_constant_queries(self, user, expected):
+        """Gọi từng path với 3 rồi 6 dòng mỗi loại, số query phải đúng bằng expected ở cả hai lần"""
+        client = client_for(user)
+        for rows in (3, 6):
+            self.add_rows(3)
+            for path, num in expected.items():
+                cache.clear()
+                with self.subTest(path=path, rows=rows), self.assertNumQueries(num):
+                    self.assertEqual(client.get(path).status_code, 200)
+
+    def test_exerciser_endpoints(self):
+        self.assert_constant_queries(self.exerciser, {
+            '/healthrecord/': 2,
+            '/healthdiary/': 2,
+            '/healthdiary/my_diaries/': 2,
+            '/workoutplan/': 3,
+            '/workoutplan/my-plans/': 2,
+            '/workoutplan/weekly-summary/': 2,
+            '/mealplan/': 2,
+            '/mealplan/mealplans-by-goal/lose/': 1,
+            '/goal/': 2,
+            '/connection/': 2,
+            '/chatmessage/': 2,
+            f'/chatmessage/conversation/{self.coach.id}/': 3,
+        })
+
+    def test_coach_endpoints(self):
+        self.assert_constant_queries(self.coach, {
+            '/healthrecord/': 3,
+            '/healthdiary/': 3,
+            '/workoutplan/': 4,
+            f'/workoutplan/plans-by-user/{self.exerciser.id}/': 4,
+            '/mealplan/': 2,
+            '/goal/': 3,
+            '/connection/': 2,
+            '/chatmessage/': 2,
+            f'/chatmessage/conversation/{self.exerciser.id}/': 3,
+        })
+
+
+class DailySummaryTests(TestCase):
+    def setUp(self):
+        self.user = create_user('summary-daily-user')
+        self.client = client_for(self.user)
+        self.today = timezone.localdate()
+
+    def record(self, **values):
+        with self.captureOnCommitCallbacks(execute=True):
+            return HealthRecord.objects.create(user=self.user, **values)
+
+    def summary(self):
+        return DailyHealthSummary.objects.get(user=self.user, date=self.today)
+
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 11))
+        self.assertEqual([percentile(values, p) for p in (0, 10, 50, 90, 95, 100)], [1, 1, 5, 9, 10, 10])
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_rollup_follows_create_update_delete(self):
+        first = self.record(steps=1000, weight=70, height=175)
+        self.record(steps=3000, weight=72, height=175)
+        summary = self.summary()
+        self.assertEqual((summary.record_count, summary.steps_sum, summary.weight_min, summary.weight_max),
+                         (2, 4000, 70, 72))
+
+        first.steps = 2000
+        with self.captureOnCommitCallbacks(execute=True):
+            first.save()
+        self.assertEqual(self.summary().steps_sum, 5000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            HealthRecord.objects.filter(user=self.user).delete()
+        self.assertFalse(DailyHealthSummary.objects.filter(user=self.user).exists())
+
+    def test_backfill_matches_incremental(self):
+        for steps in (1000, 2500):
+            self.record(steps=steps, weight=70, height=175)
+        fields = ['date', 'record_count', 'steps_sum', 'weight_avg', 'bmi_avg']
+        incremental = list(DailyHealthSummary.objects.values(*fields))
+
+        DailyHealthSummary.objects.all().delete()
+        call_command('backfill_health_summaries', '--chunk-size', '1', stdout=StringIO())
+        self.assertEqual(list(DailyHealthSummary.objects.values(*fields)), incremental)
+
+    def test_trends_read_fixed_rows(self):
+        self.record(steps=1000)
+        with self.assertNumQueries(1):
+            response = self.client.get('/healthrecord/trends/', {'days': 30})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['steps_sum'] for row in response.json()['series']], [1000])
+        self.assertEqual(self.client.get('/healthrecord/trends/', {'days': 7}).status_code, 400)
+
+
+class WorkoutSummaryTests(TestCase):
+    def setUp(self):
+        self.user = create_user('summary-user')
+        self.client = client_for(self.user)
+        self.start = timezone.localdate() - timezone.timedelta(days=30)
+        self.squat = Activity.objects.create(user=self.user, name='Squat', calories_burned=100, time=10)
+        self.run = Activity.objects.create(user=self.user, name='Chạy', calories_burned=250, time=30)
+
+    def plan(self, days, activities, user=None, **kwargs):
+        plan = WorkoutPlan.objects.create(
+            user=user or self.user, name='Kế hoạch', date=self.start + timezone.timedelta(days=days), **kwargs
+        )
+        plan.activities.add(*activities)
+        return plan
+
+    def summary(self, **params):
+        return self.client.get('/workoutplan/weekly-summary/', params)
+
+    def test_range_totals(self):
+        inside = [
+            self.plan(0, [self.squat, self.run], sets=3, reps=10),
+            self.plan(6, [self.run]),
+            self.plan(3, []),
+        ]
+        self.plan(7, [self.squat])
+        self.plan(2, [self.squat], active=False)
+        self.plan(2, [self.squat], user=create_user('summary-other'))
+
+        with self.assertNumQueries(2):
+            response = self.summary(start=self.start.isoformat(), end=(self.start + timezone.timedelta(days=6)).isoformat())
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['total_sessions'], 3)
+        self.assertEqual(data['total_activities'], 3)
+        self.assertEqual(data['total_calories_burned'], 600)
+        self.assertEqual(data['total_time'], 70)
+        self.assertEqual(data['estimated_total_exercise_units'], 3 * 10 * 2)
+        self.assertEqual(sorted(plan['id'] for plan in data['plans']), sorted(plan.id for plan in inside))
+        self.assertEqual(sorted(next(plan for plan in data['plans'] if plan['id'] == inside[0].id)['activities']),
+                         sorted([self.squat.id, self.run.id]))
+
+    def test_query_count_does_not_grow(self):
+        for days in range(6):
+            self.plan(days, [self.squat, self.run])
+            with self.assertNumQueries(2):
+                self.summary(start=self.start.isoformat())
+
+    def test_default_range_is_current_week(self):
+        today = timezone.localdate()
+        monday = today - timezone.timedelta(days=today.weekday())
+        data = self.summary().json()
+        self.assertEqual((data['start'], data['end']),
+                         (monday.isoformat(), (monday + timezone.timedelta(days=6)).isoformat()))
+
+        data = self.summary(end=today.isoformat()).json()
+        self.assertEqual(data['start'], (today - timezone.timedelta(days=6)).isoformat())
+
+    def test_invalid_range(self):
+        self.assertEqual(self.summary(start='2025-13-01').status_code, 400)
+        self.assertEqual(self.summary(start='2025-03-10', end='2025-03-01').status_code, 400)
+
+
+class RosterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.coach = create_user('roster-coach', role=Role.Coach)
+        self.clients = [create_user(f'roster-client-{i}') for i in range(2)]
+        for client in self.clients:
+            UserConnection.objects.create(user=client, coach=self.coach, status='accepted')
+
+    def record(self, user, weight, days_ago):
+        record = HealthRecord.objects.create(user=user, weight=weight, height=175)
+        HealthRecord.objects.filter(pk=record.pk).update(date=timezone.now() - timezone.timedelta(days=days_ago))
+        return record
+
+    def roster(self):
+        cache.clear()
+        response = client_for(self.coach).get('/connection/roster/')
+        self.assertEqual(response.status_code, 200)
+        return {row['user']['id']: row for row in response.json()}
+
+    def test_latest_weight_is_picked_by_date(self):
+        self.record(self.clients[0], 70, days_ago=1)
+        # Nhập bù sau đó: id lớn hơn nhưng ngày cũ hơn, không được coi là mới nhất
+        self.record(self.clients[0], 80, days_ago=10)
+        self.record(self.clients[1], 60, days_ago=3)
+
+        roster = self.roster()
+        self.assertEqual(roster[self.clients[0].id]['latest_weight'], 70)
+        self.assertEqual(roster[self.clients[1].id]['latest_weight'], 60)
+
+    def test_same_date_falls_back_to_id(self):
+        first = self.record(self.clients[0], 70, days_ago=2)
+        second = self.record(self.clients[0], 71, days_ago=2)
+        HealthRecord.objects.filter(pk=second.pk).update(date=HealthRecord.objects.get(pk=first.pk).date)
+
+        self.assertEqual(self.roster()[self.clients[0].id]['latest_weight'], 71)
+
+    def test_latest_goal_and_constant_queries(self):
+        for client in self.clients:
+            self.record(client, 75, days_ago=1)
+            UserGoal.objects.create(user=client, goal_type='lose', target_weight=65)
+        UserGoal.objects.create(user=self.clients[0], goal_type='lose', target_weight=60)
+
+        with self.assertNumQueries(5):
+            roster = self.roster()
+        self.assertEqual(roster[self.clients[0].id]['goal']['target_weight'], 60)
+        self.assertEqual(roster[self.clients[1].id]['goal']['target_weight'], 65)
+
+
+class GoalProgressTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('goal-user')
+        self.client = client_for(self.user)
+        self.goal = UserGoal.objects.create(user=self.user, goal_type='lose', target_weight=60)
+
+    def current_weight(self):
+        response = self.client.get('/goal/progress/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['goals'][0]['current_weight']
+
+    def test_backdated_bulk_upload_keeps_current_weight(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            HealthRecord.objects.create(user=self.user, weight=70, height=175)
+        self.assertEqual(self.current_weight(), 70)
+
+        # Lịch sử cũ từ thiết bị được tải lên sau: id lớn hơn nhưng ngày cũ hơn
+        measured = timezone.now() - timezone.timedelta(days=20)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/healthrecord/bulk/', [
+                {'weight': 78, 'height': 175, 'date': measured.isoformat()},
+            ], format='json')
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.current_weight(), 70)
+
+
+class StatsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('stats-cache-user')
+        self.today = timezone.localdate()
+        self.open_range = stats_range()
+        self.closed_range = (self.today - timezone.timedelta(days=99), self.today - timezone.timedelta(days=60))
+
+    def ingest(self, days_ago):
+        measured = timezone.now() - timezone.timedelta(days=days_ago)
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_health_records(self.user, [{'steps': 1, 'weight': 70, 'height': 175, 'date': measured.isoformat()}])
+
+    def assert_cached(self, start, end, cached):
+        with CaptureQueriesContext(connection) as queries:
+            stats = get_managements_stats(start, end)
+        self.assertEqual(len(queries) == 0, cached)
+        return stats
+
+    def test_open_range_is_invalidated_only_by_writes_inside_it(self):
+        self.assertEqual(self.assert_cached(*self.open_range, cached=False)['total_records'], 0)
+        self.assert_cached(*self.open_range, cached=True)
+
+        # Ghi trước ngày bắt đầu của mọi khoảng còn mở: giữ cache
+        self.ingest(days_ago=200)
+        self.assert_cached(*self.open_range, cached=True)
+
+        self.ingest(days_ago=1)
+        self.assertEqual(self.assert_cached(*self.open_range, cached=False)['total_records'], 1)
+
+    def test_closed_range_expires_by_ttl(self):
+        self.assert_cached(*self.closed_range, cached=False)
+        self.ingest(days_ago=70)
+        self.assertEqual(self.assert_cached(*self.closed_range, cached=True)['total_records'], 0)
+
+        cache.clear()
+        self.assertEqual(self.assert_cached(*self.closed_range, cached=False)['total_records'], 1)
+
+    def test_write_without_cached_open_range_keeps_version(self):
+        version = namespace_version(STATS_NAMESPACE)
+        self.ingest(days_ago=0)
+        self.assertEqual(namespace_version(STATS_NAMESPACE), version)
+
+    def test_constant_queries(self):
+        activity = Activity.objects.create(user=self.user, name='Squat')
+        for rows in (3, 6):
+            for i in range(3):
+                plan = WorkoutPlan.objects.create(user=self.user, name=f'Kế hoạch {i}', date=self.today)
+                plan.activities.add(activity)
+                HealthDiary.objects.create(user=self.user, content=f'Ngày {i}')
+                UserGoal.objects.create(user=self.user, goal_type='lose', target_weight=60)
+            with self.subTest(rows=rows), self.assertNumQueries(5):
+                stats = build_managements_stats(*self.open_range)
+            self.assertEqual(stats['activity_stats'], [{'name': 'Squat', 'activity_count': rows}])
+
+
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('token-user')
+        self.token = get_access_token_model().objects.create(
+            user=self.user, token='token-cache-test', scope='read write',
+            expires=timezone.now() + timezone.timedelta(hours=1),
+        )
+        self.checksum = token_checksum(self.token.token)
+        # Hai "worker": LRU riêng, dùng chung CACHES['default'] như các tiến trình thật
+        self.worker = TokenCache(ttl=300)
+        self.other_worker = TokenCache(ttl=300)
+        for worker in (self.worker, self.other_worker):
+            worker.set(self.checksum, self.user, self.token)
+
+    def test_hit_skips_token_query(self):
+        client = APIClient(HTTP_AUTHORIZATION=f'Bearer {self.token.token}')
+        with mock.patch('managements.authentication.token_cache', TokenCache(ttl=300)) as local:
+            with CaptureQueriesContext(connection) as miss:
+                self.assertEqual(client.get('/healthrecord/').status_code, 200)
+            with CaptureQueriesContext(connection) as hit:
+                self.assertEqual(client.get('/healthrecord/').status_code, 200)
+        self.assertEqual((local.misses, local.hits), (1, 1))
+        self.assertLess(len(hit), len(miss))
+        self.assertFalse(any('oauth2_provider_accesstoken' in query['sql'] for query in hit))
+
+    def test_new_token_is_served_from_cache(self):
+        # Tạo token cũng ghi dấu qua signal, nhưng mục được cache sau thời điểm đó
+        self.assertEqual(self.other_worker.get(self.checksum)[0], self.user)
+
+    def test_revoke_reaches_other_workers(self):
+        self.token.delete()
+        self.assertIsNone(self.worker.get(self.checksum))
+        self.assertIsNone(self.other_worker.get(self.checksum))
+
+    def test_deactivated_user_reaches_other_workers(self):
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        self.assertIsNone(self.other_worker.get(self.checksum))
+
+        response = APIClient(HTTP_AUTHORIZATION=f'Bearer {self.token.token}').get('/healthrecord/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_entry_expires_after_ttl(self):
+        later = time.time() + 301
+        with mock.patch('managements.authentication.time.time', return_value=later):
+            self.assertIsNone(self.worker.get(self.checksum))
+
+    def test_process_local_cache_caps_ttl(self):
+        self.assertEqual(_build_cache().ttl, 5)
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertEqual(_build_cache().ttl, 300)
+
+
+class UserSignalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.coach = create_user('signal-coach', role=Role.Coach)
+        self.user = create_user('signal-user')
+        UserConnection.objects.create(user=self.user, coach=self.coach, status='accepted')
+
+    def save(self, **kwargs):
+        version = namespace_version(MEALPLAN_NAMESPACE)
+        with mock.patch.object(token_cache, 'discard_user') as discard_user:
+            self.user.save(**kwargs)
+        return discard_user.called, namespace_version(MEALPLAN_NAMESPACE) != version
+
+    def test_last_login_only(self):
+        self.user.last_login = timezone.now()
+        # Chỉ câu UPDATE, không đọc UserConnection để làm mới roster
+        with self.assertNumQueries(1):
+            self.assertEqual(self.save(update_fields=['last_login']), (False, False))
+
+    def test_non_display_field(self):
+        self.user.set_password('mat-khau-moi')
+        self.assertEqual(self.save(update_fields=['password']), (True, False))
+
+    def test_display_field_and_full_save(self):
+        self.user.first_name = 'Minh'
+        self.assertEqual(self.save(update_fields=['first_name']), (True, True))
+        self.assertEqual(self.save(), (True, True))
+
+
+class ScopingTests(TestCase):
+    """Admin thấy mọi dòng, Coach thấy mình và học viên đã chấp nhận kết nối, Exerciser chỉ thấy mình"""
+
+    def setUp(self):
+        self.admin = create_user('scope-admin', role=Role.Admin)
+        self.coach = create_user('scope-coach', role=Role.Coach)
+        self.other_coach = create_user('scope-other-coach', role=Role.Coach)
+        self.student = create_user('scope-student')
+        self.pending = create_user('scope-pending')
+        self.former = create_user('scope-former')
+        self.stranger = create_user('scope-stranger')
+        UserConnection.objects.create(user=self.student, coach=self.coach, status='accepted')
+        UserConnection.objects.create(user=self.pending, coach=self.coach, status='pending')
+        UserConnection.objects.create(user=self.former, coach=self.coach, status='accepted', active=False)
+        UserConnection.objects.create(user=self.stranger, coach=self.other_coach, status='accepted')
+        self.users = [self.admin, self.coach, self.other_coach, self.student, self.pending, self.former, self.stranger]
+        self.records = {user.id: HealthRecord.objects.create(user=user, steps=1).id for user in self.users}
+
+    def assert_scope(self, viewer, visible, queries):
+        with self.assertNumQueries(queries):
+            ids = set(scope_queryset(HealthRecord.objects.all(), viewer).values_list('id', flat=True))
+        self.assertEqual(ids, {self.records[user.id] for user in visible})
+        for user in self.users:
+            self.assertEqual(can_access_user(viewer, user.id), user in visible)
+
+    def test_admin_sees_everyone(self):
+        self.assert_scope(self.admin, self.users, 1)
+
+    def test_coach_sees_accepted_students(self):
+        self.assert_scope(self.coach, [self.coach, self.student], 2)
+
+    def test_exerciser_sees_only_self(self):
+        self.assert_scope(self.student, [self.student], 1)
+
+    def test_get_scoped_user(self):
+        self.assertEqual(get_scoped_user(self.coach, self.student.id), self.student)
+        self.assertIsNone(get_scoped_user(self.coach, self.pending.id))
+        self.assertIsNone(get_scoped_user(self.student, 'abc'))
+
+    def test_endpoint_query_count_fixed(self):
+        client = client_for(self.coach)
+        for rows in (2, 4):
+            with self.subTest(rows=rows), self.assertNumQueries(3):
+                response = client.get('/healthrecord/')
+            self.assertEqual(response.json()['count'], rows)
+            # Thêm học viên: số query không phụ thuộc số học viên của coach
+            for i in range(2):
+                student = create_user(f'scope-student-{rows}-{i}')
+                UserConnection.objects.create(user=student, coach=self.coach, status='accepted')
+                HealthRecord.objects.create(user=student, steps=1)
+
+    def test_meal_plan_writes_limited_to_owner_and_admin(self):
+        plan = MealPlan.objects.create(user=self.coach, name='Thực đơn', date=timezone.localdate())
+        path = f'/mealplan/{plan.id}/'
+
+        for user in (self.other_coach, self.student):
+            client = client_for(user)
+            self.assertEqual(client.get(path).status_code, 200)
+            self.assertEqual(client.patch(path, {'name': 'Sửa'}, format='json').status_code, 404)
+            self.assertEqual(client.delete(path).status_code, 404)
+        plan.refresh_from_db()
+        self.assertEqual((plan.name, plan.active), ('Thực đơn', True))
+
+        self.assertEqual(client_for(self.coach).patch(path, {'name': 'Mới'}, format='json').status_code, 200)
+        self.assertEqual(client_for(self.admin).delete(path).status_code, 204)
+        plan.refresh_from_db()
+        self.assertEqual((plan.name, plan.active), ('Mới', False))
+
+    def test_roster_invalidation_follows_active_connections(self):
+        version = namespace_version(roster_namespace(self.coach.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            HealthRecord.objects.create(user=self.former, steps=2)
+        self.assertEqual(namespace_version(roster_namespace(self.coach.id)), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            HealthRecord.objects.create(user=self.student, steps=2)
+        self.assertNotEqual(namespace_version(roster_namespace(self.coach.id)), version)
+
+
+class SearchBackfillTests(TestCase):
+    def test_backfill_indexes_existing_activities(self):
+        activity = Activity.objects.create(user=create_user('search-coach', role=Role.Coach),
+                                           name='Chạy bộ', description='<p>Buổi sáng</p>', calories_burned=100, time=30)
+        # Activity tạo trước 0017 chưa có token nào
+        ActivitySearchToken.objects.all().delete()
+        client = client_for(activity.user)
+        self.assertEqual(client.get('/activity/', {'q': 'chay'}).json()['count'], 0)
+
+        migration = import_module('managements.migrations.0024_backfill_activity_search_tokens')
+        migration.backfill_search_tokens(apps, None)
+        migration.backfill_search_tokens(apps, None)
+
+        cache.clear()
+        self.assertEqual([row['id'] for row in client.get('/activity/', {'q': 'chay'}).json()['results']],
+                         [activity.id])
+        self.assertEqual(dict(activity.search_tokens.values_list('token', 'weight')),
+                         {'chay': 3, 'bo': 3, 'buoi': 1, 'sang': 1})
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = create_user('export-user')
+        HealthRecord.objects.bulk_create([HealthRecord(user=self.user, steps=i, weight=70) for i in range(5)])
+        plan = WorkoutPlan.objects.create(user=self.user, name='Ngày tay', date=timezone.localdate())
+        plan.activities.add(Activity.objects.create(user=self.user, name='Curl', calories_burned=30, time=10))
+
+    def expected(self, kind, export_format):
+        return ''.join(iter_export(kind, self.user, export_format)).encode()
+
+    async def test_async_iterator_matches_sync(self):
+        for kind, export_format in (('healthrecord', 'csv'), ('workoutplan', 'csv'), ('all', 'ndjson')):
+            chunks = [chunk async for chunk in aiter_export(kind, self.user, export_format)]
+            self.assertEqual(''.join(chunks).encode(), await sync_to_async(self.expected)(kind, export_format))
+
+    @override_settings(PROFILING={'ENABLED': True})
+    async def test_asgi_request_streams_async(self):
+        await get_access_token_model().objects.acreate(
+            user=self.user, token='export-token', scope='read write', expires=timezone.now() + timezone.timedelta(hours=1),
+        )
+        response = await self.async_client.get('/export/all/', {'format': 'ndjson'},
+                                               headers={'authorization': 'Bearer export-token'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(content, await sync_to_async(self.expected)('all', 'ndjson'))
+        self.assertEqual(len(content.splitlines()), 6)
+        # Query đọc chunk (mỗi bảng ít nhất một) được ghi vào profile của request
+        record = profile_buffer.records()[-1]
+        self.assertEqual((record['path'], record['response_bytes']), ('/export/all/', len(content)))
+        self.assertGreaterEqual(record['queries'], len(EXPORTS))
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        profile_buffer.clear()
+        self.user = create_user('profiling-user')
+        HealthRecord.objects.bulk_create([HealthRecord(user=self.user, steps=i) for i in range(3)])
+
+    def get_record(self, threshold):
+        # Middleware được nạp khi client gửi request đầu tiên nên client phải tạo trong override_settings
+        with override_settings(PROFILING={'ENABLED': True, 'DUPLICATE_THRESHOLD': threshold}):
+            client = client_for(self.user)
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get('/healthrecord/')
+        self.assertEqual(response.status_code, 200)
+        record = profile_buffer.records()[-1]
+        self.assertEqual((record['endpoint'], record['method'], record['status']), ('healthrecord-list', 'GET', 200))
+        self.assertEqual(record['queries'], len(queries))
+        self.assertEqual(record['response_bytes'], len(response.content))
+        return record
+
+    def test_request_is_recorded_with_duplicates_over_threshold(self):
+        self.assertEqual(self.get_record(threshold=100)['duplicates'], [])
+        record = self.get_record(threshold=1)
+        # Ngưỡng 1: mọi chữ ký SQL (tối đa 5) đều bị báo cáo
+        self.assertTrue(record['duplicates'])
+        self.assertLessEqual(sum(duplicate['count'] for duplicate in record['duplicates']), record['queries'])
+
+    def test_disabled_by_default(self):
+        with override_settings(PROFILING={}):
+            self.assertEqual(client_for(self.user).get('/healthrecord/').status_code, 200)
+        self.assertEqual(len(profile_buffer), 0)
+
+    def test_endpoint_report(self):
+        def record(endpoint, duration, duplicates=()):
+            return {
+                'endpoint': endpoint, 'duration_ms': duration, 'queries': 2, 'query_ms': 1.0,
+                'serializer_ms': 0.5, 'response_bytes': 100, 'duplicates': list(duplicates),
+            }
+
+        records = [record('fast', ms) for ms in (1, 2, 3)]
+        records += [record('slow', ms) for ms in range(10, 110, 10)]
+        records[-1]['duplicates'] = [{'sql': 'SELECT 1', 'count': 5}]
+        report = endpoint_report(records)
+
+        self.assertEqual([row['endpoint'] for row in report], ['slow', 'fast'])
+        slow = report[0]
+        self.assertEqual((slow['requests'], slow['p50_ms'], slow['p95_ms'], slow['max_ms']), (10, 50, 100, 100))
+        self.assertEqual(slow['n_plus_one_requests'], 1)
+        self.assertEqual(slow['duplicates'], [{'sql': 'SELECT 1', 'count': 5}])
+        self.assertEqual((report[1]['p50_ms'], report[1]['n_plus_one_requests']), (2, 0))
+
+
+class ActivityStatisticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        self.last_week = self.today - timezone.timedelta(days=7)
+        self.coach = create_user('stats-coach', role=Role.Coach)
+        self.user = create_user('stats-user')
+        self.activity = Activity.objects.create(user=self.coach, name='Bơi', calories_burned=200, time=30)
+        plan = WorkoutPlan.objects.create(user=self.user, name='Bơi sáng', date=self.last_week)
+        plan.activities.add(self.activity)
+
+    def last_week_calories(self):
+        return get_activity_statistics(self.user, 'week', 2, self.today)[0]['calories_burned']
+
+    @override_settings(STATISTICS_CACHE_TIMEOUT=120)
+    def test_closed_periods_expire_and_survive_catalog_changes(self):
+        with mock.patch('managements.activity_stats.cache.set_many', wraps=cache.set_many) as set_many:
+            self.assertEqual(self.last_week_calories(), 200)
+            self.assertEqual(set_many.call_args.args[1], 120)
+
+            # Activity của người khác không liên quan tới kế hoạch: không tạo key mới
+            Activity.objects.create(user=self.coach, name='Chạy', calories_burned=300, time=20)
+            self.assertEqual(self.last_week_calories(), 200)
+            self.assertEqual(set_many.call_count, 1)
+
+    def test_activity_change_refreshes_plan_owner(self):
+        self.assertEqual(self.last_week_calories(), 200)
+
+        self.activity.calories_burned = 250
+        self.activity.save()
+        self.assertEqual(self.last_week_calories(), 250)
+
+        self.activity.delete()
+        self.assertEqual(self.last_week_calories(), 0)
+
+
+class HealthRecordIngestTests(TestCase):
+    def setUp(self):
+        self.user = create_user('ingest-user')
+
+    def test_ids_without_returning_bulk_insert(self):
+        items = [
+            {'steps': 1, 'idempotency_key': 'a'},
+            {'steps': 2},
+            {'steps': 3, 'idempotency_key': 'a'},
+            {'steps': 4},
+        ]
+        # Như MySQL: bulk_create không gán pk cho các đối tượng
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert',
+                               new_callable=mock.PropertyMock, return_value=False):
+            result = ingest_health_records(self.user, items, chunk_size=2)
+
+        ids = {row['index']: row['id'] for row in result['created']}
+        self.assertEqual(sorted(ids), [0, 1, 3])
+        for index, record_id in ids.items():
+            self.assertEqual(HealthRecord.objects.get(id=record_id).steps, items[index]['steps'])
+        self.assertEqual(result['duplicates'], [{'index': 2, 'idempotency_key': 'a', 'id': ids[0]}])
+        # Phần tử không gửi khóa giữ idempotency_key NULL, lô tạm đã được xóa
+        self.assertEqual(
+            dict(HealthRecord.objects.values_list('steps', 'idempotency_key')), {1: 'a', 2: None, 4: None}
+        )
+        self.assertFalse(HealthRecord.objects.filter(ingest_batch__isnull=False).exists())
+
+    def test_keyless_items_with_returning_bulk_insert(self):
+        # Hai savepoint + INSERT ... RETURNING, không đọc lại id
+        with self.assertNumQueries(5):
+            result = ingest_health_records(self.user, [{'steps': 1}, {'steps': 2}])
+
+        ids = [row['id'] for row in result['created']]
+        self.assertEqual([HealthRecord.objects.get(id=i).steps for i in ids], [1, 2])
+        self.assertFalse(HealthRecord.objects.filter(idempotency_key__isnull=False).exists())
+
+    def test_key_inserted_concurrently(self):
+        raced = HealthRecord.objects.create(user=self.user, steps=1, idempotency_key='k1')
+        pending = [
+            (0, HealthRecord(user=self.user, steps=2, idempotency_key='k1')),
+            (1, HealthRecord(user=self.user, steps=3, idempotency_key='k2')),
+            (2, HealthRecord(user=self.user, steps=4)),
+        ]
+
+        created, existing = insert_chunk(self.user, pending, 500)
+
+        self.assertEqual(existing, {'k1': raced.id})
+        self.assertEqual([(index, record.steps) for index, record in created], [(1, 3), (2, 4)])
+        self.assertEqual(created[0][1].pk, HealthRecord.objects.get(idempotency_key='k2').id)
+        self.assertEqual(created[1][1].pk, HealthRecord.objects.get(steps=4).id)
+        self.assertEqual(HealthRecord.objects.filter(user=self.user).count(), 3)
+
+    def test_history_keeps_date(self):
+        measured = datetime(2025, 3, 1, 7, 30, tzinfo=dt_timezone.utc)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client_for(self.user).post('/healthrecord/bulk/', [
+                {'steps': 5000, 'weight': 70, 'height': 175, 'date': measured.isoformat()},
+            ], format='json')
+
+        self.assertEqual(response.status_code, 201)
+        record = HealthRecord.objects.get(id=response.json()['results'][0]['id'])
+        self.assertEqual(record.date, measured)
+        self.assertTrue(DailyHealthSummary.objects.filter(user=self.user, date=measured.date()).exists())
+
+
+class BenchmarkSeedTests(TestCase):
+    def test_seed_without_returning_bulk_insert(self):
+        options = {'seed': 1, 'coaches': 2, 'exercisers': 3, 'days': 3, 'messages': 4, 'plans': 2}
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert',
+                               new_callable=mock.PropertyMock, return_value=False):
+            data = BenchmarkCommand().seed(options)
+
+        exerciser = data['exerciser']
+        self.assertEqual(exerciser, User.objects.get(username='bench-api-user-0'))
+        self.assertEqual(UserConnection.objects.get(user=exerciser).coach.username, 'bench-api-coach-0')
+        self.assertEqual(WorkoutPlan.objects.filter(user=exerciser).count(), 2)
+        self.assertFalse(WorkoutPlan.objects.filter(user=exerciser, activities=None).exists())
+        self.assertTrue(Activity.objects.filter(id=data['pks']['activity']).exists())
+
+
+class ExplainQueriesTests(TestCase):
+    options = ['--exercisers', '1', '--coaches', '1', '--days', '1', '--messages', '1', '--plans', '1', '--json']
+
+    def run_command(self, make_queries, *args):
+        """Chạy explain_queries với các câu truy vấn do make_queries sinh ra thay cho các endpoint"""
+        def collect(command, bench, data, options):
+            queries = {}
+            with command.capture(queries, 'test (exerciser)'):
+                make_queries()
+            return queries
+
+        out = StringIO()
+        with mock.patch.object(ExplainQueriesCommand, 'collect', collect):
+            call_command('explain_queries', *self.options, *args, stdout=out)
+        return out.getvalue()
+
+    def test_unindexed_filter_fails(self):
+        with self.assertRaises(CommandError):
+            self.run_command(lambda: HealthRecord.objects.filter(heart_rate=80).count())
+
+    def test_unindexed_filter_in_subquery_fails(self):
+        make_queries = lambda: User.objects.filter(
+            id__in=HealthRecord.objects.filter(heart_rate=80).values('user_id')
+        ).count()
+        with self.assertRaises(CommandError):
+            self.run_command(make_queries)
+        self.run_command(make_queries, '--allow', 'managements_healthrecord')
+
+    def test_indexed_filter_passes(self):
+        user = create_user('explain-user')
+        out = self.run_command(lambda: list(HealthRecord.objects.filter(user=user, active=True)))
+        self.assertEqual(json.loads(out)['failures'], 0)
+
+    def test_filter_columns_resolves_aliases(self):
+        sql = ('SELECT "managements_user"."id" FROM "managements_user" WHERE "managements_user"."id" IN '
+               '(SELECT U0."user_id" FROM "managements_healthrecord" U0 WHERE (U0."heart_rate" = %s AND U0."active"))')
+        self.assertEqual(filter_columns(sql, 'U0'), ['heart_rate'])
+        self.assertEqual(filter_columns(sql, 'managements_healthrecord'), ['heart_rate'])
+        self.assertEqual(filter_columns(sql, 'managements_user'), ['id'])
+
+
+class RemoteImageStorage(ImageStorage):
+    """Như Cloudinary: public_id trả về không phải tên file trong storage của ImageField"""
+
+    def save(self, content, folder, name):
+        public_id = f'{folder}/{os.path.splitext(name)[0]}'
+        return {'public_id': public_id, 'url': f'https://images.example.com/{public_id}'}
+
+
+class ImageProcessingTests(TestCase):
+    """IMAGE_WORKERS=0: submit() xử lý ngay trong tiến trình test thay cho executor"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.temp_dir = os.path.join(self.media_root, 'uploads-tmp')
+        settings = override_settings(
+            MEDIA_ROOT=self.media_root, IMAGE_UPLOAD_TEMP_DIR=self.temp_dir, IMAGE_WORKERS=0,
+            IMAGE_STORAGE_BACKEND='managements.tests.RemoteImageStorage',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        storage = mock.patch('managements.images._storage', None)
+        storage.start()
+        self.addCleanup(storage.stop)
+
+        self.coach = create_user('image-coach', role=Role.Coach)
+        self.plan = MealPlan.objects.create(user=self.coach, name='Thực đơn', date=timezone.localdate())
+
+    def image_bytes(self):
+        buffer = BytesIO()
+        Image.new('RGB', (800, 400), 'red').save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def upload(self, path):
+        upload = SimpleUploadedFile('anh.png', self.image_bytes(), content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client_for(self.coach).post(path, {'image': upload}, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], ImageStatus.PENDING)
+
+    def temp_files(self):
+        return os.listdir(self.temp_dir) if os.path.isdir(self.temp_dir) else []
+
+    def test_image_field_is_stored_through_its_own_storage(self):
+        self.upload(f'/mealplan/{self.plan.id}/image/')
+
+        self.plan.refresh_from_db()
+        self.assertEqual(self.plan.image_status, ImageStatus.READY)
+        self.assertTrue(self.plan.image.name.startswith('mealplan_images/'))
+        self.assertTrue(default_storage.exists(self.plan.image.name))
+        self.assertEqual(self.plan.image_variants['original'], self.plan.image.url)
+        self.assertEqual(set(self.plan.image_variants), {'original', 'medium', 'thumbnail'})
+        self.assertEqual(self.temp_files(), [])
+
+    def test_cloudinary_field_stores_public_id(self):
+        activity = Activity.objects.create(user=self.coach, name='Squat')
+        self.upload(f'/activity/{activity.id}/image/')
+
+        activity.refresh_from_db()
+        self.assertEqual(activity.image_status, ImageStatus.READY)
+        self.assertTrue(activity.image.public_id.startswith('activity/'))
+        self.assertEqual(self.temp_files(), [])
+
+    def test_failure_marks_failed_and_removes_temp_file(self):
+        with mock.patch.object(RemoteImageStorage, 'save', side_effect=OSError('hết dung lượng')), \
+                self.assertLogs('managements.images', 'ERROR'):
+            self.upload(f'/activity/{Activity.objects.create(user=self.coach, name="Squat").id}/image/')
+
+        self.assertEqual(Activity.objects.get(name='Squat').image_status, ImageStatus.FAILED)
+        self.assertEqual(self.temp_files(), [])
+
+    def write_temp(self, name, age):
+        os.makedirs(self.temp_dir, exist_ok=True)
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as destination:
+            destination.write(self.image_bytes())
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return name
+
+    def test_recover_lost_uploads(self):
+        lost, missing, fresh, done = (
+            MealPlan.objects.create(user=self.coach, name=f'Thực đơn {i}', date=timezone.localdate())
+            for i in range(4)
+        )
+        MealPlan.objects.filter(pk__in=[lost.pk, missing.pk, fresh.pk]).update(image_status=ImageStatus.PENDING)
+        self.write_temp(f'managements.mealplan-{lost.pk}-image-{"a" * 32}.png', age=3600)
+        fresh_name = self.write_temp(f'managements.mealplan-{fresh.pk}-image-{"b" * 32}.png', age=10)
+        self.write_temp(f'managements.mealplan-{done.pk}-image-{"c" * 32}.png', age=3600)
+        self.write_temp('rac.png', age=3600)
+
+        out = StringIO()
+        call_command('recover_image_uploads', stdout=out)
+
+        statuses = dict(MealPlan.objects.values_list('pk', 'image_status'))
+        self.assertEqual(statuses[lost.pk], ImageStatus.READY)
+        self.assertEqual(statuses[missing.pk], ImageStatus.FAILED)
+        self.assertEqual(statuses[fresh.pk], ImageStatus.PENDING)
+        self.assertEqual(statuses[done.pk], '')
+        self.assertEqual(self.temp_files(), [fresh_name])
+        self.assertIn('Xử lý lại: 1, đánh dấu lỗi: 1, xóa file tạm: 2', out.getvalue())
+
+
+class ConversationMessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChatMessage
+        fields = ['id', 'message', 'is_read']
+
+
+class ConversationSerializer(serializers.ModelSerializer):
+    """Khóa ngoại có thể NULL (last_message), cả dạng pk lẫn lồng"""
+    last_message = ConversationMessageSerializer(read_only=True)
+    last_message_id = serializers.PrimaryKeyRelatedField(source='last_message', read_only=True)
+
+    class Meta:
+        model = ChatConversation
+        fields = ['id', 'peer', 'last_message', 'last_message_id', 'unread_count']
+
+
+class ImageUrlTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.coach = create_user('image-url-coach', role=Role.Coach)
+        self.cloudinary = 'image/upload/v1700000000/activity/{}.jpg'
+
+    def activity(self, name, image=None, variants=None):
+        return Activity.objects.create(
+            user=self.coach, name=name, calories_burned=10, time=5,
+            image=image, image_variants=variants or {},
+        )
+
+    def test_list_uses_stored_variants(self):
+        for i in range(2):
+            url = f'https://cdn.example.com/activity-{i}.jpg'
+            self.activity(f'Bài {i}', self.cloudinary.format(i), {'original': url, 'thumb': url + '?w=150'})
+
+        with mock.patch('managements.images.resolve_url') as resolve, \
+                mock.patch('managements.images.cloudinary_url') as build:
+            response = client_for(self.coach).get('/activity/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(row['image_url'] for row in response.json()['results']),
+                         [f'https://cdn.example.com/activity-{i}.jpg' for i in range(2)])
+        resolve.assert_not_called()
+        build.assert_not_called()
+
+    def test_legacy_row_builds_url_once_per_public_id(self):
+        activity = self.activity('Cũ', self.cloudinary.format('legacy'))
+        activity.refresh_from_db()
+        with mock.patch('cloudinary.CloudinaryResource.url', new_callable=mock.PropertyMock,
+                        return_value='https://res.example.com/legacy.jpg') as build:
+            images.cloudinary_url.cache_clear()
+            urls = {image_url(activity, 'image') for _ in range(3)}
+        self.assertEqual(urls, {'https://res.example.com/legacy.jpg'})
+        self.assertEqual(build.call_count, 1)
+
+    def test_store_image_url(self):
+        activity = self.activity('Admin', self.cloudinary.format('admin'))
+        activity.refresh_from_db()
+        store_image_url(activity, 'image')
+
+        activity.refresh_from_db()
+        self.assertEqual(activity.image_status, ImageStatus.READY)
+        self.assertEqual(activity.image_variants, {'original': images.resolve_url(activity.image)})
+        self.assertIn('activity/admin', activity.image_variants['original'])
+
+        activity.image = None
+        store_image_url(activity, 'image')
+        activity.refresh_from_db()
+        self.assertEqual((activity.image_status, activity.image_variants), ('', {}))
+
+    def test_backfill_command(self):
+        legacy = [self.activity(f'Cũ {i}', self.cloudinary.format(f'old-{i}')) for i in range(3)]
+        stored = self.activity('Đã xử lý', self.cloudinary.format('new'), {'original': 'https://cdn.example.com/new.jpg'})
+        no_image = self.activity('Không ảnh')
+
+        out = StringIO()
+        call_command('backfill_image_urls', '--chunk-size', '2', stdout=out)
+
+        self.assertIn('Activity.image: 3', out.getvalue())
+        for activity in legacy:
+            activity.refresh_from_db()
+            self.assertEqual(activity.image_status, ImageStatus.READY)
+            self.assertEqual(activity.image_variants, {'original': images.resolve_url(activity.image)})
+        stored.refresh_from_db()
+        no_image.refresh_from_db()
+        self.assertEqual(stored.image_variants, {'original': 'https://cdn.example.com/new.jpg'})
+        self.assertEqual((no_image.image_status, no_image.image_variants), ('', {}))
+
+
+class FastSerializerTests(TestCase):
+    def setUp(self):
+        self.user = create_user('fast-user')
+        activities = [Activity.objects.create(user=self.user, name=f'Bài {i}') for i in range(2)]
+        WorkoutPlan.objects.create(user=self.user, name='Có bài', date=timezone.localdate()).activities.add(*activities)
+        WorkoutPlan.objects.create(user=self.user, name='Trống', date=timezone.localdate())
+        MealPlan.objects.create(user=self.user, name='Không ảnh', date=timezone.localdate())
+        MealPlan.objects.create(user=self.user, name='Có ảnh', date=timezone.localdate(),
+                                image_status=ImageStatus.READY, image_variants={'original': 'https://x/a.jpg'})
+        HealthRecord.objects.create(user=self.user)
+        HealthRecord.objects.create(user=self.user, steps=100, weight=70, height=175)
+        HealthDiary.objects.create(user=self.user, content='Ổn', feeling='vui')
+        UserGoal.objects.create(user=self.user)
+        UserGoal.objects.create(user=self.user, goal_type='lose', target_weight=60, target_date=timezone.localdate())
+
+    def context(self):
+        request = APIRequestFactory().get('/')
+        request.user = self.user
+        return {'request': request}
+
+    def assert_same(self, serializer_class, queryset):
+        fast = fast_serializer(serializer_class, self.context())
+        self.assertIsNotNone(fast)
+        expected = serializer_class(queryset, many=True, context=self.context()).data
+        self.assertEqual(fast.serialize(fast.values(queryset)), expected)
+
+    def test_matches_serializer_for_every_fast_list_viewset(self):
+        viewsets = [
+            view for view in vars(views).values()
+            if isinstance(view, type) and issubclass(view, views.FastListMixin) and view is not views.FastListMixin
+        ]
+        self.assertEqual(len(viewsets), 5)
+        for view in viewsets:
+            serializer_class = view.serializer_class
+            with self.subTest(view=view.__name__):
+                self.assert_same(serializer_class, serializer_class.Meta.model.objects.order_by('id'))
+
+    def test_null_foreign_key(self):
+        peer = create_user('fast-peer')
+        message = ChatMessage.objects.create(sender=peer, receiver=self.user, message='Chào')
+        ChatConversation.objects.filter(owner=self.user, peer=peer).update(last_message=None)
+        ChatConversation.objects.filter(owner=peer, peer=self.user).update(last_message=message)
+        self.assertEqual(ChatConversation.objects.filter(last_message=None).count(), 1)
+
+        self.assert_same(ConversationSerializer, ChatConversation.objects.order_by('id'))
+
+    def test_unknown_source_falls_back(self):
+        class PropertySerializer(serializers.ModelSerializer):
+            full_name = serializers.ReadOnlyField(source='get_full_name')
+
+            class Meta:
+                model = User
+                fields = ['id', 'full_name']
+
+        self.assertIsNone(fast_serializer(PropertySerializer))
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def fake_ping(connection):
+    if not connection.alive:
+        raise OSError('mất kết nối')
+
+
+class ConnectionPoolTests(TestCase):
+    def test_checkout_and_return(self):
+        pool = ConnectionPool(fake_ping, max_size=1, max_overflow=1)
+        first = pool.acquire(FakeConnection)
+        second = pool.acquire(FakeConnection)
+        pool.release(first)
+        pool.release(second)
+
+        # Chỉ giữ max_size kết nối rảnh, kết nối overflow bị đóng
+        self.assertTrue(second.closed)
+        self.assertIs(pool.acquire(FakeConnection), first)
+        self.assertEqual(pool.stats()['created'], 2)
+        self.assertEqual(pool.stats()['reused'], 1)
+        self.assertEqual(pool.stats()['overflow_closed'], 1)
+
+    def test_ping_failure_replaces_connection(self):
+        pool = ConnectionPool(fake_ping)
+        broken = pool.acquire(FakeConnection)
+        pool.release(broken)
+        broken.alive = False
+
+        fresh = pool.acquire(FakeConnection)
+        self.assertIsNot(fresh, broken)
+        self.assertTrue(broken.closed)
+        self.assertEqual(pool.stats()['ping_failures'], 1)
+        self.assertEqual(pool.stats()['open'], 1)
+
+    def test_unusable_connection_is_not_reused(self):
+        pool = ConnectionPool(fake_ping)
+        connection = pool.acquire(FakeConnection)
+        pool.release(connection, usable=False)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.acquire(FakeConnection), connection)
+
+    def test_timeout_when_exhausted(self):
+        pool = ConnectionPool(fake_ping, max_size=1, max_overflow=0, timeout=0.05)
+        pool.acquire(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(FakeConnection)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_connection_params_change(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings_dict = {**connections.settings['default'], 'NAME': os.path.join(directory, 'pool_a.sqlite3')}
+        wrapper = PooledSQLiteWrapper(settings_dict, 'pool-test')
+        self.addCleanup(close_pool, 'pool-test')
+
+        def database_file():
+            wrapper.ensure_connection()
+            with wrapper.cursor() as cursor:
+                cursor.execute('PRAGMA database_list')
+                name = os.path.basename(cursor.fetchone()[2])
+            wrapper.close()
+            return name
+
+        self.assertEqual(database_file(), 'pool_a.sqlite3')
+        self.assertEqual(database_file(), 'pool_a.sqlite3')
+        self.assertEqual(wrapper.pool.stats()['reused'], 1)
+
+        wrapper.settings_dict['NAME'] = os.path.join(directory, 'pool_b.sqlite3')
+        self.assertEqual(database_file(), 'pool_b.sqlite3')
+
+
+@override_settings(READ_REPLICAS={'ALIASES': ['replica'], 'STICKY_SECONDS': 1})
+class ReplicaRouterTests(TransactionTestCase):
+    """
+    Hai DB SQLite riêng: 'replica' chỉ nhận dữ liệu tạo thẳng trên nó nên đọc được từ DB nào
+    thì thấy ngay. TransactionTestCase vì trong transaction router luôn đọc từ primary.
+    """
+
+    databases = '__all__'
+    replica_models = (User, HealthRecord, Activity)
+
+    @classmethod
+    def setUpClass(cls):
+        handle, cls.replica_path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        connections.settings['replica'] = {**connections.settings['default'], 'NAME': cls.replica_path}
+        with connections['replica'].schema_editor() as editor:
+            for model in cls.replica_models:
+                editor.create_model(model)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        os.remove(cls.replica_path)
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user('replica-user')
+        User.objects.using('replica').bulk_create([User.objects.get(pk=self.user.pk)])
+        HealthRecord.objects.using('replica').create(user=self.user, steps=111)
+        HealthRecord.objects.create(user=self.user, steps=222)
+        self.client = client_for(self.user)
+
+    def tearDown(self):
+        # flush bỏ qua replica (allow_migrate=False) nên tự xóa dữ liệu
+        with connections['replica'].cursor() as cursor:
+            for model in reversed(self.replica_models):
+                cursor.execute(f'DELETE FROM {model._meta.db_table}')
+
+    def steps(self):
+        response = self.client.get('/healthrecord/')
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['steps'] for row in response.json()['results'])
+
+    def test_reads_from_replica(self):
+        self.assertEqual(self.steps(), [111])
+
+    def test_write_pins_user_to_primary_until_expiry(self):
+        response = self.client.post('/healthrecord/', {'steps': 333, 'weight': 70, 'height': 175}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(HealthRecord.objects.using('replica').filter(steps=333).exists())
+
+        self.assertTrue(cache.get(STICKY_KEY.format(self.user.pk)))
+        self.assertEqual(self.steps(), [222, 333])
+
+        time.sleep(1.1)
+        self.assertEqual(self.steps(), [111])
+
+    def test_sticky_is_per_user(self):
+        other = create_user('replica-other')
+        User.objects.using('replica').bulk_create([User.objects.get(pk=other.pk)])
+        self.client.post('/healthrecord/', {'steps': 333}, format='json')
+
+        response = client_for(other).get('/healthrecord/')
+        self.assertEqual(response.json()['count'], 0)
+        HealthRecord.objects.using('replica').create(user=other, steps=444)
+        self.assertEqual([row['steps'] for row in client_for(other).get('/healthrecord/').json()['results']], [444])
+
+    def test_cache_is_filled_from_primary(self):
+        # Replica còn trễ ngay sau khi invalidate: kết quả cache phải lấy từ primary
+        Activity.objects.using('replica').bulk_create([Activity(user=self.user, name='replica-stale')])
+        Activity.objects.create(user=self.user, name='primary-fresh')
+
+        for _ in range(2):
+            response = APIClient().get('/activity/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([row['name'] for row in response.json()['results']], ['primary-fresh'])
+        self.assertEqual(self.steps(), [111])
+
+
+class ChatPaginationTests(TestCase):
+    def setUp(self):
+        self.user = create_user('chat-user')
+        self.peer = create_user('chat-peer')
+        self.other = create_user('chat-other')
+        self.client = client_for(self.user)
+        self.start = timezone.now() - timezone.timedelta(days=30)
+        self.messages = []
+
+    def add_messages(self, count):
+        """Tin xen kẽ hai chiều; mỗi cặp hai chiều dùng chung timestamp để thử phần so sánh id"""
+        for i in range(len(self.messages), len(self.messages) + count):
+            sender, receiver = (self.user, self.peer) if i % 2 else (self.peer, self.user)
+            message = ChatMessage.objects.create(sender=sender, receiver=receiver, message=f'Tin {i}')
+            ChatMessage.objects.filter(id=message.id).update(timestamp=self.start + timezone.timedelta(minutes=i // 2))
+            self.messages.append(message.id)
+        ChatMessage.objects.create(sender=self.other, receiver=self.peer, message='Không liên quan')
+
+    def conversation(self, **params):
+        response = self.client.get(f'/chatmessage/conversation/{self.peer.id}/', {'limit': 4, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_before_walks_whole_history_in_order(self):
+        self.add_messages(11)
+        page = self.conversation()
+        ids = [row['id'] for row in page['results']]
+        while page['has_older']:
+            page = self.conversation(before=page['older'])
+            ids = [row['id'] for row in page['results']] + ids
+        self.assertEqual(ids, self.messages)
+        self.assertIsNone(page['older'])
+
+    def test_after_returns_newer_messages(self):
+        self.add_messages(5)
+        newest = self.conversation()
+        self.assertFalse(newest['has_newer'])
+        self.assertEqual(self.conversation(after=newest['newer'])['results'], [])
+
+        self.add_messages(6)
+        page = self.conversation(after=newest['newer'])
+        self.assertEqual([row['id'] for row in page['results']], self.messages[5:9])
+        self.assertTrue(page['has_newer'])
+        self.assertEqual([row['id'] for row in self.conversation(after=page['newer'])['results']], self.messages[9:])
+
+    def test_invalid_cursor(self):
+        for cursor in ('abc', 'bm90LWEtY3Vyc29y'):
+            response = self.client.get(f'/chatmessage/conversation/{self.peer.id}/', {'before': cursor})
+            self.assertEqual(response.status_code, 404)
+
+    def test_query_count_and_plan_independent_of_history(self):
+        for total in (10, 60):
+            self.add_messages(total - len(self.messages))
+            older = self.conversation()['older']
+            with self.subTest(messages=total), CaptureQueriesContext(connection) as queries:
+                self.assertEqual(len(self.conversation(before=older)['results']), 4)
+            # Tra User của peer + mỗi chiều một câu
+            self.assertEqual(len(queries), 3)
+            with connection.cursor() as cursor:
+                for query in queries[1:]:
+                    cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                    plan = ' '.join(row[-1] for row in cursor.fetchall())
+                    self.assertNotIn('TEMP B-TREE', plan)
+                    self.assertNotIn('MULTI-INDEX OR', plan)
+
+    def test_list_is_paginated_per_user(self):
+        self.add_messages(7)
+        ChatMessage.objects.create(sender=self.user, receiver=self.user, message='Ghi chú')
+        page = self.client.get('/chatmessage/', {'limit': 5}).json()
+        self.assertTrue(page['has_older'])
+        ids = [row['id'] for row in page['results']]
+        page = self.client.get('/chatmessage/', {'limit': 5, 'before': page['older']}).json()
+        ids = [row['id'] for row in page['results']] + ids
+
+        expected = ChatMessage.objects.filter(Q(sender=self.user) | Q(receiver=self.user)).order_by('timestamp', 'id')
+        self.assertEqual(ids, list(expected.values_list('id', flat=True)))
+        self.assertFalse(page['has_older'])
+
+
+class ChatInboxTests(TestCase):
+    def setUp(self):
+        self.user = create_user('inbox-user')
+        self.peers = [create_user(f'inbox-peer-{i}') for i in range(3)]
+        self.client = client_for(self.user)
+
+    def send(self, sender, receiver, count=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [ChatMessage.objects.create(sender=sender, receiver=receiver, message='Chào') for _ in range(count)]
+
+    def unread(self, owner, peer):
+        return ChatConversation.objects.get(owner=owner, peer=peer).unread_count
+
+    def inbox(self):
+        response = self.client.get('/chatmessage/inbox/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def mark_read(self, peer, data=None):
+        return self.client.post(f'/chatmessage/conversation/{peer.id}/read/', data or {}, format='json')
+
+    def test_unread_counters(self):
+        peer = self.peers[0]
+        self.send(peer, self.user, 3)
+        self.send(self.user, peer)
+
+        self.assertEqual(self.unread(self.user, peer), 3)
+        self.assertEqual(self.unread(peer, self.user), 1)
+
+    def test_inbox_is_ordered_by_last_message(self):
+        for peer in self.peers:
+            self.send(peer, self.user)
+        last = self.send(self.user, self.peers[0])[0]
+
+        rows = self.inbox()
+        self.assertEqual([row['peer']['id'] for row in rows], [self.peers[0].id, self.peers[2].id, self.peers[1].id])
+        self.assertEqual(rows[0]['last_message']['id'], last.id)
+        self.assertEqual([row['unread_count'] for row in rows], [1, 1, 1])
+
+    def test_inbox_queries_do_not_grow(self):
+        for peers in (self.peers[:1], self.peers[1:]):
+            for peer in peers:
+                self.send(peer, self.user, 2)
+            with self.assertNumQueries(2):
+                self.inbox()
+
+    def test_bulk_mark_read(self):
+        peer = self.peers[0]
+        messages = self.send(peer, self.user, 4)
+        self.send(self.peers[1], self.user)
+
+        with self.assertNumQueries(5):
+            response = self.mark_read(peer, {'up_to': messages[1].id})
+        self.assertEqual(response.json(), {'marked': 2})
+        self.assertEqual(self.unread(self.user, peer), 2)
+        self.assertEqual(ChatMessage.objects.filter(receiver=self.user, is_read=False).count(), 3)
+
+        self.send(peer, self.user, 2)
+        with self.assertNumQueries(5):
+            response = self.mark_read(peer)
+        self.assertEqual(response.json(), {'marked': 4})
+        self.assertEqual(self.unread(self.user, peer), 0)
+        self.assertEqual(self.unread(self.user, self.peers[1]), 1)
+
+        self.assertEqual(self.mark_read(peer).json(), {'marked': 0})
+
+    def test_bad_requests(self):
+        self.send(self.peers[0], self.user)
+
+        response = self.mark_read(self.peers[0], {'up_to': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.unread(self.user, self.peers[0]), 1)
+        self.assertEqual(self.client.post('/chatmessage/conversation/999999/read/').status_code, 404)
+
+
+class ChatConsumerTests(TransactionTestCase):
+    async def connect(self, user, peer):
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), f'/ws/chat/{peer.id}/')
+        communicator.scope['user'] = user
+        communicator.scope['url_route'] = {'kwargs': {'peer_id': peer.id}}
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_invalid_up_to_keeps_socket_open(self):
+        user = await User.objects.acreate(username='ws-user', email='ws-user@example.com')
+        peer = await User.objects.acreate(username='ws-peer', email='ws-peer@example.com')
+        message = await ChatMessage.objects.acreate(sender=peer, receiver=user, message='Chào')
+        communicator = await self.connect(user, peer)
+
+        await communicator.send_json_to({'type': 'read', 'up_to': 'abc'})
+        self.assertEqual((await communicator.receive_json_from())['type'], 'error')
+
+        await communicator.send_json_to({'type': 'read', 'up_to': str(message.id)})
+        frame = await communicator.receive_json_from()
+        while frame['type'] != 'read':
+            frame = await communicator.receive_json_from()
+        self.assertEqual(frame['up_to'], message.id)
+        await communicator.disconnect()
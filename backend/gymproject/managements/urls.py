@@ -13,6 +13,9 @@ router.register('healthdiary', views.HealthDiaryViewSet, basename='healthdiary')
 router.register('chatmessage', views.ChatMessageViewSet, basename='chat')
 router.register('connection', views.UserConnectionViewSet, basename='connection')
 router.register('goal', views.UserGoalViewSet, basename='goal')
+router.register('export', views.ExportViewSet, basename='export')
+router.register('sync', views.SyncViewSet, basename='sync')
+router.register('statistics', views.ActivityStatisticsViewSet, basename='statistics')
 
 urlpatterns = [
     path('', include(router.urls)),
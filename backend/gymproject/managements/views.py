@@ -1,19 +1,112 @@
 from rest_framework import viewsets, generics, status, permissions
 from .serializers import *
-from django.db.models import Q
+from django.db.models import Count, Prefetch, Q, Sum
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from rest_framework.negotiation import BaseContentNegotiation
 from managements import paginators
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
-from .paginators import Pagination
+from .paginators import Pagination, KeysetPagination
 from .perms import *
 from rest_framework.parsers import MultiPartParser, JSONParser, FormParser
 from datetime import timedelta
 from django.utils import timezone # Thêm dòng này
 from managements.models import Role # Thêm dòng này
+from managements.activity_stats import (DEFAULT_PERIOD_COUNT, MAX_PERIOD_COUNT, PERIODS, get_activity_statistics,
+                                        next_period)
+from managements.chat import mark_read
+from managements.caches import ACTIVITY_NAMESPACE, MEALPLAN_NAMESPACE, cached_response
+from managements.exports import EXPORT_FORMATS, EXPORTS, aiter_export, iter_export
+from managements.fastpath import fast_serializer
+from managements.goals import get_goals_progress
+from managements.images import InvalidImage, accept_upload, status_field, validate_upload, variants_field
+from managements.ingest import TooManyItems, ingest_health_records
+from managements.parsers import NDJSONParser
+from managements.roster import get_roster
+from managements.scoping import get_scoped_user, scope_queryset
+from managements.search import search_activities
+from managements.summaries import trend_series
+from managements.sync import decode_watermark, sync_changes
+
+TREND_PERIODS = (30, 90, 365)
+
+
+class EagerLoadingViewMixin:
+    """Áp dụng select_related/prefetch_related mà serializer của viewset đã khai báo"""
+
+    def filter_queryset(self, queryset):
+        return self.optimize_queryset(super().filter_queryset(queryset))
+
+    def optimize_queryset(self, queryset, serializer_class=None):
+        serializer_class = serializer_class or self.get_serializer_class()
+        setup_eager_loading = getattr(serializer_class, 'setup_eager_loading', None)
+        if setup_eager_loading is None:
+            return queryset
+        return setup_eager_loading(queryset)
+
+
+class FastListMixin:
+    """
+    list() dựng output từ values_list() qua fastpath thay vì tạo instance + serializer
+    cho từng dòng; kết quả giống hệt. Serializer chưa hỗ trợ thì đi đường thường.
+    """
 
+    def list(self, request, *args, **kwargs):
+        fast = fast_serializer(self.get_serializer_class(), self.get_serializer_context())
+        if fast is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = fast.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.serialize(page))
+        return Response(fast.serialize(queryset))
+
+
+class SoftDeleteMixin:
+    """Xóa mềm (active=False) để thiết bị khác nhận được tombstone qua sync/"""
+
+    def perform_destroy(self, instance):
+        instance.active = False
+        instance.save()
 
-class UserViewSet(viewsets.ModelViewSet, generics.CreateAPIView):
+
+class ImageUploadMixin:
+    """
+    POST <pk>/image/ (multipart, field `image_field`): nhận ảnh và xử lý nền, trả về 202
+    kèm trạng thái; URL các phiên bản có trong bản ghi khi trạng thái là 'ready'.
+    """
+    image_field = 'image'
+
+    def can_upload_image(self, request, instance):
+        return instance.user_id == request.user.id or request.user.role == Role.Admin
+
+    @action(methods=['post'], url_path='image', detail=True, parser_classes=[MultiPartParser, FormParser])
+    def upload_image(self, request, pk=None):
+        instance = self.get_object()
+        if not self.can_upload_image(request, instance):
+            return Response({"message": "Bạn không có quyền thay đổi ảnh này."}, status=status.HTTP_403_FORBIDDEN)
+
+        upload = request.FILES.get(self.image_field)
+        if not upload:
+            return Response({"message": "Thiếu file ảnh."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            accept_upload(instance, self.image_field, upload)
+        except InvalidImage as exc:
+            return Response({"message": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "id": instance.pk,
+            "status": getattr(instance, status_field(self.image_field)),
+            "variants": getattr(instance, variants_field(self.image_field)),
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class UserViewSet(EagerLoadingViewMixin, viewsets.ModelViewSet, generics.CreateAPIView):
     queryset = User.objects.filter(is_active=True)
     serializer_class = UserSerializer
     pagination_class = Pagination
@@ -28,6 +121,18 @@ class UserViewSet(viewsets.ModelViewSet, generics.CreateAPIView):
             return [IsAuthenticated()]
         return [IsAuthenticated()]
 
+    def perform_create(self, serializer):
+        # Ảnh đại diện lúc đăng ký được kiểm tra trước, xử lý nền sau khi tạo user
+        avatar = self.request.FILES.get('avatar')
+        if avatar:
+            try:
+                validate_upload(avatar)
+            except InvalidImage as exc:
+                raise ValidationError({"avatar": [str(exc)]})
+        user = serializer.save()
+        if avatar:
+            accept_upload(user, 'avatar', avatar)
+
     @action(methods=['get'], url_path='all-users', detail=False)
     def get_all_users(self, request):
         self.check_permissions(request)
@@ -68,11 +173,22 @@ class UserViewSet(viewsets.ModelViewSet, generics.CreateAPIView):
         user = request.user
         serializer = UserSerializer(user, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
+
+        avatar = request.FILES.get('avatar')
+        if avatar:
+            try:
+                validate_upload(avatar)
+            except InvalidImage as exc:
+                return Response({"message": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         serializer.save()
+        if avatar:
+            # Upload lên storage chạy nền, client theo dõi avatar_status
+            accept_upload(user, 'avatar', avatar)
+            serializer = UserSerializer(user)
         return Response(serializer.data)
 
 
-class ActivityViewSet(viewsets.ModelViewSet):
+class ActivityViewSet(ImageUploadMixin, EagerLoadingViewMixin, viewsets.ModelViewSet):
     queryset = Activity.objects.filter(active=True)
     serializer_class = ActivitySerializer
     parser_classes = [JSONParser, MultiPartParser]
@@ -80,16 +196,24 @@ class ActivityViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.request.method in ['GET']:
             return [AllowAny()]
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'upload_image']:
             return [IsAuthenticated(), AdminOrCoachPermission()]
         return [IsAuthenticated()]
 
+    @cached_response(ACTIVITY_NAMESPACE)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cached_response(ACTIVITY_NAMESPACE)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def get_queryset(self):
         queryset = self.queryset
 
         q = self.request.query_params.get('q')
         if q:
-            queryset = queryset.filter(name__icontains=q)
+            queryset = search_activities(queryset, q)
 
         category_id = self.request.query_params.get('category_id')
         if category_id:
@@ -104,25 +228,48 @@ class ActivityViewSet(viewsets.ModelViewSet):
 
         return queryset
 
-# class WeeklyStatisticsAPIView(generics.ListAPIView):
-#     serializer_class = ActivityStatisticsSerializer
-#     # Đổi thành permissions.IsAuthenticated
-#     permission_classes = [IsAuthenticated]
-#
-#     def get_queryset(self):
-#         user = self.request.user
-#         today = timezone.localdate()
-#         start_week = today - timedelta(days=today.weekday())  # thứ 2
-#         end_week = start_week + timedelta(days=6)  # CN
-#         # 'Activity' không có trường 'user'
-#         # Giả sử bạn muốn lọc theo hoạt động của người dùng
-#         # Cần xem lại mô hình dữ liệu để sửa
-#         return Activity.objects.filter(date__range=[start_week, end_week]).order_by('date')
-
-class WorkoutPlanViewSet(viewsets.ModelViewSet):
+
+class ActivityStatisticsViewSet(viewsets.ViewSet):
+    """Calo và thời gian tập theo ngày/tuần/tháng: statistics/?period=week&periods=8"""
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        period = request.query_params.get('period', 'week')
+        if period not in PERIODS:
+            return Response({"message": "period chỉ nhận day, week hoặc month."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            count = int(request.query_params.get('periods', DEFAULT_PERIOD_COUNT[period]))
+        except ValueError:
+            count = None
+        if not count or not 1 <= count <= MAX_PERIOD_COUNT[period]:
+            return Response({"message": f"periods phải từ 1 đến {MAX_PERIOD_COUNT[period]}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        user_id = request.query_params.get('user_id')
+        if user_id:
+            user = get_scoped_user(request.user, user_id)
+            if not user:
+                return Response({"message": "Người dùng không tồn tại."}, status=status.HTTP_404_NOT_FOUND)
+
+        rows = get_activity_statistics(user, period, count)
+        return Response({
+            "user": user.id,
+            "period": period,
+            "start": rows[0]['date'],
+            "end": next_period(rows[-1]['date'], period) - timedelta(days=1),
+            "total_calories_burned": sum(row['calories_burned'] for row in rows),
+            "total_time": sum(row['time'] for row in rows),
+            "results": ActivityStatisticsSerializer(rows, many=True).data,
+        })
+
+class WorkoutPlanViewSet(FastListMixin, SoftDeleteMixin, EagerLoadingViewMixin, viewsets.ModelViewSet):
     queryset = WorkoutPlan.objects.filter(active=True)
     serializer_class = WorkoutPlanSerializer
 
+    def get_queryset(self):
+        return scope_queryset(super().get_queryset(), self.request.user)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
@@ -143,7 +290,7 @@ class WorkoutPlanViewSet(viewsets.ModelViewSet):
 
     @action(methods=['get'], url_path='my-plans', detail=False)
     def user_plans(self, request):
-        plans = WorkoutPlan.objects.filter(user=request.user)
+        plans = self.optimize_queryset(WorkoutPlan.objects.filter(user=request.user, active=True))
         serializer = WorkoutPlanSerializer(plans, many=True)
         return Response(serializer.data)
 
@@ -151,34 +298,65 @@ class WorkoutPlanViewSet(viewsets.ModelViewSet):
     def weekly_summary(self, request):
         user = request.user
         today = timezone.now().date()
-        start_of_week = today - timedelta(days=today.weekday())
-        end_of_week = start_of_week + timedelta(days=6)
-
-        weekly_plans = WorkoutPlan.objects.filter(user=user, date__range=(start_of_week, end_of_week))
-        # Logic tính total_time có thể gây lỗi nếu 'reps' hoặc 'sets' không phải số
-        total_time = sum(
-            [plan.sets * plan.reps * plan.activities.count() for plan in weekly_plans if plan.sets and plan.reps])
-
-        serializer = WorkoutPlanSerializer(weekly_plans, many=True)
+        start_param = request.query_params.get('start')
+        end_param = request.query_params.get('end')
+        try:
+            # parse_date trả None khi sai định dạng, ValueError khi đúng định dạng nhưng không có ngày đó
+            start = parse_date(start_param) if start_param else None
+            end = parse_date(end_param) if end_param else None
+        except ValueError:
+            start = end = None
+        if (start_param and not start) or (end_param and not end):
+            return Response({"message": "Ngày không hợp lệ (định dạng YYYY-MM-DD)."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Mặc định là tuần hiện tại (thứ 2 - CN)
+        if start is None and end is None:
+            start = today - timedelta(days=today.weekday())
+        if start is None:
+            start = end - timedelta(days=6)
+        if end is None:
+            end = start + timedelta(days=6)
+        if start > end:
+            return Response({"message": "Ngày bắt đầu phải trước ngày kết thúc."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # 1 query gộp số hoạt động, calo, thời gian theo từng kế hoạch + 1 query prefetch activities
+        plans = list(
+            WorkoutPlan.objects.filter(user=user, active=True, date__range=(start, end))
+            .annotate(
+                activity_count=Count('activities'),
+                activity_calories=Sum('activities__calories_burned'),
+                activity_time=Sum('activities__time'),
+            )
+            .prefetch_related(Prefetch('activities', queryset=Activity.objects.only('id')))
+        )
+
+        total_units = sum(plan.sets * plan.reps * plan.activity_count for plan in plans if plan.sets and plan.reps)
+        serializer = WorkoutPlanSerializer(plans, many=True)
         return Response({
-            "total_sessions": len(weekly_plans),
-            "estimated_total_exercise_units": total_time,
+            "start": start,
+            "end": end,
+            "total_sessions": len(plans),
+            "total_activities": sum(plan.activity_count for plan in plans),
+            "total_calories_burned": sum(plan.activity_calories or 0 for plan in plans),
+            "total_time": sum(plan.activity_time or 0 for plan in plans),
+            "estimated_total_exercise_units": total_units,
             "plans": serializer.data
         })
 
     @action(methods=['get'], url_path='plans-by-user/(?P<user_id>[^/.]+)', detail=False)
     def plans_by_user(self, request, user_id=None):
-        try:
-            user = User.objects.get(pk=user_id)
-        except User.DoesNotExist:
+        user = get_scoped_user(request.user, user_id)
+        if not user:
             return Response({"message": "Người dùng không tồn tại."}, status=status.HTTP_404_NOT_FOUND)
 
-        plans = WorkoutPlan.objects.filter(user=user)
+        plans = self.optimize_queryset(WorkoutPlan.objects.filter(user=user, active=True))
         serializer = WorkoutPlanSerializer(plans, many=True)
         return Response(serializer.data)
 
 
-class MealPlanViewSet(viewsets.ModelViewSet):
+class MealPlanViewSet(ImageUploadMixin, FastListMixin, SoftDeleteMixin, EagerLoadingViewMixin, viewsets.ModelViewSet):
     queryset = MealPlan.objects.filter(active=True)
     serializer_class = MealPlanSerializer
 
@@ -187,6 +365,13 @@ class MealPlanViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated()]
         return [IsAuthenticated()]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Ai cũng xem được thực đơn, nhưng chỉ người tạo hoặc Admin được sửa/xóa
+        if self.action in ['update', 'partial_update', 'destroy'] and self.request.user.role != Role.Admin:
+            queryset = queryset.filter(user=self.request.user)
+        return queryset
+
     @action(methods=['post'], url_path='create-meal-plan', detail=False)
     def create_meal_plan(self, request):
         serializer = MealPlanSerializer(data=request.data, context={'request': request})
@@ -195,12 +380,13 @@ class MealPlanViewSet(viewsets.ModelViewSet):
         return Response({"message": "Thực đơn dinh dưỡng đã được tạo."}, status=status.HTTP_201_CREATED)
 
     @action(methods=['get'], url_path='mealplans-by-goal/(?P<goal>[^/.]+)', detail=False)
+    @cached_response(MEALPLAN_NAMESPACE)
     def mealplans_by_goal(self, request, goal=None):
-        plans = MealPlan.objects.filter(goal=goal, active=True)
+        plans = self.optimize_queryset(MealPlan.objects.filter(goal=goal, active=True))
         serializer = MealPlanSerializer(plans, many=True, context={'request': request})
         return Response(serializer.data)
 
-class HealthRecordViewSet(viewsets.ModelViewSet):
+class HealthRecordViewSet(FastListMixin, SoftDeleteMixin, EagerLoadingViewMixin, viewsets.ModelViewSet):
     serializer_class = HealthRecordSerializer
     permission_classes = [IsAuthenticated]
 
@@ -211,25 +397,71 @@ class HealthRecordViewSet(viewsets.ModelViewSet):
         return [IsAuthenticated()]
 
     def get_queryset(self):
-        if self.request.user.role in [Role.Admin, Role.Coach]:
-            return HealthRecord.objects.filter(active=True)
-        return HealthRecord.objects.filter(user=self.request.user, active=True)
+        # Admin xem tất cả, Coach xem của mình và học viên đã kết nối, còn lại chỉ của mình
+        return scope_queryset(HealthRecord.objects.filter(active=True), self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(methods=['post'], url_path='bulk', detail=False, parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get('records')
+        if items is None or isinstance(items, (dict, str)):
+            return Response({"message": "Dữ liệu phải là danh sách bản ghi."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = ingest_health_records(request.user, items)
+        except TooManyItems as exc:
+            return Response({"message": f"Mỗi lô tối đa {exc.args[0]} bản ghi."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if result['created']:
+            response_status = status.HTTP_201_CREATED
+        elif result['errors'] and not result['duplicates']:
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_200_OK
+        return Response({
+            "created": len(result['created']),
+            "duplicates": result['duplicates'],
+            "errors": result['errors'],
+            "results": result['created'],
+        }, status=response_status)
+
+    @action(methods=['get'], url_path='trends', detail=False)
+    def trends(self, request):
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            days = None
+        if days not in TREND_PERIODS:
+            return Response({"message": "days chỉ nhận 30, 90 hoặc 365."}, status=status.HTTP_400_BAD_REQUEST)
 
+        user = request.user
+        user_id = request.query_params.get('user_id')
+        if user_id:
+            user = get_scoped_user(request.user, user_id)
+            if not user:
+                return Response({"message": "Người dùng không tồn tại."}, status=status.HTTP_404_NOT_FOUND)
 
-class HealthDiaryViewSet(viewsets.ModelViewSet):
+        start, end, series = trend_series(user, days)
+        return Response({
+            "user": user.id,
+            "start": start,
+            "end": end,
+            "series": DailyHealthSummarySerializer(series, many=True).data,
+        })
+
+
+class HealthDiaryViewSet(FastListMixin, SoftDeleteMixin, EagerLoadingViewMixin, viewsets.ModelViewSet):
     serializer_class = HealthDiarySerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.role in [Role.Admin, Role.Coach]:  # nếu admin hoặc coach xem tất cả
-            return HealthDiary.objects.filter(active=True)
-        # user bình thường chỉ xem nhật ký của mình
-        return HealthDiary.objects.filter(user=user).order_by('-date')
+        # Admin xem tất cả, Coach xem của mình và học viên đã kết nối, còn lại chỉ của mình
+        return scope_queryset(HealthDiary.objects.filter(active=True), self.request.user).order_by('-date')
 
     def perform_create(self, serializer):
         # luôn gán user hiện tại khi tạo
@@ -237,7 +469,7 @@ class HealthDiaryViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def my_diaries(self, request):
-        diaries = HealthDiary.objects.filter(user=request.user).order_by('-date')
+        diaries = self.optimize_queryset(HealthDiary.objects.filter(user=request.user, active=True).order_by('-date'))
 
         # Thêm phân trang
         page = self.paginate_queryset(diaries)
@@ -250,11 +482,16 @@ class HealthDiaryViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ChatMessageViewSet(viewsets.ModelViewSet):
+class ChatMessageViewSet(EagerLoadingViewMixin, viewsets.ModelViewSet):
     queryset = ChatMessage.objects.all()  # bỏ active=True vì model không có field active
     serializer_class = ChatMessageSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        # Chỉ người gửi / người nhận thao tác được trên tin nhắn
+        user = self.request.user
+        return super().get_queryset().filter(Q(sender=user) | Q(receiver=user))
+
     @action(methods=['post'], url_path='send-message', detail=False)
     def send_message(self, request):
         user = request.user
@@ -271,28 +508,162 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
         serializer = ChatMessageSerializer(chat_message)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(methods=['get'], url_path='conversation/(?P<peer_id>[^/.]+)', detail=False)
+    def conversation(self, request, peer_id=None):
+        user = request.user
+        peer = User.objects.filter(id=peer_id).first()
+        if not peer:
+            return Response({"message": "Người dùng không tồn tại"}, status=status.HTTP_404_NOT_FOUND)
+
+        # Mỗi chiều một nhánh trên chat_conversation_idx (sender, receiver, timestamp, id)
+        messages = self.optimize_queryset(ChatMessage.objects.all())
+        branches = [messages.filter(sender=user, receiver=peer)]
+        if peer != user:
+            branches.append(messages.filter(sender=peer, receiver=user))
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(branches, request, view=self)
+        serializer = ChatMessageSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(methods=['post'], url_path='conversation/(?P<peer_id>[^/.]+)/read', detail=False)
+    def mark_conversation_read(self, request, peer_id=None):
+        peer = User.objects.filter(id=peer_id).first()
+        if not peer:
+            return Response({"message": "Người dùng không tồn tại"}, status=status.HTTP_404_NOT_FOUND)
+
+        up_to = request.data.get('up_to')
+        if up_to is not None:
+            try:
+                up_to = int(up_to)
+            except (TypeError, ValueError):
+                return Response({"message": "up_to phải là id tin nhắn."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"marked": mark_read(request.user, peer, up_to)})
+
+    @action(methods=['get'], url_path='inbox', detail=False)
+    def inbox(self, request):
+        queryset = self.optimize_queryset(
+            ChatConversation.objects.filter(owner=request.user), ChatConversationSerializer
+        )
+        paginator = Pagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = ChatConversationSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     def list(self, request, *args, **kwargs):
-        current_user = request.user
-        queryset = self.get_queryset().filter(
-            Q(sender=current_user) | Q(receiver=current_user)
-        ).order_by('timestamp')
-        serializer = ChatMessageSerializer(queryset, many=True)
-        return Response(serializer.data)
+        # Tin đã gửi và đã nhận là hai nhánh keyset (chat_sent_idx / chat_received_idx)
+        user = request.user
+        messages = self.optimize_queryset(ChatMessage.objects.all())
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(
+            [messages.filter(sender=user), messages.filter(receiver=user).exclude(sender=user)], request, view=self
+        )
+        serializer = ChatMessageSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 # views.py
 
-class UserGoalViewSet(viewsets.ModelViewSet):
-    # Lỗi: UserGoal không có trường 'active'.
-    # Thay thế bằng filter() theo các trường khác, hoặc bỏ filter.
-    queryset = UserGoal.objects.all()  # Sửa lại thành .all()
+class UserGoalViewSet(FastListMixin, SoftDeleteMixin, EagerLoadingViewMixin, viewsets.ModelViewSet):
+    queryset = UserGoal.objects.filter(active=True)
     serializer_class = UserGoalSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        return scope_queryset(super().get_queryset(), self.request.user)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(methods=['get'], url_path='progress', detail=False)
+    def progress(self, request):
+        user = request.user
+        user_id = request.query_params.get('user_id')
+        if user_id:
+            user = get_scoped_user(request.user, user_id)
+            if not user:
+                return Response({"message": "Người dùng không tồn tại."}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({"user": user.id, "goals": get_goals_progress(user)})
+
 
-class UserConnectionViewSet(viewsets.ModelViewSet):
+class UserConnectionViewSet(EagerLoadingViewMixin, viewsets.ModelViewSet):
     queryset = UserConnection.objects.filter(active=True)
     serializer_class = UserConnectionSerializer
     permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        # Kết nối chỉ hiện với hai phía của kết nối (Admin xem tất cả)
+        user = self.request.user
+        queryset = super().get_queryset()
+        if user.role == Role.Admin:
+            return queryset
+        return queryset.filter(Q(user=user) | Q(coach=user))
+
+    def get_permissions(self):
+        if self.action in ['roster']:
+            return [IsAuthenticated(), CoachPermission()]
+        return [IsAuthenticated()]
+
+    @action(methods=['get'], url_path='roster', detail=False)
+    def roster(self, request):
+        # Chỉ số mới nhất của mọi học viên đã chấp nhận kết nối với coach
+        return Response(get_roster(request.user))
+
+
+class ExportContentNegotiation(BaseContentNegotiation):
+    """File xuất là CSV/NDJSON nên bỏ qua Accept/?format= của DRF"""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class ExportViewSet(viewsets.ViewSet):
+    """Xuất toàn bộ lịch sử dạng stream: export/<kind>/?format=csv|ndjson"""
+    permission_classes = [IsAuthenticated]
+    content_negotiation_class = ExportContentNegotiation
+
+    def list(self, request):
+        return Response({"kinds": list(EXPORTS) + ['all'], "formats": list(EXPORT_FORMATS)})
+
+    def retrieve(self, request, pk=None):
+        kind = pk
+        export_format = request.query_params.get('format', 'csv')
+        if kind not in EXPORTS and kind != 'all':
+            return Response({"message": "Loại dữ liệu không hợp lệ."}, status=status.HTTP_404_NOT_FOUND)
+        if export_format not in EXPORT_FORMATS:
+            return Response({"message": "format chỉ nhận csv hoặc ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+        if kind == 'all' and export_format == 'csv':
+            return Response({"message": "Xuất tất cả chỉ hỗ trợ ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        user_id = request.query_params.get('user_id')
+        if user_id:
+            user = get_scoped_user(request.user, user_id)
+            if not user:
+                return Response({"message": "Người dùng không tồn tại."}, status=status.HTTP_404_NOT_FOUND)
+
+        content_type = 'text/csv; charset=utf-8' if export_format == 'csv' else 'application/x-ndjson; charset=utf-8'
+        # Chạy qua daphne (ASGI) thì stream bằng iterator async, WSGI dùng generator thường
+        stream = aiter_export if isinstance(request._request, ASGIRequest) else iter_export
+        response = StreamingHttpResponse(stream(kind, user, export_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{user.username}-{kind}.{export_format}"'
+        return response
+
+
+class SyncViewSet(viewsets.ViewSet):
+    """Đồng bộ tăng dần cho app: ?since=<watermark của lần trước>, bỏ trống ở lần đầu"""
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        since_param = request.query_params.get('since')
+        since, positions = None, None
+        if since_param:
+            decoded = decode_watermark(since_param)
+            if decoded is None:
+                return Response({"message": "Watermark không hợp lệ."}, status=status.HTTP_400_BAD_REQUEST)
+            since, positions = decoded
+
+        return Response(sync_changes(request.user, since=since, positions=positions, context={'request': request}))